@@ -2,6 +2,10 @@ import streamlit as st
 import traceback
 import time
 import sofia_logic
+import resources
+import jobs
+import usage
+from services.dedup import get_sources
 
 # FAISS index diagnostic function
 def diagnose_faiss_index(repository):
@@ -10,36 +14,34 @@ def diagnose_faiss_index(repository):
     """
     st.sidebar.subheader("Index Diagnostics")
     
-    with st.sidebar.expander("View Diagnostics"):
-        if repository._vectorstore is None:
+    # Read lease: a reindex swapping or updating the index waits until the view is built
+    with st.sidebar.expander("View Diagnostics"), repository.index.read() as vectorstore:
+        if vectorstore is None:
             st.warning("FAISS index is not loaded in memory.")
             return
         
         # Check how many documents are indexed
         try:
             # Direct method to see number of vectors
-            if hasattr(repository._vectorstore, 'index'):
-                num_vectors = repository._vectorstore.index.ntotal
+            if hasattr(vectorstore, 'index'):
+                num_vectors = vectorstore.index.ntotal
                 st.info(f"Number of vectors in index: {num_vectors}")
-            elif hasattr(repository._vectorstore, 'docstore'):
-                num_docs = len(repository._vectorstore.docstore._dict)
+            elif hasattr(vectorstore, 'docstore'):
+                num_docs = len(vectorstore.docstore._dict)
                 st.info(f"Number of documents in index: {num_docs}")
             else:
                 st.warning("Could not determine the size of the index.")
             
             # List document metadata
-            if hasattr(repository._vectorstore, 'docstore') and hasattr(repository._vectorstore.docstore, '_dict'):
+            if hasattr(vectorstore, 'docstore') and hasattr(vectorstore.docstore, '_dict'):
                 st.subheader("Indexed Documents:")
-                docs_list = list(repository._vectorstore.docstore._dict.values())
+                docs_list = list(vectorstore.docstore._dict.values())
                 
-                # Group by source
+                # Group by source; a deduplicated chunk counts for every document sharing it
                 source_counts = {}
                 for doc in docs_list:
-                    source = doc.metadata.get('source', 'Unknown')
-                    if source in source_counts:
-                        source_counts[source] += 1
-                    else:
-                        source_counts[source] = 1
+                    for source in get_sources(doc):
+                        source_counts[source] = source_counts.get(source, 0) + 1
                 
                 # Show count by source
                 for source, count in source_counts.items():
@@ -49,7 +51,7 @@ def diagnose_faiss_index(repository):
                 st.subheader("Document Samples:")
                 for i, doc in enumerate(docs_list[:3]):  # Just the first 3
                     st.markdown(f"**Document {i+1}:**")
-                    st.markdown(f"**Source:** {doc.metadata.get('source', 'Unknown')}")
+                    st.markdown(f"**Source:** {', '.join(get_sources(doc))}")
                     st.markdown(f"**Content:** {doc.page_content[:200]}...")
         except Exception as e:
             st.error(f"Error analyzing index: {str(e)}")
@@ -77,7 +79,8 @@ def upload_document_section(bucket_name):
                     
                     if success:
                         st.success(f"Document '{object_name}' uploaded successfully!")
-                        st.info("Please reindex the documents to include the new file.")
+                        job = jobs.get_runner().submit("index_document", bucket_name=bucket_name, file_key=object_name)
+                        st.info(f"Indexing '{object_name}' in the background (job {job.id}).")
                     else:
                         st.error("Error uploading the document. Check the logs for details.")
             else:
@@ -103,11 +106,24 @@ def explore_s3_documents(bucket_name):
                 if selected_doc:
                     st.write(f"**Document:** {selected_doc}")
                     
-                    # Button to view content
+                    # Button to view content, one page at a time
                     if st.button("View Content"):
+                        st.session_state.preview_doc = selected_doc
+                        st.session_state.preview_page = 1
+                    
+                    if st.session_state.get("preview_doc") == selected_doc:
+                        page = st.number_input("Page", min_value=1, key="preview_page")
                         with st.spinner("Loading content..."):
-                            content = sofia_logic.view_s3_file_content(bucket_name, selected_doc)
-                            st.text_area("Document Content:", value=content, height=300)
+                            try:
+                                content, total_size = sofia_logic.read_s3_file_page(
+                                    bucket_name, selected_doc, page=page - 1
+                                )
+                                page_size = sofia_logic.PREVIEW_PAGE_BYTES
+                                total_pages = max(1, -(-total_size // page_size))
+                                st.caption(f"Page {page} of {total_pages}")
+                                st.text_area("Document Content:", value=content, height=300)
+                            except Exception as e:
+                                st.error(f"Error retrieving file: {str(e)}")
                     
                     # Separate section for deletion with direct implementation
                     st.write("---")
@@ -122,7 +138,8 @@ def explore_s3_documents(bucket_name):
                             result = sofia_logic.delete_file_direct(bucket_name, selected_doc)
                             if result:
                                 st.success(f"File '{selected_doc}' has been deleted!")
-                                st.info("Please reindex the documents to update the search index.")
+                                job = jobs.get_runner().submit("remove_document", bucket_name=bucket_name, file_key=selected_doc)
+                                st.info(f"Removing '{selected_doc}' from the index in the background (job {job.id}).")
                                 time.sleep(2)  # Give a moment to read the success message
                                 st.experimental_rerun()  # Force a complete rerun to refresh the list
                             else:
@@ -154,36 +171,97 @@ def add_memory_cleanup_button():
 # Add reindexing section
 def add_reindexing_section(bucket_name):
     """
-    Add section for forced reindexing
+    Add section for forced reindexing.
+    Reindexing runs as a background job, so this session and the chat keep working.
     """
     st.sidebar.subheader("Force Reindexing")
-    if st.sidebar.button("Force Complete Reindexing"):
-        with st.sidebar:
-            with st.spinner("Reindexing documents..."):
-                try:
-                    st.info("1. Clearing memory and existing indices...")
-                    
-                    # Force reindexing
-                    new_repository, vectorstore, elapsed_time, doc_count = sofia_logic.force_reindex(bucket_name)
-                    
-                    # Update session state with new repository
-                    if new_repository:
-                        st.session_state.repository = new_repository
-                        
-                        # Show success message
-                        st.success(f"Found {doc_count} documents in S3 bucket.")
-                        st.success(f"FAISS index created successfully in {elapsed_time:.2f} seconds.")
-                        
-                        # Button to restart
-                        if st.button("Restart Application (Recommended)"):
-                            from app import restart_application
-                            restart_application()
+    runner = jobs.get_runner()
+    active = runner.active_job("reindex")
+    
+    if active is None:
+        if st.sidebar.button("Force Complete Reindexing"):
+            job = runner.submit("reindex", bucket_name=bucket_name)
+            st.sidebar.info(f"Reindexing job {job.id} started in the background.")
+            st.rerun()
+    else:
+        st.sidebar.info(f"Reindexing job {active.id} is {active.status}.")
+    
+    show_job_status(runner)
+
+# Background job status view
+def show_job_status(runner):
+    """
+    Show progress of the most recent index jobs, with cancel and refresh buttons
+    """
+    recent_jobs = runner.list_jobs(limit=5)
+    if not recent_jobs:
+        return
+    
+    with st.sidebar.expander("Index Jobs", expanded=not recent_jobs[0].finished):
+        for job in recent_jobs:
+            started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job.created_at))
+            st.markdown(f"**{job.kind}** `{job.id}` — {job.status} ({started})")
+            
+            if not job.finished:
+                for stage in jobs.STAGES:
+                    info = job.progress.get(stage)
+                    if info is None:
+                        continue
+                    if info["total"]:
+                        st.progress(min(info["done"] / info["total"], 1.0),
+                                    text=f"{stage}: {info['done']}/{info['total']}")
                     else:
-                        st.error("Failed to create FAISS index.")
-                except Exception as e:
-                    st.error(f"Error reindexing documents: {str(e)}")
-                    st.error(f"Details: {type(e).__name__}")
-                    st.code(traceback.format_exc())
+                        st.write(f"{stage}: {info['done']}")
+                if job.cancel_requested:
+                    st.warning("Cancelling...")
+                elif st.button("Cancel", key=f"cancel_job_{job.id}"):
+                    runner.cancel(job.id)
+                    st.rerun()
+            elif job.status == jobs.SUCCEEDED and job.result and "file_key" in job.result:
+                result = job.result
+                st.write(f"{result['file_key']}: {result['chunk_count']} chunks "
+                         f"in {result['elapsed_time']:.2f} seconds.")
+            elif job.status == jobs.SUCCEEDED and job.result:
+                result = job.result
+                st.write(f"{result.get('doc_count', 0)} documents, {result.get('chunk_count', 0)} chunks "
+                         f"in {result.get('elapsed_time', 0):.2f} seconds.")
+            elif job.error:
+                st.error(job.error)
+        
+        if st.button("Refresh Status", key="refresh_jobs"):
+            st.rerun()
+
+# Token usage and cost panel
+def show_usage_panel():
+    """
+    Show LLM token usage and estimated cost per route, stage, day and session
+    """
+    st.sidebar.subheader("LLM Usage & Cost")
+    
+    with st.sidebar.expander("View Usage"):
+        days = st.selectbox("Period (days)", [1, 7, 30], index=1, key="usage_days")
+        try:
+            store = usage.get_store()
+            by_route = store.summary_by_route(days)
+            if not by_route:
+                st.info("No LLM usage recorded in this period.")
+                return
+            
+            total_cost = sum(row["cost_usd"] for row in by_route)
+            total_turns = sum(row["turns"] for row in by_route)
+            st.metric("Estimated cost (USD)", f"${total_cost:.4f}",
+                      help=f"{total_turns} turns, {sum(row['calls'] for row in by_route)} LLM calls")
+            
+            st.markdown("**Per route** (classifier calls charged to the turn's route)")
+            st.dataframe(by_route, hide_index=True, use_container_width=True)
+            st.markdown("**Per stage**")
+            st.dataframe(store.summary_by_stage(days), hide_index=True, use_container_width=True)
+            st.markdown("**Per day**")
+            st.dataframe(store.summary_by_day(days), hide_index=True, use_container_width=True)
+            st.markdown("**Most expensive sessions**")
+            st.dataframe(store.top_sessions(days), hide_index=True, use_container_width=True)
+        except Exception as e:
+            st.error(f"Error reading usage data: {str(e)}")
 
 # Password check for sidebar
 def check_password():
@@ -228,7 +306,7 @@ def show_admin_button():
         st.rerun()
 
 # Render admin sidebar
-def render_admin_sidebar(bucket_name="docs-intranet"):
+def render_admin_sidebar(bucket_name=resources.DEFAULT_BUCKET):
     """
     Render the admin sidebar with all tools
     """
@@ -242,17 +320,35 @@ def render_admin_sidebar(bucket_name="docs-intranet"):
         except Exception as e:
             st.error(f"Error configuring AWS: {str(e)}")
         
+        # Display background warm-up status
+        readiness = resources.get_readiness()
+        elapsed = readiness.get("elapsed", 0)
+        if readiness["state"] == "ready":
+            st.success(f"{readiness['detail']} (warm-up {elapsed:.1f}s)")
+        elif readiness["state"] == "error":
+            st.error(f"Warm-up failed: {readiness['detail']}")
+        else:
+            st.info(f"Warm-up {readiness['state']}: {readiness['detail']} ({elapsed:.1f}s)")
+        
+        # Knowledge bases loaded in this process, least recently used first
+        for loaded_bucket, version, nbytes in resources.loaded_indexes():
+            st.caption(f"Index {loaded_bucket} (version {version}): {nbytes / (1024 * 1024):.1f} MB")
+        
         repository = st.session_state.repository
         if repository:
             # Show available documents
             st.subheader("S3 Documents")
             with st.expander("View available documents"):
-                documents = repository.list_documents_in_bucket()
+                documents = sofia_logic.list_s3_documents(bucket_name)
                 if documents:
                     for doc in documents:
-                        st.write(f"- {doc}")
+                        st.write(f"- {doc['Key']} ({doc['Size'] / 1024:.1f} KB, "
+                                 f"modified {doc['LastModified']:%Y-%m-%d %H:%M})")
                 else:
                     st.write("No documents found in bucket.")
+                if st.button("Refresh List", key="refresh_inventory"):
+                    sofia_logic.invalidate_bucket_inventory(bucket_name)
+                    st.rerun()
             
             # Add exploration and management functionality
             explore_s3_documents(bucket_name)
@@ -269,6 +365,9 @@ def render_admin_sidebar(bucket_name="docs-intranet"):
             # Add memory cleanup button
             add_memory_cleanup_button()
         
+        # Token usage and cost
+        show_usage_panel()
+        
         # Button to exit admin area
         if st.button("Log Out"):
             st.session_state.authenticated = False
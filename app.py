@@ -1,7 +1,11 @@
 import streamlit as st
+import uuid
 from langchain_core.messages import HumanMessage, AIMessage
 from classes import FinalResponse
+from history import ConversationHistory
 import sofia_logic
+import resources
+import metrics
 import admin_ui
 
 st.set_page_config(
@@ -17,13 +21,13 @@ def initialize_session_state():
     if "show_login" not in st.session_state:
         st.session_state.show_login = False
     if "history" not in st.session_state:
-        st.session_state.history = []
+        st.session_state.history = ConversationHistory(summarizer=resources.summarize_history)
     if "needs_restart" not in st.session_state:
         st.session_state.needs_restart = False
     if "repository" not in st.session_state:
         st.session_state.repository = None
-    if "graph" not in st.session_state:
-        st.session_state.graph = sofia_logic.create_graph()
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
 
 initialize_session_state()
 
@@ -45,7 +49,11 @@ if st.session_state.needs_restart:
     st.session_state.needs_restart = False
     st.success("Application restarted successfully!")
 
-BUCKET_NAME = "docs-projetos-chatbot"
+BUCKET_NAME = resources.DEFAULT_BUCKET
+
+# Load the graph and index in the background; the page renders immediately
+readiness = resources.start_warmup(BUCKET_NAME)
+metrics.start_metrics_server()
 
 try:
     aws_config = sofia_logic.configure_aws()
@@ -54,13 +62,10 @@ except Exception as e:
         st.sidebar.error(f"Error configuring AWS: {str(e)}")
 
 try:
-    if "repository" not in st.session_state or st.session_state.repository is None:
-        repository, vectorstore = sofia_logic.get_repository(BUCKET_NAME)
-        st.session_state.repository = repository
-    else:
-        repository = st.session_state.repository
-        if not repository._vectorstore:
-            _, vectorstore = sofia_logic.get_repository(BUCKET_NAME)
+    # Process-wide repository, shared by every session; the vectorstore is
+    # loaded once and reloaded only when a new index version is published
+    repository = resources.get_repository(BUCKET_NAME)
+    st.session_state.repository = repository
 except Exception as e:
     if st.session_state.authenticated:
         st.sidebar.error(f"Error loading repository: {str(e)}")
@@ -73,6 +78,11 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+if readiness["state"] == "warming":
+    st.caption(f"⏳ {readiness['detail']} Questions may take longer until it finishes.")
+elif readiness["state"] == "error":
+    st.caption(f"⚠️ Knowledge base failed to load: {readiness['detail']}")
+
 
 if st.session_state.show_login and not admin_ui.check_password():
     pass
@@ -98,21 +108,20 @@ if not st.session_state.show_login or st.session_state.authenticated:
         with st.chat_message("user"):
             st.markdown(query)
             
-        context = ""
-        for i, msg in enumerate(st.session_state.history[:-1]):
-            if isinstance(msg, HumanMessage):
-                context += f"User: {msg.content}\n"
-            elif isinstance(msg, AIMessage):
-                context += f"Assistant: {msg.content}\n"
-                
-        MAX_HISTORY = 10
-        if len(st.session_state.history) > MAX_HISTORY:
-            st.session_state.history = st.session_state.history[-MAX_HISTORY:]
-            
+        # One trace per turn, shared by the summary and every graph node
+        trace_config = resources.with_bucket(metrics.new_trace_config(st.session_state.session_id), BUCKET_NAME)
+        
+        # Fold older turns into the summary once the history grows past its threshold
+        with metrics.trace_context(trace_config):
+            st.session_state.history.maybe_summarize()
+
         try:
             with st.chat_message("assistant"):
                 with st.spinner("Thinking..."):
-                    response = st.session_state.graph.invoke(st.session_state.history)
+                    response = resources.get_graph().invoke(
+                        st.session_state.history.for_graph(),
+                        config=trace_config
+                    )
                     final_result_json = response[-1].content
                     final_result_pydantic = FinalResponse.model_validate_json(final_result_json)
                     answer = final_result_pydantic.answer
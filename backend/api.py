@@ -1,8 +1,13 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-import sqlite3
+from typing import Dict, List, Optional
 from datetime import datetime
-import os
+import json
+
+from backend.cache import ResponseCache, etag_matches
+from backend.db import Database, DB_PATH
+from backend.schema import migrate
 
 class EmployeeRequest(BaseModel):
     employeeCode: str
@@ -15,122 +20,219 @@ class PayrollResponse(BaseModel):
     name: str
     YTDPayroll: float
 
+class BatchEmployeeRequest(BaseModel):
+    employeeCodes: List[str]
+    stream: bool = False  # Return NDJSON, one line per code, as results are read
+
+class BatchItemError(BaseModel):
+    status: int
+    detail: str
+
+class VacancyBatchResponse(BaseModel):
+    results: Dict[str, VacancyResponse]
+    errors: Dict[str, BatchItemError]
+
+class PayrollBatchResponse(BaseModel):
+    results: Dict[str, PayrollResponse]
+    errors: Dict[str, BatchItemError]
+
+MAX_BATCH_SIZE = 10000
+BATCH_QUERY_SIZE = 500  # Codes per IN (...) query, well below SQLite's variable limit
+
 app = FastAPI()
 
+@app.on_event("startup")
 def init_db():
-    if os.path.exists("employee.db"):
-        os.remove("employee.db")
-    conn = sqlite3.connect("employee.db")
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS employee (
-            employee_code TEXT PRIMARY KEY,
-            name TEXT
-        )
-        """
-    )
-
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS earnings (
-            payment_date TEXT,
-            employee_code TEXT,
-            amount REAL,
-            FOREIGN KEY (employee_code) REFERENCES employee (employee_code)
-        )
-        """
-    )
-
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS employee_vacancy (
-            employee_code TEXT PRIMARY KEY,
-            balance_days INTEGER,
-            FOREIGN KEY (employee_code) REFERENCES employee (employee_code)
-        )
-        """
-    )
-
-    cursor.executemany(
-        """
-        INSERT OR IGNORE INTO employee (employee_code, name)
-        VALUES (?, ?)
-        """,
-        [
-            ("abc123", "Allan Ferreira"),
-            ("def456", "Yan Ferreira"),
-        ],
-    )
-
-    cursor.executemany(
-        """
-        INSERT OR IGNORE INTO employee_vacancy (employee_code, balance_days)
-        VALUES (?, ?)
-        """,
-        [
-            ("abc123", 10),
-            ("def456", 20),
-        ],
-    )
-
-    cursor.executemany(
-        """
-        INSERT OR IGNORE INTO earnings (payment_date, employee_code, amount)
-        VALUES (?, ?, ?)
-        """,
-        [
-            ("2025-01-01", "abc123", 50.00),
-            ("2025-01-02", "abc123", 50.00),
-            ("2025-01-01", "def456", 100.00),
-            ("2025-01-02", "def456", 100.00),
-        ],
-    )
-
-    conn.commit()
-    conn.close()
-
-init_db()
+    # Idempotent: applies only pending migrations, never drops existing data
+    migrate(DB_PATH)
+
+# Pooled connections shared by every request of this worker
+db = Database(DB_PATH)
+
+# Repeat lookups are answered from memory; writes through the pool clear it
+response_cache = ResponseCache()
+db.add_write_listener(response_cache.clear)
+
+# Fixed SQL text, so each pooled connection prepares a statement once and reuses it
+VACANCY_SQL = (
+    "SELECT e.name, ev.balance_days FROM employee e "
+    " LEFT JOIN employee_vacancy ev ON e.employee_code = ev.employee_code "
+    " WHERE e.employee_code = ?"
+)
+# Year total from payroll_ytd, minus the (usually no) payments dated from today to year end,
+# which the (employee_code, payment_date) index finds without scanning the history
+PAYROLL_SQL = (
+    "SELECT e.name, COALESCE(p.total, 0) - COALESCE(("
+    "   SELECT SUM(er.amount) FROM earnings er "
+    "   WHERE er.employee_code = e.employee_code AND er.payment_date >= ? AND er.payment_date < ?"
+    " ), 0) AS ytd_payroll "
+    " FROM employee e "
+    " LEFT JOIN payroll_ytd p ON p.employee_code = e.employee_code AND p.year = ? "
+    " WHERE e.employee_code = ?"
+)
+VACANCY_BATCH_SQL = (
+    "SELECT e.employee_code, e.name, ev.balance_days FROM employee e "
+    " LEFT JOIN employee_vacancy ev ON e.employee_code = ev.employee_code "
+    " WHERE e.employee_code IN ({placeholders})"
+)
+PAYROLL_BATCH_SQL = (
+    "SELECT e.employee_code, e.name, COALESCE(p.total, 0) - COALESCE(("
+    "   SELECT SUM(er.amount) FROM earnings er "
+    "   WHERE er.employee_code = e.employee_code AND er.payment_date >= ? AND er.payment_date < ?"
+    " ), 0) AS ytd_payroll "
+    " FROM employee e "
+    " LEFT JOIN payroll_ytd p ON p.employee_code = e.employee_code AND p.year = ? "
+    " WHERE e.employee_code IN ({placeholders})"
+)
+
+def payroll_period():
+    """Query parameters selecting the payments of the current year dated before today."""
+    today = datetime.now()
+    return (today.strftime("%Y-%m-%d"), f"{today.year + 1}-01-01", today.year)
+
+@app.on_event("shutdown")
+def close_db():
+    db.close()
+
+async def cached_response(key, load, if_none_match=None, conditional=False):
+    """
+    Serve a lookup from the response cache, loading it on a miss. Conditional (GET)
+    requests get the ETag and a 304 Not Modified when If-None-Match carries it.
+    """
+    # Writes committed by other processes change data_version; checked at most once a second
+    if response_cache.needs_version_check():
+        response_cache.observe_data_version(await db.data_version())
+
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        payload = (await load()).model_dump()
+        # A write committed during the query clears the cache: the payload is then not stored
+        response_cache.observe_data_version(await db.data_version())
+        entry = (payload, response_cache.set(key, payload, generation))
+    payload, etag = entry
+
+    if not conditional:
+        return JSONResponse(content=payload)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={response_cache.ttl_seconds}"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=payload, headers=headers)
+
+async def vacancy_response(employee_code, if_none_match=None, conditional=False):
+    async def load():
+        result = await db.fetch_one(VACANCY_SQL, (employee_code,))
+        if result:
+            return VacancyResponse(
+                name=result[0],
+                vacancyBalanceDays=result[1]
+            )
+        else:
+            raise HTTPException(status_code=404, detail="Employee not found")
+
+    return await cached_response(("vacancy", employee_code), load, if_none_match, conditional)
+
+async def payroll_response(employee_code, if_none_match=None, conditional=False):
+    period = payroll_period()
+
+    async def load():
+        result = await db.fetch_one(PAYROLL_SQL, (*period, employee_code))
+        if result:
+            return PayrollResponse(
+                name=result[0],
+                YTDPayroll=result[1]
+            )
+        else:
+            raise HTTPException(status_code=404, detail="Employee not found")
+
+    # The YTD total depends on the day, so the day is part of the key
+    return await cached_response(("payroll", employee_code, period[0]), load, if_none_match, conditional)
+
+# GET lookups support conditional requests (ETag / If-None-Match -> 304)
+@app.get("/employee/vacancy", response_model=VacancyResponse)
+async def get_employee_vacancy_conditional(employeeCode: str, if_none_match: Optional[str] = Header(None)):
+    return await vacancy_response(employeeCode, if_none_match, conditional=True)
+
+@app.get("/employee/payroll", response_model=PayrollResponse)
+async def get_employee_payroll_conditional(employeeCode: str, if_none_match: Optional[str] = Header(None)):
+    return await payroll_response(employeeCode, if_none_match, conditional=True)
 
 @app.post("/employee/vacancy", response_model=VacancyResponse)
 async def get_employee_vacancy(request: EmployeeRequest):
-    conn = sqlite3.connect("employee.db")
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT e.name, ev.balance_days FROM employee e  " \
-        " LEFT JOIN employee_vacancy ev ON e.employee_code = ev.employee_code " \
-        " WHERE e.employee_code = ?",
-        (request.employeeCode,)
-    )
-    result = cursor.fetchone()
-    conn.close()
-
-    if result:
-        return VacancyResponse(
-            name=result[0],
-            vacancyBalanceDays=result[1]
-        )
-    else:
-        raise HTTPException(status_code=404, detail="Employee not found")
+    return await vacancy_response(request.employeeCode)
 
 @app.post("/employee/payroll", response_model=PayrollResponse)
 async def get_employee_payroll(request: EmployeeRequest):
-    conn = sqlite3.connect("employee.db")
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT e.name, SUM(amount) AS ytd_payroll FROM employee e " \
-        " LEFT JOIN earnings er ON e.employee_code = er.employee_code " \
-        " WHERE e.employee_code = ? AND er.payment_date < ?",
-        (request.employeeCode, datetime.now().strftime("%Y-%m-%d"))
-    )
-    result = cursor.fetchone()
-    conn.close()
-
-    if result:
-        return PayrollResponse(
-            name=result[0],
-            YTDPayroll=result[1]
-        )
-    else:
-        raise HTTPException(status_code=404, detail="Employee not found")
+    return await payroll_response(request.employeeCode)
+
+# Batch lookups: one IN (...) query per BATCH_QUERY_SIZE codes, results keyed by code
+NOT_FOUND = BatchItemError(status=404, detail="Employee not found")
+
+def split_batch(employee_codes):
+    """Drop duplicates (keeping order) and report invalid codes as per-item errors."""
+    if len(employee_codes) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} employee codes per request")
+    codes, errors = [], {}
+    for code in dict.fromkeys(employee_codes):
+        if code.strip():
+            codes.append(code)
+        else:
+            errors[code] = BatchItemError(status=422, detail="Invalid employee code")
+    return codes, errors
+
+async def lookup_vacancies(codes):
+    """Yield (code, VacancyResponse or BatchItemError) for each code."""
+    for start in range(0, len(codes), BATCH_QUERY_SIZE):
+        chunk = codes[start:start + BATCH_QUERY_SIZE]
+        sql = VACANCY_BATCH_SQL.format(placeholders=", ".join("?" * len(chunk)))
+        rows = {row[0]: row for row in await db.fetch_all(sql, chunk)}
+        for code in chunk:
+            row = rows.get(code)
+            if row is None:
+                yield code, NOT_FOUND
+            elif row[2] is None:
+                yield code, BatchItemError(status=404, detail="Vacation balance not found")
+            else:
+                yield code, VacancyResponse(name=row[1], vacancyBalanceDays=row[2])
+
+async def lookup_payrolls(codes):
+    """Yield (code, PayrollResponse or BatchItemError) for each code."""
+    period = payroll_period()
+    for start in range(0, len(codes), BATCH_QUERY_SIZE):
+        chunk = codes[start:start + BATCH_QUERY_SIZE]
+        sql = PAYROLL_BATCH_SQL.format(placeholders=", ".join("?" * len(chunk)))
+        rows = {row[0]: row for row in await db.fetch_all(sql, (*period, *chunk))}
+        for code in chunk:
+            row = rows.get(code)
+            if row is None:
+                yield code, NOT_FOUND
+            else:
+                yield code, PayrollResponse(name=row[1], YTDPayroll=row[2])
+
+async def stream_batch(lookup, codes, errors):
+    """NDJSON lines: {"employeeCode", "result"} or {"employeeCode", "error"}."""
+    for code, error in errors.items():
+        yield json.dumps({"employeeCode": code, "error": error.model_dump()}) + "\n"
+    async for code, item in lookup(codes):
+        key = "error" if isinstance(item, BatchItemError) else "result"
+        yield json.dumps({"employeeCode": code, key: item.model_dump()}) + "\n"
+
+async def run_batch(request, lookup):
+    codes, errors = split_batch(request.employeeCodes)
+    if request.stream:
+        return StreamingResponse(stream_batch(lookup, codes, errors), media_type="application/x-ndjson")
+    results = {}
+    async for code, item in lookup(codes):
+        if isinstance(item, BatchItemError):
+            errors[code] = item
+        else:
+            results[code] = item
+    return {"results": results, "errors": errors}
+
+@app.post("/employee/vacancy/batch", response_model=VacancyBatchResponse)
+async def get_employee_vacancy_batch(request: BatchEmployeeRequest):
+    return await run_batch(request, lookup_vacancies)
+
+@app.post("/employee/payroll/batch", response_model=PayrollBatchResponse)
+async def get_employee_payroll_batch(request: BatchEmployeeRequest):
+    return await run_batch(request, lookup_payrolls)
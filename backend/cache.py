@@ -0,0 +1,90 @@
+# Short-TTL in-process cache of employee API responses, with ETags.
+# Entries are dropped when the TTL expires, when this process writes through the
+# Database pool, and when SQLite's data_version shows another connection or
+# process committed a change, so repeat lookups rarely need a query.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_TTL_SECONDS = int(os.getenv("EMPLOYEE_CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = 10000
+DATA_VERSION_CHECK_SECONDS = 1.0  # External writes are noticed within this delay
+
+
+def make_etag(payload):
+    """Strong ETag of a JSON-serializable payload."""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value matches the ETag (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return etag in candidates
+
+
+class ResponseCache:
+    """LRU cache of (payload, etag) entries that expire after ttl_seconds."""
+
+    def __init__(self, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (stored_at, payload, etag)
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._checked_at = 0.0
+        self.generation = 0  # Incremented whenever the entries are dropped
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return (payload, etag) for a fresh entry, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def set(self, key, payload, generation=None):
+        """
+        Store a payload and return its ETag. When generation (read before loading
+        the payload) is given and the cache was cleared since, the payload may be
+        stale and is not stored.
+        """
+        etag = make_etag(payload)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return etag
+            self._entries[key] = (time.monotonic(), payload, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def needs_version_check(self):
+        return time.monotonic() - self._checked_at >= DATA_VERSION_CHECK_SECONDS
+
+    def observe_data_version(self, version):
+        """Record the database's data_version, clearing the cache when it changed."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if self._data_version is not None and version != self._data_version:
+                self._entries.clear()
+                self.generation += 1
+            self._data_version = version
@@ -0,0 +1,209 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from typing import Optional
+from langchain_core.messages import HumanMessage, AIMessage
+import threading
+import logging
+import json
+import time
+import uuid
+
+import chains
+import resources
+import metrics
+from classes import FinalResponse
+from history import ConversationHistory
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_SECONDS = 60 * 60  # Idle sessions are dropped after one hour
+MAX_SESSIONS = 10000
+
+class ChatRequest(BaseModel):
+    message: str
+    sessionId: Optional[str] = None
+    knowledgeBase: Optional[str] = None  # Bucket to answer from, one of resources.KNOWLEDGE_BASES
+
+class ChatResponse(BaseModel):
+    sessionId: str
+    answer: str
+
+class SessionResponse(BaseModel):
+    sessionId: str
+
+class ChatSession:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.history = ConversationHistory(summarizer=chains.summarize_history)
+        self.lock = threading.Lock()  # Serializes the turns of one conversation
+        self.last_used = time.time()
+
+class SessionStore:
+    """
+    In-process store of chat sessions, shared by every request of a worker.
+    Sessions are not shared between processes, so the API runs a single worker.
+    """
+
+    def __init__(self, ttl_seconds=SESSION_TTL_SECONDS, max_sessions=MAX_SESSIONS):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _evict_expired(self):
+        now = time.time()
+        expired = [sid for sid, s in self._sessions.items() if now - s.last_used > self.ttl_seconds]
+        for sid in expired:
+            del self._sessions[sid]
+        # Still too many sessions: drop the least recently used ones
+        overflow = len(self._sessions) - self.max_sessions
+        if overflow > 0:
+            oldest = sorted(self._sessions.values(), key=lambda s: s.last_used)[:overflow]
+            for session in oldest:
+                del self._sessions[session.session_id]
+
+    def create(self):
+        with self._lock:
+            self._evict_expired()
+            session = ChatSession(uuid.uuid4().hex)
+            self._sessions[session.session_id] = session
+            return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.time()
+            return session
+
+    def get_or_create(self, session_id):
+        if session_id is None:
+            return self.create()
+        session = self.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self._sessions)
+
+sessions = SessionStore()
+
+def extract_answer(final_message):
+    """Extract the answer text from the FinalResponder message."""
+    return FinalResponse.model_validate_json(final_message.content).answer
+
+def run_turn(session, message, bucket_name=resources.DEFAULT_BUCKET):
+    """Run one conversation turn synchronously and return the answer."""
+    with session.lock:
+        session.history.append(HumanMessage(content=message))
+        config = resources.with_bucket(metrics.new_trace_config(session.session_id), bucket_name)
+        with metrics.trace_context(config):
+            session.history.maybe_summarize()
+        try:
+            response = resources.get_graph().invoke(session.history.for_graph(), config=config)
+            answer = extract_answer(response[-1])
+        except Exception as e:
+            logger.error(f"Error running chat turn for session {session.session_id}: {e}")
+            answer = f"An error occurred: {str(e)}"
+        session.history.append(AIMessage(content=answer))
+        return answer
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_turn(session, message, bucket_name=resources.DEFAULT_BUCKET):
+    """
+    Run one conversation turn and yield Server-Sent Events:
+    a 'node' event as each graph node finishes, then 'answer' and 'done'.
+    """
+    with session.lock:
+        session.history.append(HumanMessage(content=message))
+        config = resources.with_bucket(metrics.new_trace_config(session.session_id), bucket_name)
+        with metrics.trace_context(config):
+            session.history.maybe_summarize()
+        yield sse_event("session", {"sessionId": session.session_id})
+
+        answer = None
+        try:
+            for update in resources.get_graph().stream(session.history.for_graph(), config=config):
+                for node_name, output in update.items():
+                    yield sse_event("node", {"node": node_name})
+                    if node_name == "final":
+                        answer = extract_answer(output)
+            if answer is None:
+                raise ValueError("Graph finished without a final response.")
+        except Exception as e:
+            logger.error(f"Error streaming chat turn for session {session.session_id}: {e}")
+            answer = f"An error occurred: {str(e)}"
+            yield sse_event("error", {"detail": str(e)})
+
+        session.history.append(AIMessage(content=answer))
+        yield sse_event("answer", {"answer": answer})
+        yield sse_event("done", {})
+
+def knowledge_base(request):
+    """Bucket a chat request answers from; unknown buckets are rejected."""
+    bucket_name = request.knowledgeBase or resources.DEFAULT_BUCKET
+    if bucket_name not in resources.KNOWLEDGE_BASES:
+        raise HTTPException(status_code=400, detail=f"Unknown knowledge base: {bucket_name}")
+    return bucket_name
+
+app = FastAPI()
+
+# Sync handlers run in FastAPI's threadpool, so blocking graph calls never stall the event loop
+
+@app.on_event("startup")
+def warm_up():
+    # One compiled graph and default vectorstore per worker process, shared by all sessions;
+    # the other knowledge bases load on their first question
+    resources.get_graph()
+    resources.get_vectorstore()
+
+@app.get("/health")
+def health():
+    indexes = [
+        {"bucket": bucket, "version": version, "bytes": nbytes}
+        for bucket, version, nbytes in resources.loaded_indexes()
+    ]
+    return {"status": "ok", "sessions": len(sessions), "indexes": indexes}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    exposition = metrics.render()
+    if exposition is None:
+        raise HTTPException(status_code=404, detail="prometheus_client is not installed")
+    payload, content_type = exposition
+    return Response(content=payload, media_type=content_type)
+
+@app.post("/chat/sessions", response_model=SessionResponse)
+def create_session():
+    return SessionResponse(sessionId=sessions.create().session_id)
+
+@app.delete("/chat/sessions/{session_id}")
+def delete_session(session_id: str):
+    if not sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"deleted": session_id}
+
+@app.post("/chat", response_model=ChatResponse)
+def chat(request: ChatRequest):
+    bucket_name = knowledge_base(request)
+    session = sessions.get_or_create(request.sessionId)
+    answer = run_turn(session, request.message, bucket_name)
+    return ChatResponse(sessionId=session.session_id, answer=answer)
+
+@app.post("/chat/stream")
+def chat_stream(request: ChatRequest):
+    bucket_name = knowledge_base(request)
+    session = sessions.get_or_create(request.sessionId)
+    return StreamingResponse(
+        stream_turn(session, request.message, bucket_name),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,117 @@
+# Pooled SQLite access for the employee API.
+# Each pool thread keeps one persistent connection (WAL mode, cached prepared
+# statements), and the async helpers run queries on that pool, so handlers never
+# block the event loop and the database file is not reopened on every request.
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("EMPLOYEE_DB_PATH", "employee.db")
+POOL_SIZE = 8  # Threads, hence connections, per worker process
+BUSY_TIMEOUT_SECONDS = 5
+STATEMENT_CACHE_SIZE = 128  # Prepared statements kept per connection, keyed by SQL text
+
+
+class Database:
+    """SQLite database accessed through a fixed pool of threads, one connection per thread."""
+
+    def __init__(self, path=DB_PATH, pool_size=POOL_SIZE):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="sqlite")
+        self._write_listeners = []
+        self._watch_conn = None  # Dedicated connection whose data_version reveals other connections' commits
+        self._watch_lock = threading.Lock()
+
+    def add_write_listener(self, listener):
+        """Call listener() after every write made through this pool (e.g. to drop cached responses)."""
+        self._write_listeners.append(listener)
+
+    def _notify_write(self):
+        for listener in self._write_listeners:
+            listener()
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=BUSY_TIMEOUT_SECONDS,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                check_same_thread=False,  # Only used by its own thread; closed from close()
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+            logger.info(f"Opened SQLite connection to {self.path} on {threading.current_thread().name}")
+        return conn
+
+    def _fetchone(self, sql, params):
+        return self.connection().execute(sql, params).fetchone()
+
+    def _fetchall(self, sql, params):
+        return self.connection().execute(sql, params).fetchall()
+
+    def _execute(self, sql, params):
+        conn = self.connection()
+        with conn:
+            rowcount = conn.execute(sql, params).rowcount
+        self._notify_write()
+        return rowcount
+
+    def _executemany(self, sql, rows):
+        conn = self.connection()
+        with conn:
+            rowcount = conn.executemany(sql, rows).rowcount
+        self._notify_write()
+        return rowcount
+
+    def _data_version(self):
+        with self._watch_lock:
+            if self._watch_conn is None:
+                self._watch_conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+            return self._watch_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def fetch_one(self, sql, params=()):
+        return await self._run(self._fetchone, sql, params)
+
+    async def fetch_all(self, sql, params=()):
+        return await self._run(self._fetchall, sql, params)
+
+    async def execute(self, sql, params=()):
+        """Run one write statement in its own transaction and return the affected row count."""
+        return await self._run(self._execute, sql, params)
+
+    async def executemany(self, sql, rows):
+        return await self._run(self._executemany, sql, rows)
+
+    async def data_version(self):
+        """SQLite's data_version: changes whenever any other connection or process commits."""
+        return await self._run(self._data_version)
+
+    def close(self):
+        """Close every pooled connection and stop the pool."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        with self._watch_lock:
+            if self._watch_conn is not None:
+                self._watch_conn.close()
+                self._watch_conn = None
@@ -0,0 +1,210 @@
+# Versioned schema of the employee database.
+# Migrations run once each, in order, and the applied version is kept in
+# PRAGMA user_version, so starting the API never touches existing data.
+# migrate() holds an exclusive SQLite lock while it runs: when several workers
+# start together, the first applies pending migrations and the others find
+# the database up to date. Run `python -m backend.schema` to migrate before a deploy.
+import logging
+import os
+import sqlite3
+import sys
+
+from backend.db import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK_TIMEOUT_SECONDS = 60  # Workers wait this long for another one to finish migrating
+
+
+def create_base_tables(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS employee (
+            employee_code TEXT PRIMARY KEY,
+            name TEXT
+        )
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS earnings (
+            payment_date TEXT,
+            employee_code TEXT,
+            amount REAL,
+            FOREIGN KEY (employee_code) REFERENCES employee (employee_code)
+        )
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS employee_vacancy (
+            employee_code TEXT PRIMARY KEY,
+            balance_days INTEGER,
+            FOREIGN KEY (employee_code) REFERENCES employee (employee_code)
+        )
+        """
+    )
+
+
+def create_payroll_ytd(conn):
+    """
+    Create the per-employee, per-year payroll totals and the triggers that keep
+    them in step with earnings, so YTD lookups never scan the earnings history.
+    """
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_earnings_employee_date
+        ON earnings (employee_code, payment_date)
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS payroll_ytd (
+            employee_code TEXT,
+            year INTEGER,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (employee_code, year)
+        ) WITHOUT ROWID
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS earnings_ytd_insert AFTER INSERT ON earnings
+        BEGIN
+            INSERT INTO payroll_ytd (employee_code, year, total)
+            VALUES (NEW.employee_code, CAST(substr(NEW.payment_date, 1, 4) AS INTEGER), NEW.amount)
+            ON CONFLICT (employee_code, year) DO UPDATE SET total = total + excluded.total;
+        END
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS earnings_ytd_delete AFTER DELETE ON earnings
+        BEGIN
+            UPDATE payroll_ytd SET total = total - OLD.amount
+            WHERE employee_code = OLD.employee_code
+              AND year = CAST(substr(OLD.payment_date, 1, 4) AS INTEGER);
+        END
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS earnings_ytd_update AFTER UPDATE ON earnings
+        BEGIN
+            UPDATE payroll_ytd SET total = total - OLD.amount
+            WHERE employee_code = OLD.employee_code
+              AND year = CAST(substr(OLD.payment_date, 1, 4) AS INTEGER);
+            INSERT INTO payroll_ytd (employee_code, year, total)
+            VALUES (NEW.employee_code, CAST(substr(NEW.payment_date, 1, 4) AS INTEGER), NEW.amount)
+            ON CONFLICT (employee_code, year) DO UPDATE SET total = total + excluded.total;
+        END
+        """
+    )
+
+    # Totals for earnings inserted before the triggers existed
+    conn.execute("DELETE FROM payroll_ytd")
+    conn.execute(
+        """
+        INSERT INTO payroll_ytd (employee_code, year, total)
+        SELECT employee_code, CAST(substr(payment_date, 1, 4) AS INTEGER), SUM(amount)
+        FROM earnings GROUP BY 1, 2
+        """
+    )
+
+
+def seed_sample_data(conn):
+    """Insert the sample employees, only into an empty database."""
+    if conn.execute("SELECT COUNT(*) FROM employee").fetchone()[0]:
+        return
+
+    conn.executemany(
+        """
+        INSERT OR IGNORE INTO employee (employee_code, name)
+        VALUES (?, ?)
+        """,
+        [
+            ("abc123", "Allan Ferreira"),
+            ("def456", "Yan Ferreira"),
+        ],
+    )
+
+    conn.executemany(
+        """
+        INSERT OR IGNORE INTO employee_vacancy (employee_code, balance_days)
+        VALUES (?, ?)
+        """,
+        [
+            ("abc123", 10),
+            ("def456", 20),
+        ],
+    )
+
+    conn.executemany(
+        """
+        INSERT INTO earnings (payment_date, employee_code, amount)
+        VALUES (?, ?, ?)
+        """,
+        [
+            ("2025-01-01", "abc123", 50.00),
+            ("2025-01-02", "abc123", 50.00),
+            ("2025-01-01", "def456", 100.00),
+            ("2025-01-02", "def456", 100.00),
+        ],
+    )
+
+
+# (version, description, function); append new migrations, never edit applied ones
+MIGRATIONS = [
+    (1, "base tables", create_base_tables),
+    (2, "payroll_ytd totals", create_payroll_ytd),
+    (3, "sample data", seed_sample_data),
+]
+
+
+def migrate(path=DB_PATH):
+    """
+    Apply pending migrations to the database at path, creating it if needed.
+
+    Returns:
+        int: The schema version of the database
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=MIGRATION_LOCK_TIMEOUT_SECONDS, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Cheap check without the lock: nothing to do on an up-to-date database
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= MIGRATIONS[-1][0]:
+            return version
+
+        conn.execute("BEGIN EXCLUSIVE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, description, apply in MIGRATIONS:
+                if target <= version:
+                    continue
+                logger.info(f"Applying migration {target} ({description}) to {path}")
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                version = target
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return version
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    target_path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    print(f"{target_path}: schema version {migrate(target_path)}")
@@ -0,0 +1,311 @@
+"""
+Load test of the employee API (backend/api.py).
+
+Seeds a database with realistic volumes (thousands of employees, millions of
+earnings rows), starts the API with uvicorn on it, and drives the payroll,
+vacancy and batch endpoints from concurrent asyncio clients for a fixed duration.
+Reports throughput, latency percentiles and status codes per endpoint as JSON,
+so pooling, indexing and caching changes can be compared run to run.
+
+Usage:
+    python benchmarks/api_load_test.py [--employees 5000] [--earnings 2000000]
+        [--concurrency 64] [--duration 30] [--workers 1] [--mix payroll=0.45,vacancy=0.45,batch=0.1]
+        [--hot-codes 0.1] [--etag] [--db /tmp/load.db] [--url http://127.0.0.1:8000] [--output run.json]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx
+import numpy as np
+
+from backend.schema import migrate
+
+ENDPOINTS = {
+    "payroll": "/employee/payroll",
+    "vacancy": "/employee/vacancy",
+    "batch": "/employee/payroll/batch",
+}
+SEED_BATCH_ROWS = 50000
+BATCH_REQUEST_SIZE = 50  # Codes per batch request
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def employee_code(i):
+    return f"emp{i:06d}"
+
+
+def seed_database(path, employees, earnings, years=5, seed=0):
+    """
+    Fill a database with employees, vacation balances and earnings spread over
+    the last `years` years. The payroll_ytd triggers run as in production.
+    """
+    migrate(path)
+    conn = sqlite3.connect(path)
+    existing = conn.execute("SELECT COUNT(*) FROM employee WHERE employee_code LIKE 'emp%'").fetchone()[0]
+    if existing >= employees:
+        print(f"{path} already seeded with {existing} employees")
+        conn.close()
+        return
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO employee (employee_code, name) VALUES (?, ?)",
+            ((employee_code(i), f"Employee {i}") for i in range(employees)),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO employee_vacancy (employee_code, balance_days) VALUES (?, ?)",
+            ((employee_code(i), rng.randint(0, 30)) for i in range(employees)),
+        )
+
+    first_day = datetime.date.today().replace(month=1, day=1) - datetime.timedelta(days=365 * (years - 1))
+    span_days = (datetime.date.today() - first_day).days + 1
+    inserted = 0
+    while inserted < earnings:
+        count = min(SEED_BATCH_ROWS, earnings - inserted)
+        rows = [
+            (
+                (first_day + datetime.timedelta(days=rng.randrange(span_days))).isoformat(),
+                employee_code(rng.randrange(employees)),
+                round(rng.uniform(100, 5000), 2),
+            )
+            for _ in range(count)
+        ]
+        with conn:
+            conn.executemany("INSERT INTO earnings (payment_date, employee_code, amount) VALUES (?, ?, ?)", rows)
+        inserted += count
+        print(f"\rSeeded {inserted}/{earnings} earnings", end="", flush=True)
+    conn.close()
+    print(f"\nSeeded {employees} employees and {earnings} earnings in {time.perf_counter() - start:.1f}s")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(db_path, workers):
+    """Start backend.api under uvicorn on a free port and return (process, base_url)."""
+    port = free_port()
+    env = dict(os.environ, EMPLOYEE_DB_PATH=db_path)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.api:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.post(f"{base_url}/employee/vacancy", json={"employeeCode": employee_code(0)}, timeout=1)
+            return process, base_url
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API did not start within 60 seconds")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+class CodePicker:
+    """Pick employee codes; a fraction of requests go to a small hot set, as repeated chatbot questions do."""
+
+    def __init__(self, employees, hot_fraction, seed):
+        self.rng = random.Random(seed)
+        self.employees = employees
+        self.hot_fraction = hot_fraction
+        self.hot = [self.rng.randrange(employees) for _ in range(max(1, employees // 100))]
+
+    def pick(self):
+        if self.rng.random() < self.hot_fraction:
+            return employee_code(self.rng.choice(self.hot))
+        return employee_code(self.rng.randrange(self.employees))
+
+
+async def worker(client, args, mix, picker, deadline, samples, etags):
+    names, weights = list(mix), list(mix.values())
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        headers = {}
+        if name == "batch":
+            body = {"employeeCodes": [picker.pick() for _ in range(BATCH_REQUEST_SIZE)]}
+        else:
+            code = picker.pick()
+            body = {"employeeCode": code}
+            if args.etag and (name, code) in etags:
+                headers["If-None-Match"] = etags[(name, code)]
+
+        start = time.perf_counter()
+        try:
+            if args.etag and name != "batch":
+                # Conditional requests are GETs; the POST lookups carry no ETag
+                response = await client.get(ENDPOINTS[name], params=body, headers=headers)
+            else:
+                response = await client.post(ENDPOINTS[name], json=body, headers=headers)
+            status = response.status_code
+            if args.etag and name != "batch" and "ETag" in response.headers:
+                etags[(name, body["employeeCode"])] = response.headers["ETag"]
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        samples[name].append(((time.perf_counter() - start) * 1000, status))
+
+
+async def drive(base_url, args, mix):
+    picker = CodePicker(args.employees, args.hot_codes, args.seed)
+    samples = {name: [] for name in mix}
+    etags = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        # Warm-up so connection setup and first-query costs are not measured
+        warmup_deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*(
+            worker(client, args, mix, picker, warmup_deadline, {n: [] for n in mix}, etags)
+            for _ in range(args.concurrency)
+        ))
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            worker(client, args, mix, picker, deadline, samples, etags)
+            for _ in range(args.concurrency)
+        ))
+        wall_seconds = time.perf_counter() - start
+    return samples, wall_seconds
+
+
+def summarize(samples, wall_seconds):
+    endpoints = {}
+    for name, values in samples.items():
+        latencies = [ms for ms, _ in values]
+        statuses = {}
+        for _, status in values:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        endpoints[name] = {
+            "requests": len(values),
+            "requests_per_second": len(values) / wall_seconds if wall_seconds else 0.0,
+            "latency_ms": {
+                "p50": float(np.percentile(latencies, 50)) if latencies else 0.0,
+                "p95": float(np.percentile(latencies, 95)) if latencies else 0.0,
+                "p99": float(np.percentile(latencies, 99)) if latencies else 0.0,
+                "mean": float(np.mean(latencies)) if latencies else 0.0,
+            },
+            "status": statuses,
+        }
+    total = sum(len(values) for values in samples.values())
+    return endpoints, {"requests": total, "requests_per_second": total / wall_seconds if wall_seconds else 0.0}
+
+
+def run(args):
+    mix = parse_mix(args.mix)
+    work_dir = None
+    db_path = args.db
+    if db_path is None and args.url is None:
+        work_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(work_dir.name, "load.db")
+
+    process = None
+    try:
+        if db_path:
+            seed_database(db_path, args.employees, args.earnings, seed=args.seed)
+        base_url = args.url
+        if base_url is None:
+            process, base_url = start_api(db_path, args.workers)
+        samples, wall_seconds = asyncio.run(drive(base_url, args, mix))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if work_dir is not None:
+            work_dir.cleanup()
+
+    endpoints, overall = summarize(samples, wall_seconds)
+    return {
+        "run": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "config": {
+                "employees": args.employees,
+                "earnings": args.earnings,
+                "concurrency": args.concurrency,
+                "duration_seconds": args.duration,
+                "workers": args.workers,
+                "mix": mix,
+                "hot_codes": args.hot_codes,
+                "etag": args.etag,
+            },
+        },
+        "overall": overall,
+        "endpoints": endpoints,
+    }
+
+
+def print_summary(result):
+    overall = result["overall"]
+    print(f"{'overall':10s} {overall['requests']:8d} requests  {overall['requests_per_second']:9.1f} req/s")
+    for name, stats in result["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(f"{name:10s} {stats['requests']:8d} requests  {stats['requests_per_second']:9.1f} req/s  "
+              f"p50={latency['p50']:7.2f}ms p95={latency['p95']:7.2f}ms p99={latency['p99']:7.2f}ms  "
+              f"status={stats['status']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the employee API")
+    parser.add_argument("--employees", type=int, default=5000)
+    parser.add_argument("--earnings", type=int, default=2000000)
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds before the run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--mix", default="payroll=0.45,vacancy=0.45,batch=0.1",
+                        help="Endpoint weights: payroll, vacancy, batch (payroll batch of 50 codes)")
+    parser.add_argument("--hot-codes", type=float, default=0.1,
+                        help="Fraction of lookups hitting 1%% of the employees (repeat questions)")
+    parser.add_argument("--etag", action="store_true", help="Look codes up with GET, sending If-None-Match with the last ETag seen per code")
+    parser.add_argument("--db", help="Database to seed and serve (reused when already seeded); temporary by default")
+    parser.add_argument("--url", help="Test an already running API instead of starting one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the full result to this JSON file")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_summary(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Local stand-in for the employee API (backend/api.py) used by the benchmarks.
+
+It serves /employee/payroll and /employee/vacancy over HTTP with a configurable
+latency, answering GET ?employeeCode=... (with ETag / 304 revalidation, as the
+real API does) and POST {"employeeCode": ...}. Every code starting with "E" is
+a known employee; any other code answers 404.
+"""
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+EMPLOYEE_CODES = ["E1001", "E1002", "E2040", "E3177"]
+
+
+def employee_payload(endpoint, employee_code):
+    """The answer of an endpoint for a code, or None if the employee does not exist."""
+    if not employee_code.startswith("E"):
+        return None
+    number = int(hashlib.sha1(employee_code.encode("utf-8")).hexdigest()[:6], 16)
+    name = f"Employee {employee_code}"
+    if endpoint == "payroll":
+        return {"name": name, "YTDPayroll": round(20000 + number % 80000 + (number % 100) / 100, 2)}
+    return {"name": name, "vacancyBalanceDays": number % 30}
+
+
+class EmployeeAPIHandler(BaseHTTPRequestHandler):
+    latency_seconds = 0.0
+
+    def _respond(self, employee_code, conditional):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        endpoint = urlparse(self.path).path.rstrip("/").rsplit("/", 1)[-1]
+        payload = employee_payload(endpoint, employee_code or "")
+        if endpoint not in ("payroll", "vacancy") or payload is None:
+            self._send(404, {"detail": "Employee not found"})
+            return
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if conditional and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._send(200, payload, {"ETag": etag} if conditional else {})
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        codes = parse_qs(urlparse(self.path).query).get("employeeCode", [None])
+        self._respond(codes[0], conditional=True)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            employee_code = json.loads(self.rfile.read(length) or b"{}").get("employeeCode")
+        except ValueError:
+            employee_code = None
+        self._respond(employee_code, conditional=False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_employee_api_stub(latency_seconds=0.0):
+    """Serve the employee endpoints locally and return the server."""
+    EmployeeAPIHandler.latency_seconds = latency_seconds
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EmployeeAPIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,290 @@
+"""
+End-to-end latency benchmark of the Sofia MessageGraph.
+
+The real graph runs with a fake chat model (benchmarks/fake_llm.py) of configurable
+latency, local HTTP stand-ins for the vodcore title service and the employee API
+(benchmarks/fake_employee_api.py) and a FAISS index of the docs/ folder built with
+local embeddings, so no network or API key is needed. It runs concurrent multi-turn
+conversations mixing global, vendor-id, salary and vacancy questions and reports per-node latency, end-to-end p50/p95, throughput and the overhead of
+LangGraph itself compared with calling the same runnables directly.
+
+Usage:
+    python benchmarks/graph_benchmark.py [--llm-latency 0.2] [--vodcore-latency 0.05] [--employee-api-latency 0.01]
+        [--concurrency 8] [--conversations 32] [--turns 4] [--output run.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Fake LLM calls must not reach the real usage.db (and the admin cost panel):
+# usage reads its path at import, which resources pulls in through metrics
+USAGE_DIR = tempfile.TemporaryDirectory(prefix="graph-benchmark-usage-")
+os.environ["USAGE_DB_PATH"] = os.path.join(USAGE_DIR.name, "usage.db")
+
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage
+
+import resources
+from classes import FinalResponse
+from fake_employee_api import EMPLOYEE_CODES, start_employee_api_stub
+from fake_llm import FakeChatModel
+from history import ConversationHistory
+from local_embeddings import HashingEmbeddings
+from retrieval_benchmark import DEFAULT_DOCS_DIR, DEFAULT_QUESTIONS, build_index, git_commit, load_chunks
+from services import employee_api
+from services.Intranet_repository_s3 import IntranetRepository
+
+VENDOR_QUESTIONS = [
+    "What is the title for the vid is {vid}?",
+    "sku id is {vid}, which movie is that?",
+    "Can you look up vendor_id = {vid}",
+    "ID: {vid}",
+]
+VENDOR_IDS = ["0001_20120403_MOBZ_MEUPAIS", "ABC123", "XYZ789", "VID_2024_0042"]
+EMPLOYEE_QUESTIONS = [
+    "What is my salary so far this year? My employee code is {code}",
+    "How many vacation days do I have left? employee code: {code}",
+]
+UNKNOWN_EMPLOYEE_CODE = "X0000"  # Answered 404 by the stand-in
+
+
+class VodcoreHandler(BaseHTTPRequestHandler):
+    latency_seconds = 0.0
+
+    def do_GET(self):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        vendor_id = self.path.rstrip("/").rsplit("/", 1)[-1]
+        body = json.dumps({
+            "imdb_code": vendor_id,
+            "international_title": f"Title {vendor_id}",
+            "original_title": f"Original {vendor_id}",
+            "vendor_id": vendor_id,
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_vodcore_stub(latency_seconds):
+    """Serve the vodcore title endpoint locally and return the server."""
+    VodcoreHandler.latency_seconds = latency_seconds
+    server = ThreadingHTTPServer(("127.0.0.1", 0), VodcoreHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "mean": 0.0}
+    return {
+        "count": len(values),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "mean": float(np.mean(values)),
+    }
+
+
+def make_conversations(count, turns, seed=0):
+    """Build question lists for each conversation, mixing global, vendor-id and employee questions."""
+    with open(DEFAULT_QUESTIONS) as f:
+        global_questions = [item["question"] for item in json.load(f)]
+    rng = random.Random(seed)
+    conversations = []
+    for _ in range(count):
+        questions = []
+        for _ in range(turns):
+            draw = rng.random()
+            if draw < 0.2:
+                questions.append(rng.choice(VENDOR_QUESTIONS).format(vid=rng.choice(VENDOR_IDS)))
+            elif draw < 0.4:
+                code = rng.choice(EMPLOYEE_CODES + [UNKNOWN_EMPLOYEE_CODE])
+                questions.append(rng.choice(EMPLOYEE_QUESTIONS).format(code=code))
+            else:
+                questions.append(rng.choice(global_questions))
+        conversations.append(questions)
+    return conversations
+
+
+def run_turn(graph, messages):
+    """Run one turn through the graph, timing each node from the streamed updates."""
+    node_ms = {}
+    outputs = []
+    start = last = time.perf_counter()
+    for update in graph.stream(messages, stream_mode="updates"):
+        now = time.perf_counter()
+        for node, output in update.items():
+            node_ms[node] = (now - last) * 1000
+            outputs.append(output)
+        last = now
+    return (time.perf_counter() - start) * 1000, node_ms, outputs
+
+
+def run_conversation(graph, questions):
+    history = ConversationHistory()
+    turns = []
+    for question in questions:
+        history.append(HumanMessage(content=question))
+        total_ms, node_ms, outputs = run_turn(graph, history.for_graph())
+        if outputs:
+            # As in app.py: the answer, not the FinalResponder ToolMessage that for_graph() strips
+            final_message = outputs[-1][-1] if isinstance(outputs[-1], list) else outputs[-1]
+            history.append(AIMessage(content=FinalResponse.model_validate_json(final_message.content).answer))
+        turns.append({"total_ms": total_ms, "node_ms": node_ms})
+    return turns
+
+
+def run_direct(chains, sofia_logic, messages):
+    """The same pipeline as the graph, calling the runnables without LangGraph."""
+    state = list(messages)
+    state.append(chains.first_responder.invoke(state))
+    responders = {
+        "global": chains.global_responder.invoke,
+        "vendorid": chains.vid_responder.invoke,
+        "salary": chains.salary_responder,
+        "vacancy": chains.vacancy_responder,
+    }
+    route = sofia_logic.decision_flow(state)
+    if route in responders:
+        state.append(responders[route](state))
+    return chains.final_responder(state)
+
+
+def measure_overhead(graph, chains, sofia_logic, questions):
+    """Sequential graph.invoke vs direct calls over the same questions."""
+    graph_ms, direct_ms = [], []
+    for question in questions:
+        messages = [HumanMessage(content=question)]
+        start = time.perf_counter()
+        graph.invoke(messages)
+        graph_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        run_direct(chains, sofia_logic, messages)
+        direct_ms.append((time.perf_counter() - start) * 1000)
+
+    graph_stats, direct_stats = percentiles(graph_ms), percentiles(direct_ms)
+    return {
+        "graph_ms": graph_stats,
+        "direct_ms": direct_stats,
+        "overhead_ms_mean": graph_stats["mean"] - direct_stats["mean"],
+        "overhead_ms_p50": graph_stats["p50"] - direct_stats["p50"],
+    }
+
+
+def run(args):
+    server = start_vodcore_stub(args.vodcore_latency)
+    employee_server = start_employee_api_stub(args.employee_api_latency)
+    # Injection points: both must be set before chains binds the model and URL at import
+    os.environ["VODCORE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    resources.set_llm(FakeChatModel(latency_seconds=args.llm_latency))
+    # The employee API URLs are read on every lookup
+    employee_base_url = f"http://127.0.0.1:{employee_server.server_address[1]}"
+    employee_api.SALARY_ENDPOINT_URL = f"{employee_base_url}/employee/payroll"
+    employee_api.VACANCY_ENDPOINT_URL = f"{employee_base_url}/employee/vacancy"
+    import chains
+    import sofia_logic
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        chunks = load_chunks(args.docs_dir, True, True, work_dir)
+        vectorstore, _ = build_index(chunks, HashingEmbeddings())
+        resources.set_vectorstore(IntranetRepository(index_path=os.path.join(work_dir, "index")), vectorstore)
+        graph = sofia_logic.create_graph()
+
+        conversations = make_conversations(args.conversations, args.turns, args.seed)
+        # One warm-up turn so import-time and first-call costs are not measured
+        run_turn(graph, [HumanMessage(content=conversations[0][0])])
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda questions: run_conversation(graph, questions), conversations))
+        wall_seconds = time.perf_counter() - start
+
+        overhead = measure_overhead(
+            graph, chains, sofia_logic, [q for questions in conversations[:args.overhead_samples] for q in questions[:1]]
+        )
+    server.shutdown()
+    employee_server.shutdown()
+
+    turns = [turn for conversation in results for turn in conversation]
+    nodes = sorted({node for turn in turns for node in turn["node_ms"]})
+    return {
+        "run": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "config": {
+                "llm_latency_seconds": args.llm_latency,
+                "vodcore_latency_seconds": args.vodcore_latency,
+                "employee_api_latency_seconds": args.employee_api_latency,
+                "concurrency": args.concurrency,
+                "conversations": args.conversations,
+                "turns": args.turns,
+            },
+        },
+        "end_to_end_ms": percentiles([turn["total_ms"] for turn in turns]),
+        "nodes_ms": {
+            node: percentiles([turn["node_ms"][node] for turn in turns if node in turn["node_ms"]])
+            for node in nodes
+        },
+        "throughput": {
+            "wall_seconds": wall_seconds,
+            "turns_per_second": len(turns) / wall_seconds if wall_seconds else 0.0,
+        },
+        "langgraph_overhead": overhead,
+    }
+
+
+def print_summary(result):
+    e2e = result["end_to_end_ms"]
+    print(f"{'end_to_end':16s} n={e2e['count']:<5d} p50={e2e['p50']:9.2f}ms p95={e2e['p95']:9.2f}ms")
+    for node, stats in result["nodes_ms"].items():
+        print(f"{node:16s} n={stats['count']:<5d} p50={stats['p50']:9.2f}ms p95={stats['p95']:9.2f}ms")
+    print(f"{'throughput':16s} {result['throughput']['turns_per_second']:.2f} turns/s")
+    overhead = result["langgraph_overhead"]
+    print(f"{'langgraph':16s} overhead mean={overhead['overhead_ms_mean']:+.2f}ms "
+          f"p50={overhead['overhead_ms_p50']:+.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark of the chat graph")
+    parser.add_argument("--docs-dir", default=DEFAULT_DOCS_DIR)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per fake LLM call")
+    parser.add_argument("--vodcore-latency", type=float, default=0.05, help="Seconds per vodcore request")
+    parser.add_argument("--employee-api-latency", type=float, default=0.01, help="Seconds per employee API request")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--conversations", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--overhead-samples", type=int, default=10,
+                        help="Questions run sequentially to compare the graph with direct calls")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the full result to this JSON file")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_summary(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Measure the import-time cost of the application modules.
+
+Each module is imported in a fresh interpreter with `-X importtime`, so results
+are not skewed by modules already cached by a previous import.
+
+Usage:
+    python benchmarks/import_time.py [--modules chains sofia_logic app] [--top 10] [--json out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["resources", "chains", "sofia_logic", "services.Intranet_repository_s3"]
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into (cumulative_us, module) tuples."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            # Keep the indentation of the name: it encodes the nesting level
+            entries.append((int(cumulative_us.strip()), name.rstrip()[1:]))
+        except ValueError:
+            continue
+    return entries
+
+
+def measure_module(module):
+    """Import a module in a subprocess and return wall time and the heaviest imports."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    entries = parse_importtime(proc.stderr)
+    # Top-level imports are the ones without leading indentation
+    top_level = sorted(
+        ((us, name) for us, name in entries if not name.startswith(" ")),
+        reverse=True,
+    )
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "wall_seconds": round(wall, 3),
+        "import_seconds": round(sum(us for us, _ in top_level) / 1e6, 3),
+        "heaviest": [{"module": name, "seconds": round(us / 1e6, 3)} for us, name in top_level],
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode != 0 and proc.stderr else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import-time cost of application modules")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10, help="Heaviest imports to show per module")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        result = measure_module(module)
+        result["heaviest"] = result["heaviest"][:args.top]
+        results.append(result)
+
+        status = "ok" if result["ok"] else f"FAILED ({result['error']})"
+        print(f"{module}: {result['import_seconds']:.3f}s import, {result['wall_seconds']:.3f}s wall [{status}]")
+        for item in result["heaviest"]:
+            print(f"    {item['seconds']:8.3f}s  {item['module']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Deterministic local stand-in for OpenAIEmbeddings, used by the benchmarks.
+
+Texts are embedded with the hashing trick over word unigrams and character
+4-grams, so similar wording gives similar vectors without any network call.
+Absolute quality is far below a real embedding model; it is meant to compare
+chunking and index changes against each other, run to run.
+"""
+import hashlib
+import re
+import unicodedata
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashingEmbeddings(Embeddings):
+    def __init__(self, dimensions=512):
+        self.dimensions = dimensions
+
+    @staticmethod
+    def _features(text):
+        text = unicodedata.normalize("NFKD", text.lower())
+        text = "".join(c for c in text if not unicodedata.combining(c))
+        words = re.findall(r"\w+", text)
+        features = list(words)
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 4] for i in range(max(1, len(padded) - 3)))
+        return features
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "big")
+            sign = 1.0 if value >> 63 else -1.0
+            vector[value % self.dimensions] += sign
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
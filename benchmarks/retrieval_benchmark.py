@@ -0,0 +1,299 @@
+"""
+Retrieval benchmark over the docs/ corpus.
+
+Builds an index from the local docs folder with the same chunking and
+deduplication as IntranetRepository, runs a labeled question set and reports
+recall@k, MRR, query latency percentiles, build time and index size as JSON,
+so runs can be compared across chunking, embedding and index changes.
+With --quantization, the same index is also quantized (int8 and/or pq) and
+evaluated with and without float32 re-scoring, reporting the vector memory
+saved against the recall lost.
+
+Usage:
+    python benchmarks/retrieval_benchmark.py [--fixed-chunking] [--no-dedup]
+        [--embeddings local|openai] [--quantization int8,pq] [--rescore-factor 4]
+        [--output run.json] [--compare previous.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from local_embeddings import HashingEmbeddings
+from services.Intranet_repository_s3 import IntranetRepository
+from services.dedup import get_sources
+from services.quantization import (
+    QUANTIZATION_METHODS, FullVectors, min_training_vectors, quantize_vectorstore, similarity_search,
+    write_full_vectors,
+)
+
+DEFAULT_DOCS_DIR = os.path.join(ROOT, "docs")
+DEFAULT_QUESTIONS = os.path.join(ROOT, "benchmarks", "questions.json")
+K_VALUES = (1, 3, 5)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def get_embeddings(name):
+    if name == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings()
+    return HashingEmbeddings()
+
+
+def load_chunks(docs_dir, structured, dedup, index_path):
+    """Chunk the local docs folder exactly as the repository does for S3 files."""
+    repository = IntranetRepository(index_path=index_path)
+    repository.STRUCTURED_CHUNKING = structured
+    repository.DEDUPLICATE_CHUNKS = dedup
+    file_paths = [
+        (name, os.path.join(docs_dir, name))
+        for name in sorted(os.listdir(docs_dir))
+        if os.path.isfile(os.path.join(docs_dir, name))
+    ]
+    return repository.load_documents_from_file_paths(file_paths)
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def is_relevant(doc, item):
+    if item["source"] not in get_sources(doc):
+        return False
+    expected = item.get("answer_contains")
+    return expected is None or expected.lower() in doc.page_content.lower()
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def build_index(chunks, embeddings):
+    start = time.perf_counter()
+    vectorstore = FAISS.from_documents(chunks, embeddings)
+    return vectorstore, time.perf_counter() - start
+
+
+def evaluate(vectorstore, questions, k_values=K_VALUES, search=None):
+    """
+    Run the question set and return retrieval metrics.
+    search, if given, is called as search(question, k) instead of similarity_search.
+    """
+    search = search or (lambda question, k: vectorstore.similarity_search(question, k=k))
+    max_k = max(k_values)
+    hits = {k: 0 for k in k_values}
+    reciprocal_ranks = []
+    latencies = []
+    per_question = []
+
+    for item in questions:
+        start = time.perf_counter()
+        docs = search(item["question"], max_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        rank = next((i + 1 for i, doc in enumerate(docs) if is_relevant(doc, item)), None)
+        for k in k_values:
+            if rank is not None and rank <= k:
+                hits[k] += 1
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        per_question.append({
+            "question": item["question"],
+            "rank": rank,
+            "top_sources": [", ".join(get_sources(doc)) for doc in docs],
+        })
+
+    total = len(questions) or 1
+    metrics = {f"recall@{k}": hits[k] / total for k in k_values}
+    metrics["mrr"] = sum(reciprocal_ranks) / total
+    metrics["latency_ms"] = {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "mean": float(np.mean(latencies)) if latencies else 0.0,
+    }
+    return metrics, per_question
+
+
+def evaluate_quantization(index_dir, embeddings, questions, baseline, methods, rescore_factor,
+                          pq_bits=IntranetRepository.PQ_BITS, min_vectors=None):
+    """
+    Quantize the flat index saved in index_dir with each method and evaluate it
+    without and with re-scoring, against the flat baseline metrics. Methods the
+    index is too small to train are reported as skipped.
+    """
+    results = {}
+    for method in methods:
+        vectorstore = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+        flat_bytes = vectorstore.index.ntotal * vectorstore.index.code_size
+        try:
+            new_vectors = quantize_vectorstore(
+                vectorstore, method, IntranetRepository.PQ_SUBQUANTIZERS, pq_bits, min_vectors
+            )
+        except ValueError as e:
+            new_vectors, reason = None, str(e)
+        else:
+            reason = f"needs {min_training_vectors(method, pq_bits)} vectors (see --min-training-vectors)"
+        if new_vectors is None:
+            results[method] = {"skipped": reason, "vectors": vectorstore.index.ntotal}
+            continue
+        vectors_dir = os.path.join(index_dir, method)
+        os.makedirs(vectors_dir)
+        write_full_vectors(vectors_dir, vectorstore, new_vectors)
+        vectorstore.full_vectors = FullVectors.load(vectors_dir)
+        vector_bytes = vectorstore.index.ntotal * vectorstore.index.code_size
+
+        variants = {}
+        for name, factor in (("quantized", 0), ("rescored", rescore_factor)):
+            vectorstore.rescore_factor = factor
+            metrics, _ = evaluate(
+                vectorstore, questions, search=lambda question, k: similarity_search(vectorstore, question, k)
+            )
+            metrics["recall_lost"] = {
+                key: baseline[key] - metrics[key] for key in baseline if key.startswith("recall@")
+            }
+            variants[name] = metrics
+        results[method] = {
+            "flat_vector_bytes": flat_bytes,
+            "vector_bytes": vector_bytes,
+            "memory_saved": 1 - vector_bytes / flat_bytes if flat_bytes else 0.0,
+            "rescore_factor": rescore_factor,
+            **variants,
+        }
+    return results
+
+
+def run(args):
+    with open(args.questions) as f:
+        questions = json.load(f)
+    embeddings = get_embeddings(args.embeddings)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.perf_counter()
+        chunks = load_chunks(args.docs_dir, not args.fixed_chunking, not args.no_dedup, work_dir)
+        chunking_seconds = time.perf_counter() - start
+
+        vectorstore, embedding_seconds = build_index(chunks, embeddings)
+
+        index_dir = os.path.join(work_dir, "index")
+        vectorstore.save_local(index_dir)
+        index_bytes = directory_size(index_dir)
+
+        metrics, per_question = evaluate(vectorstore, questions)
+
+        quantization = None
+        if args.quantization:
+            methods = [m.strip() for m in args.quantization.split(",") if m.strip()]
+            quantization = evaluate_quantization(
+                index_dir, embeddings, questions, metrics, methods, args.rescore_factor,
+                args.pq_bits, args.min_training_vectors,
+            )
+
+    result = {
+        "run": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "config": {
+                "embeddings": args.embeddings,
+                "structured_chunking": not args.fixed_chunking,
+                "deduplication": not args.no_dedup,
+                "chunk_size": IntranetRepository.CHUNK_SIZE,
+                "chunk_overlap": IntranetRepository.CHUNK_OVERLAP,
+                "questions": len(questions),
+            },
+        },
+        "build": {
+            "chunks": len(chunks),
+            "avg_chunk_chars": float(np.mean([len(c.page_content) for c in chunks])) if chunks else 0.0,
+            "chunking_seconds": chunking_seconds,
+            "embedding_seconds": embedding_seconds,
+            "index_bytes": index_bytes,
+        },
+        "retrieval": metrics,
+        "per_question": per_question,
+    }
+    if quantization is not None:
+        result["quantization"] = quantization
+    return result
+
+
+def flatten(result):
+    """Flatten the numeric summary metrics of a result for comparison."""
+    flat = {f"build.{k}": v for k, v in result["build"].items()}
+    for key, value in result["retrieval"].items():
+        if isinstance(value, dict):
+            flat.update({f"retrieval.{key}.{k}": v for k, v in value.items()})
+        else:
+            flat[f"retrieval.{key}"] = value
+    for method, stats in result.get("quantization", {}).items():
+        if "skipped" in stats:
+            continue
+        for key in ("vector_bytes", "memory_saved"):
+            flat[f"quantization.{method}.{key}"] = stats[key]
+        for variant in ("quantized", "rescored"):
+            for key, value in stats[variant].items():
+                if key.startswith("recall@") or key == "mrr":
+                    flat[f"quantization.{method}.{variant}.{key}"] = value
+                elif key == "recall_lost":
+                    flat.update({f"quantization.{method}.{variant}.lost.{k}": v for k, v in value.items()})
+    return flat
+
+
+def print_summary(result, previous=None):
+    current = flatten(result)
+    baseline = flatten(previous) if previous else {}
+    for key, value in current.items():
+        line = f"{key:44s} {value:12.4f}"
+        if key in baseline:
+            line += f"   (was {baseline[key]:.4f}, delta {value - baseline[key]:+.4f})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval benchmark over the docs corpus")
+    parser.add_argument("--docs-dir", default=DEFAULT_DOCS_DIR)
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--embeddings", choices=["local", "openai"], default="local")
+    parser.add_argument("--fixed-chunking", action="store_true", help="Use fixed-size chunks instead of structure-aware ones")
+    parser.add_argument("--no-dedup", action="store_true", help="Disable chunk deduplication")
+    parser.add_argument("--quantization", help=f"Also evaluate quantized indexes: comma-separated {', '.join(QUANTIZATION_METHODS)}")
+    parser.add_argument("--rescore-factor", type=int, default=IntranetRepository.RESCORE_FACTOR,
+                        help="Candidates re-scored with float32 vectors, as a multiple of k")
+    parser.add_argument("--pq-bits", type=int, default=IntranetRepository.PQ_BITS)
+    parser.add_argument("--min-training-vectors", type=int,
+                        help="Quantize indexes smaller than the production minimum, e.g. the small docs/ corpus")
+    parser.add_argument("--output", help="Write the full result to this JSON file")
+    parser.add_argument("--compare", help="Previous result JSON to compare against")
+    args = parser.parse_args()
+
+    result = run(args)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_summary(result, previous)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,29 @@ import os
 from dotenv import load_dotenv
 import datetime
 from langchain_core.prompts import ChatPromptTemplate,MessagesPlaceholder
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 import requests
-from classes import ClassifyQuestion, FinalResponse, GlobalResponse, VendorIDResponse
+import uuid
+from classes import ClassifyQuestion, EmployeeDataResponse, FinalResponse, GlobalResponse, VendorIDResponse
 from langchain_core.messages import ToolMessage
 import json
-from langchain_community.vectorstores import FAISS
-from langchain.document_loaders import TextLoader
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 
-from services.Intranet_repository_s3 import IntranetRepository
+from history import strip_tool_payloads
+from services.dedup import get_sources
+from services.quantization import similarity_search
+from services import employee_api
+import resources
+import metrics
 
 load_dotenv()
 # llm = ChatOpenAI(model="gpt-3.5-turbo")
-llm = ChatOpenAI(model="gpt-4o-mini")
+llm = resources.get_llm()
 
-intranet_repository = IntranetRepository()
-vectorstore = intranet_repository.create_or_load_faiss_index()
+# Base URL of the vodcore title service (overridable, e.g. by a local stand-in in benchmarks)
+VODCORE_URL = os.getenv("VODCORE_URL", "http://vodcore.backend.sofadigital.com")
+
+# Seconds a question waits for the background index warm-up before answering without context
+WARMUP_WAIT_SECONDS = 30
 
 ### classifier ###
 actor_prompt_template = ChatPromptTemplate.from_messages(
@@ -32,13 +38,17 @@ actor_prompt_template = ChatPromptTemplate.from_messages(
             Instructions:
             1. Analyze the user's input and classify it into one of the following categories:
             - 'vendorid': Queries related to specific title.            
-            - 'global_question': General or unrelated queries.
+            - 'salary_request': Questions about the user's own salary or year-to-date payroll.
+            - 'vacancy_request': Questions about the user's own vacation balance (days left).
+            - 'global_question': General or unrelated queries, including salary or vacation policies.
             2. Identify and extract the 'vendor_id' if present. The vendor_id can appear in various forms, including but not limited to:
             - Phrases like "the vid is xxx ", "sku id is xxx", "vendor_id =s xxx", "ID: xxx", or any similar variation.
             - Formats such as alphanumeric (e.g., ABC123).
-            3. Return the response in JSON format with the following structure:
+            3. For salary and vacation requests, extract the 'employee_code' (e.g. "my code is abc123", "Employee code: def456"), from earlier messages if needed.
+            4. Return the response in JSON format with the following structure:
             - 'request_type': The identified type of request.
             - 'vendor_id': The extracted vendor code, or null if none is found.
+            - 'employee_code': The extracted employee code, or null if none is found.
             
             Be flexible in recognizing variations of phrases and contexts, ensuring high accuracy in classification and code extraction..""",
         ),
@@ -49,10 +59,45 @@ actor_prompt_template = ChatPromptTemplate.from_messages(
     time=lambda: datetime.datetime.now().isoformat(),
 )
 
-first_responder = actor_prompt_template | llm.bind_tools(
-    tools=[ClassifyQuestion], tool_choice="ClassifyQuestion"
+first_responder = strip_tool_payloads | actor_prompt_template | metrics.traced(
+    "classifier.tool_call", llm.bind_tools(tools=[ClassifyQuestion], tool_choice="ClassifyQuestion")
 )
 
+### History summary ###
+def summarize_history(previous_summary, messages):
+    """
+    Fold older conversation turns into a running summary.
+
+    Args:
+        previous_summary (str): The current summary, possibly empty
+        messages (list): Messages to be folded into the summary
+
+    Returns:
+        str: The updated summary
+    """
+    transcript = ""
+    for message in messages:
+        role = "User" if isinstance(message, HumanMessage) else "Assistant"
+        transcript += f"{role}: {message.content}\n"
+
+    prompt = f"""
+    Update the summary of a conversation between a user and an assistant.
+    Keep names, IDs and facts needed to answer follow-up questions. Be concise.
+
+    Current summary:
+    {previous_summary or "(empty)"}
+
+    New messages:
+    {transcript}
+
+    Updated summary:
+    """
+    with metrics.timed("history.summarize") as span:
+        response = llm.invoke(prompt)
+        span.record_tokens(response)
+    return response.content
+
+
 ### Final ###
 def final_responder(input_messages):
     last_message = input_messages[-1]
@@ -67,7 +112,7 @@ def final_responder(input_messages):
             answer = result['request_type'].upper()
             if 'vendor_id' in result:
                 answer += f" ({result['vendor_id']})"
-        elif tool_name in ['GlobalResponse', 'VendorIDResponse']:
+        elif tool_name in ['GlobalResponse', 'VendorIDResponse', 'EmployeeDataResponse']:
             answer = result['answer']
         else:
             raise ValueError(f"Unknown tool: {tool_name}")
@@ -94,12 +139,12 @@ def query_document(question, vectorstore, k=3):
     Returns:
         str: Concatenated context from relevant documents
     """
-    docs = vectorstore.similarity_search(question, k=k)
+    docs = similarity_search(vectorstore, question, k=k)
     if docs:
         # Format the results to include source information
         results = []
         for doc in docs:
-            source = doc.metadata.get('source', 'Unknown')
+            source = ", ".join(get_sources(doc))
             content = doc.page_content
             results.append(f"[Source: {source}]\n{content}")
         
@@ -121,7 +166,7 @@ def build_prompt_with_context(question, context):
     """
     return prompt
 
-def global_responder_logic(input_message):
+def global_responder_logic(input_message, config=None):
     last_human_message = None
     for message in reversed(input_message):
         if isinstance(message, HumanMessage): 
@@ -132,14 +177,28 @@ def global_responder_logic(input_message):
         raise ValueError("No human message found in the input messages.")
 
     # Construir contexto e criar resposta
-    context = query_document(last_human_message, vectorstore)
+    with metrics.timed("global.warmup_wait"):
+        ready = resources.wait_until_ready(timeout=WARMUP_WAIT_SECONDS)
+    if not ready:
+        context = "The knowledge base is still loading. No documents are available yet."
+    else:
+        # Knowledge base selected for the run with resources.with_bucket(); the lease
+        # keeps reindexing from swapping or updating the index during the search
+        with resources.read_index(resources.configured_bucket(config)) as vectorstore:
+            if vectorstore is None:
+                context = "No relevant information found."
+            else:
+                with metrics.timed("global.retrieval"):
+                    context = query_document(last_human_message, vectorstore)
     prompt = build_prompt_with_context(last_human_message, context)
-    response = llm.predict(prompt)
-    global_response = GlobalResponse(answer=response)
+    with metrics.timed("global.llm_predict") as span:
+        response = llm.invoke(prompt)
+        span.record_tokens(response)
+    global_response = GlobalResponse(answer=response.content)
     return global_response.json()
 
-global_responder = global_responder_logic | llm.bind_tools(
-    tools=[GlobalResponse], tool_choice="GlobalResponse"
+global_responder = global_responder_logic | metrics.traced(
+    "global.tool_call", llm.bind_tools(tools=[GlobalResponse], tool_choice="GlobalResponse")
 )
 
 ### vendor_ID ###
@@ -155,10 +214,12 @@ def vendorid_responder_logic(input_message):
             raise ValueError("vendor_id not found.")
     else:
         raise ValueError("No valid message found to extract vendor_id.")
-    url = f"http://vodcore.backend.sofadigital.com/get-title-by-vendor-id/{vendor_id}"
+    url = f"{VODCORE_URL}/get-title-by-vendor-id/{vendor_id}"
     
     try:
-        response = requests.get(url)
+        with metrics.timed("vendorid.vodcore_http", vendor_id=vendor_id) as span:
+            response = requests.get(url)
+            span.fields["status_code"] = response.status_code
         response.raise_for_status()
         api_result = response.json()
         # {"id":"707a7776-e91b-4475-a8eb-f7852ba88b39","imdb_code":"0001_20120403_MOBZ_MEUPAIS","international_title":"Meu Pa\u00eds","molten_id":null,"original_title":"Meu Pa\u00eds","production_year":null,"release_date":null,"runtime":null,"vendor_id":"0001_20120403_MOBZ_MEUPAIS"}
@@ -176,6 +237,58 @@ def vendorid_responder_logic(input_message):
         vendorid_response = VendorIDResponse(answer=f"Error: {str(e)}")
     return vendorid_response.json()
 
-vid_responder = vendorid_responder_logic | llm.bind_tools(
-    tools=[VendorIDResponse], tool_choice="VendorIDResponse"
+vid_responder = vendorid_responder_logic | metrics.traced(
+    "vendorid.tool_call", llm.bind_tools(tools=[VendorIDResponse], tool_choice="VendorIDResponse")
 )
+
+### Salary / vacation ###
+# Structured data from backend/api.py: the answer is formatted here, with no second LLM call
+def classification_arguments(input_message):
+    last_message = input_message[-1]
+    if hasattr(last_message, 'additional_kwargs') and \
+        'tool_calls' in last_message.additional_kwargs:
+        last_tool = last_message.additional_kwargs['tool_calls'][-1]
+        return json.loads(last_tool['function']['arguments'])
+    raise ValueError("No valid message found to extract employee_code.")
+
+def employee_data_message(answer):
+    """AIMessage in the tool-call format the final responder reads, built without an LLM call."""
+    response = EmployeeDataResponse(answer=answer)
+    return AIMessage(
+        content="",
+        additional_kwargs={"tool_calls": [{
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "function",
+            "function": {"name": "EmployeeDataResponse", "arguments": response.json()},
+        }]}
+    )
+
+def employee_responder(input_message, route, lookup, format_answer, subject):
+    # No LLM call on this route: record the turn so its cost is charged to the route
+    metrics.record_route(route)
+    employee_code = classification_arguments(input_message).get("employee_code")
+    if not employee_code:
+        return employee_data_message(f"Please provide your employee code so I can check your {subject}.")
+    try:
+        with metrics.timed(f"{route}.employee_api", employee_code=employee_code):
+            data = lookup(employee_code)
+        answer = format_answer(data)
+    except employee_api.EmployeeNotFound:
+        answer = f"No employee found with code {employee_code}."
+    except requests.RequestException as e:
+        answer = f"Error: {str(e)}"
+    return employee_data_message(answer)
+
+def salary_responder(input_message):
+    return employee_responder(
+        input_message, "salary", employee_api.get_payroll,
+        lambda data: f"{data['name']}, your year-to-date payroll is {data['YTDPayroll']:,.2f}.",
+        "year-to-date payroll"
+    )
+
+def vacancy_responder(input_message):
+    return employee_responder(
+        input_message, "vacancy", employee_api.get_vacancy,
+        lambda data: f"{data['name']}, you have {data['vacancyBalanceDays']} vacation days left.",
+        "vacation balance"
+    )
@@ -2,8 +2,9 @@ from typing import Optional
 from pydantic import BaseModel, Field
 
 class ClassifyQuestion(BaseModel):
-    request_type: str = Field(description="Classified type of request using 'vendorid' or 'global_question'")
+    request_type: str = Field(description="Classified type of request using 'vendorid', 'salary_request', 'vacancy_request' or 'global_question'")
     vendor_id: Optional[str] = Field(None, description="The vendor_id code extracted from the input.")
+    employee_code: Optional[str] = Field(None, description="The employee code extracted from the input.")
 
 class FinalResponse(BaseModel):
     answer: str = Field(description="Final processed answer, transformed to uppercase.")
@@ -13,3 +14,6 @@ class GlobalResponse(BaseModel):
 
 class VendorIDResponse(BaseModel):
     answer: str = Field(description="Fixed response for title questions.")
+
+class EmployeeDataResponse(BaseModel):
+    answer: str = Field(description="Answer built from the employee API, without an LLM call.")
@@ -0,0 +1,181 @@
+import logging
+from functools import lru_cache
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tokenizer used by gpt-4o-mini, or None if tiktoken is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, falling back to character estimate: {e}")
+        return None
+
+
+def count_tokens(text):
+    """Count the tokens of a string (approximated as chars / 4 without tiktoken)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(message):
+    """Count the tokens of a single message, including a small per-message overhead."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + 4
+
+
+def strip_tool_payloads(messages):
+    """
+    Remove tool-call payloads from a list of messages.
+    ToolMessages are dropped and AI messages are reduced to their plain text content,
+    so the classifier only sees the actual conversation.
+    """
+    stripped = []
+    for message in messages:
+        if isinstance(message, ToolMessage):
+            continue
+        if isinstance(message, AIMessage):
+            if not message.content:
+                continue
+            if message.tool_calls or 'tool_calls' in message.additional_kwargs:
+                message = AIMessage(content=message.content)
+        stripped.append(message)
+    return stripped
+
+
+class ConversationHistory:
+    """
+    Token-bounded conversation history.
+    Keeps the messages shown in the chat, an incremental summary of older turns,
+    and builds the message list sent to the graph within a token budget.
+    """
+    MAX_CONTEXT_TOKENS = 2000  # Budget for the messages sent to the graph
+    SUMMARY_TRIGGER_TOKENS = 2000  # Summarize when the unsummarized turns exceed this; at most MAX_CONTEXT_TOKENS
+    KEEP_RECENT_TOKENS = 1000  # Recent turns kept verbatim after summarizing
+    MAX_DISPLAY_MESSAGES = 50  # Summarized messages still kept for display
+
+    def __init__(self, summarizer=None):
+        """
+        Args:
+            summarizer: Callable (previous_summary, messages) -> str used to fold
+                older turns into the summary. If None, old turns are only trimmed.
+        """
+        self.summarizer = summarizer
+        self.messages = []
+        self.summary = ""
+        self._summarized_count = 0
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def append(self, message):
+        self.messages.append(message)
+
+    def _recent_messages(self):
+        return self.messages[self._summarized_count:]
+
+    def maybe_summarize(self):
+        """
+        Fold older turns into the summary, only when the unsummarized turns cross
+        SUMMARY_TRIGGER_TOKENS or no longer fit next to the summary in
+        MAX_CONTEXT_TOKENS, so turns are summarized before for_graph() trims them.
+        Returns True if a summary was produced.
+        """
+        if self.summarizer is None:
+            return False
+
+        budget = self.MAX_CONTEXT_TOKENS
+        if self.summary:
+            budget -= count_message_tokens(SystemMessage(content=SUMMARY_PREFIX + self.summary))
+        trigger = min(self.SUMMARY_TRIGGER_TOKENS, budget)
+        recent = strip_tool_payloads(self._recent_messages())
+        if sum(count_message_tokens(m) for m in recent) <= trigger:
+            return False
+
+        # The current turn (from the last user message on) is never summarized
+        last_question = next(
+            (i for i in range(len(self.messages) - 1, self._summarized_count - 1, -1)
+             if isinstance(self.messages[i], HumanMessage)),
+            len(self.messages) - 1,
+        )
+
+        # Keep the newest turns verbatim, summarize everything before them
+        kept_tokens = 0
+        split = len(self.messages)
+        while split > self._summarized_count + 1:
+            tokens = count_message_tokens(self.messages[split - 1])
+            if kept_tokens + tokens > min(self.KEEP_RECENT_TOKENS, trigger // 2):
+                break
+            kept_tokens += tokens
+            split -= 1
+        split = min(split, last_question)
+        # Kept turns start with a user message, as for_graph() would drop a leading reply
+        while split < last_question and not isinstance(self.messages[split], HumanMessage):
+            split += 1
+        if split <= self._summarized_count:
+            return False
+
+        to_summarize = strip_tool_payloads(self.messages[self._summarized_count:split])
+        if not to_summarize:
+            return False
+
+        try:
+            self.summary = self.summarizer(self.summary, to_summarize)
+        except Exception as e:
+            logger.error(f"Error summarizing conversation history: {e}")
+            return False
+
+        logger.info(f"Summarized {len(to_summarize)} messages into conversation summary")
+        self._summarized_count = split
+
+        # Drop summarized messages that are too old to be displayed
+        overflow = len(self.messages) - self.MAX_DISPLAY_MESSAGES
+        if overflow > 0:
+            dropped = min(overflow, self._summarized_count)
+            self.messages = self.messages[dropped:]
+            self._summarized_count -= dropped
+        return True
+
+    def for_graph(self):
+        """
+        Build the message list for the graph: the summary (if any) followed by the
+        newest turns that fit in MAX_CONTEXT_TOKENS. The last message is always kept.
+        """
+        recent = strip_tool_payloads(self._recent_messages())
+        budget = self.MAX_CONTEXT_TOKENS
+        summary_message = None
+        if self.summary:
+            summary_message = SystemMessage(content=SUMMARY_PREFIX + self.summary)
+            budget -= count_message_tokens(summary_message)
+
+        selected = []
+        used = 0
+        for message in reversed(recent):
+            tokens = count_message_tokens(message)
+            if selected and used + tokens > budget:
+                break
+            selected.append(message)
+            used += tokens
+        selected.reverse()
+
+        # The conversation sent to the classifier should start with a user turn
+        while len(selected) > 1 and not isinstance(selected[0], HumanMessage):
+            selected.pop(0)
+
+        if summary_message is not None:
+            return [summary_message] + selected
+        return selected
@@ -0,0 +1,285 @@
+# Background job runner for index maintenance.
+# Jobs run one at a time on a worker thread, so chat traffic keeps being served
+# from the current index while a new one is built. Job state is persisted to
+# JOBS_DIR as JSON, so the admin sidebar can show it across sessions and restarts.
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = "jobs"
+MAX_KEPT_JOBS = 50  # Older finished jobs are deleted from disk
+
+STAGES = ["listed", "downloaded", "extracted", "chunked", "embedded"]
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class Job:
+    def __init__(self, kind, params, job_id=None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.stage = None
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "cancel_requested": self.cancel_requested,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data["kind"], data.get("params", {}), job_id=data["id"])
+        for key in ("status", "stage", "progress", "result", "error",
+                    "created_at", "started_at", "finished_at", "cancel_requested"):
+            if key in data:
+                setattr(job, key, data[key])
+        return job
+
+
+class JobRunner:
+    """Runs registered job handlers on a single background worker thread."""
+
+    def __init__(self, jobs_dir=JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self._handlers = {}
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._load_jobs()
+
+    def register(self, kind, handler):
+        """
+        Register a handler for a job kind.
+        The handler is called as handler(progress, **params) and returns a
+        JSON-serializable result. progress(stage, done, total) raises
+        IndexBuildCancelled once the job has been cancelled.
+        """
+        self._handlers[kind] = handler
+
+    def _job_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _save(self, job):
+        # Write-then-rename so a reader never sees a half-written file
+        path = self._job_path(job.id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def _load_jobs(self):
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name)) as f:
+                    job = Job.from_dict(json.load(f))
+            except Exception as e:
+                logger.error(f"Error loading job file {name}: {e}")
+                continue
+            # Jobs left unfinished by a previous process cannot be resumed
+            if not job.finished:
+                job.status = FAILED
+                job.error = "Interrupted by application restart"
+                job.finished_at = time.time()
+                self._save(job)
+            self._jobs[job.id] = job
+
+    def _prune(self):
+        finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.created_at)
+        for job in finished[:max(0, len(self._jobs) - MAX_KEPT_JOBS)]:
+            del self._jobs[job.id]
+            try:
+                os.remove(self._job_path(job.id))
+            except OSError:
+                pass
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._work, name="job-runner", daemon=True)
+            self._worker.start()
+
+    def submit(self, kind, **params):
+        """Queue a job and return it."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind, params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            self._save(job)
+            self._ensure_worker()
+        self._queue.put(job.id)
+        logger.info(f"Queued {kind} job {job.id}")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, limit=10):
+        """Return the most recent jobs, newest first."""
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+        return jobs[:limit]
+
+    def active_job(self, kind=None):
+        """Return the queued or running job of a kind, if any."""
+        for job in self.list_jobs(limit=len(self._jobs)):
+            if not job.finished and (kind is None or job.kind == kind):
+                return job
+        return None
+
+    def cancel(self, job_id):
+        """Request cancellation; a running job stops at its next progress report."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_requested = True
+            self._save(job)
+        logger.info(f"Cancellation requested for job {job_id}")
+        return True
+
+    def _progress_callback(self, job):
+        from services.Intranet_repository_s3 import IndexBuildCancelled
+
+        def progress(stage, done, total):
+            if job.cancel_requested:
+                raise IndexBuildCancelled(f"Job {job.id} cancelled")
+            with self._lock:
+                job.stage = stage
+                job.progress[stage] = {"done": done, "total": total}
+                self._save(job)
+        return progress
+
+    def _work(self):
+        from services.Intranet_repository_s3 import IndexBuildCancelled
+        while True:
+            job_id = self._queue.get()
+            job = self.get(job_id)
+            if job is None:
+                continue
+            if job.cancel_requested:
+                self._finish(job, CANCELLED)
+                continue
+
+            with self._lock:
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._save(job)
+            logger.info(f"Running {job.kind} job {job.id}")
+
+            try:
+                result = self._handlers[job.kind](self._progress_callback(job), **job.params)
+                self._finish(job, SUCCEEDED, result=result)
+            except IndexBuildCancelled:
+                self._finish(job, CANCELLED)
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                self._finish(job, FAILED, error=str(e))
+
+    def _finish(self, job, status, result=None, error=None):
+        with self._lock:
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            self._save(job)
+        logger.info(f"Job {job.id} finished: {status}")
+
+
+def reindex_handler(progress, bucket_name):
+    """Full reindex of a bucket, publishing the new index when complete."""
+    import sofia_logic
+    repository, vectorstore, elapsed_time, doc_count = sofia_logic.force_reindex(bucket_name, progress=progress)
+    if repository is None:
+        raise RuntimeError("Reindexing failed. Check the logs for details.")
+    return {
+        "doc_count": doc_count,
+        "chunk_count": repository.last_build_stats["chunks"],
+        "elapsed_time": elapsed_time,
+        "index_version": repository.get_index_version() if vectorstore is not None else None,
+    }
+
+
+def index_document_handler(progress, bucket_name, file_key):
+    """Incremental update of a single uploaded object."""
+    import sofia_logic
+    repository, vectorstore, elapsed_time, chunk_count = sofia_logic.index_document(
+        bucket_name, file_key, progress=progress
+    )
+    return {
+        "file_key": file_key,
+        "chunk_count": chunk_count,
+        "elapsed_time": elapsed_time,
+        "index_version": repository.get_index_version() if vectorstore is not None else None,
+    }
+
+
+def remove_document_handler(progress, bucket_name, file_key):
+    """Incremental removal of a single deleted object."""
+    import sofia_logic
+    repository, vectorstore, elapsed_time, chunk_count = sofia_logic.remove_document_from_index(
+        bucket_name, file_key
+    )
+    return {
+        "file_key": file_key,
+        "chunk_count": chunk_count,
+        "elapsed_time": elapsed_time,
+        "index_version": repository.get_index_version() if vectorstore is not None else None,
+    }
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    """Return the process-wide job runner."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                runner = JobRunner()
+                runner.register("reindex", reindex_handler)
+                runner.register("index_document", index_document_handler)
+                runner.register("remove_document", remove_document_handler)
+                _runner = runner
+    return _runner
@@ -0,0 +1,215 @@
+# Tracing and latency metrics for the conversation graph.
+# Every graph node and the expensive steps inside the responders (retrieval, LLM
+# calls, vodcore HTTP) are timed, with token counts and cache hits, and exported
+# as Prometheus metrics (when prometheus_client is installed) and as one JSON log
+# line per step, tagged with the trace id of the turn.
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from langchain_core.runnables import RunnableLambda
+
+import usage as usage_accounting
+
+logger = logging.getLogger("sofia.metrics")
+
+try:
+    import prometheus_client
+except ImportError:  # Metrics are optional: structured logs still work without it
+    prometheus_client = None
+
+_trace = contextvars.ContextVar("sofia_trace", default=None)
+_server_lock = threading.Lock()
+_server_started = False
+
+if prometheus_client is not None:
+    STAGE_SECONDS = prometheus_client.Histogram(
+        "sofia_stage_duration_seconds",
+        "Duration of graph nodes and the steps inside them",
+        ["stage"],
+        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    STAGE_ERRORS = prometheus_client.Counter(
+        "sofia_stage_errors_total", "Graph nodes and steps that raised", ["stage"]
+    )
+    LLM_TOKENS = prometheus_client.Counter(
+        "sofia_llm_tokens_total", "Tokens used by LLM calls", ["stage", "kind"]
+    )
+    LLM_COST = prometheus_client.Counter(
+        "sofia_llm_cost_usd_total", "Estimated LLM spend in USD", ["stage"]
+    )
+    CACHE_REQUESTS = prometheus_client.Counter(
+        "sofia_cache_requests_total", "Cache lookups by result", ["cache", "result"]
+    )
+
+
+def log_event(event, **fields):
+    """Write one structured (JSON) log line, tagged with the current trace."""
+    record = {"event": event}
+    trace = _trace.get()
+    if trace:
+        record.update(trace)
+    record.update(fields)
+    logger.info(json.dumps(record, default=str))
+
+
+def token_usage(message):
+    """
+    Return {'input_tokens', 'output_tokens'} reported by an LLM response, or None.
+    Reads usage_metadata, falling back to OpenAI's response_metadata['token_usage'].
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return {"input_tokens": usage.get("input_tokens", 0), "output_tokens": usage.get("output_tokens", 0)}
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage")
+    if token_usage:
+        return {
+            "input_tokens": token_usage.get("prompt_tokens", 0),
+            "output_tokens": token_usage.get("completion_tokens", 0),
+        }
+    return None
+
+
+class Span:
+    """One timed step. Fields added to it are written to its log line."""
+
+    def __init__(self, stage, fields):
+        self.stage = stage
+        self.fields = dict(fields)
+
+    def record_tokens(self, message):
+        """Count the tokens of an LLM response and store them for cost accounting."""
+        usage = token_usage(message)
+        if usage is None:
+            return
+        self.fields.update(usage)
+        trace = _trace.get() or {}
+        model = (getattr(message, "response_metadata", None) or {}).get("model_name")
+        cost = usage_accounting.record_llm_call(
+            self.stage, usage, model=model,
+            session_id=trace.get("session_id"), trace_id=trace.get("trace_id"),
+        )
+        if cost is not None:
+            self.fields["cost_usd"] = round(cost, 8)
+        if prometheus_client is not None:
+            LLM_TOKENS.labels(self.stage, "input").inc(usage["input_tokens"])
+            LLM_TOKENS.labels(self.stage, "output").inc(usage["output_tokens"])
+            if cost is not None:
+                LLM_COST.labels(self.stage).inc(cost)
+
+
+def record_route(route):
+    """
+    Store a zero-token usage row for a route that answers without an LLM call,
+    so the turn (and its classifier call) is counted under that route.
+    """
+    trace = _trace.get() or {}
+    usage_accounting.record_llm_call(
+        f"{route}.route", {"input_tokens": 0, "output_tokens": 0},
+        session_id=trace.get("session_id"), trace_id=trace.get("trace_id"),
+    )
+
+
+@contextmanager
+def timed(stage, **fields):
+    """Time a block as the given stage: `with timed("global.retrieval") as span: ...`"""
+    span = Span(stage, fields)
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        yield span
+    except Exception:
+        status = "error"
+        if prometheus_client is not None:
+            STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        if prometheus_client is not None:
+            STAGE_SECONDS.labels(stage).observe(duration)
+        log_event("stage", stage=stage, duration_ms=round(duration * 1000, 2), status=status, **span.fields)
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup."""
+    result = "hit" if hit else "miss"
+    if prometheus_client is not None:
+        CACHE_REQUESTS.labels(cache, result).inc()
+    log_event("cache", cache=cache, result=result)
+
+
+def traced(stage, runnable):
+    """Wrap a runnable (e.g. a model with bound tools) so each call is timed and its tokens counted."""
+    def invoke(value, config):
+        with timed(stage) as span:
+            output = runnable.invoke(value, config)
+            span.record_tokens(output)
+            return output
+    return RunnableLambda(invoke, name=stage)
+
+
+def new_trace_config(session_id=None):
+    """Config for graph.invoke/stream that gives the turn a trace id, seen by every node."""
+    return {"metadata": {"trace_id": uuid.uuid4().hex, "session_id": session_id}}
+
+
+@contextmanager
+def trace_context(config):
+    """Make the trace of a config from new_trace_config() current for the block."""
+    metadata = (config or {}).get("metadata", {})
+    token = _trace.set({
+        "trace_id": metadata.get("trace_id"),
+        "session_id": metadata.get("session_id"),
+    })
+    try:
+        yield
+    finally:
+        _trace.reset(token)
+
+
+def traced_node(name, node):
+    """
+    Wrap a graph node (runnable or function) so its duration is recorded. The trace
+    id passed in the config metadata is made current for the steps inside the node.
+    """
+    def invoke(state, config):
+        with trace_context(config), timed(name):
+            if hasattr(node, "invoke"):
+                return node.invoke(state, config)
+            return node(state)
+    return RunnableLambda(invoke, name=name)
+
+
+def render():
+    """Return (payload, content_type) of the Prometheus exposition, or None without prometheus_client."""
+    if prometheus_client is None:
+        return None
+    registry = prometheus_client.REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Several API workers: aggregate the metrics every process wrote to the shared dir
+        from prometheus_client import multiprocess
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def start_metrics_server():
+    """
+    Expose /metrics on METRICS_PORT from this process (e.g. the Streamlit app).
+    Does nothing when METRICS_PORT is unset or prometheus_client is missing. Starts only once.
+    """
+    global _server_started
+    port = os.getenv("METRICS_PORT")
+    if not port or prometheus_client is None:
+        return False
+    with _server_lock:
+        if not _server_started:
+            prometheus_client.start_http_server(int(port))
+            _server_started = True
+            logger.info(f"Prometheus metrics served on port {port}")
+    return True
@@ -0,0 +1,288 @@
+# Process-wide resources shared by every Streamlit session and API request:
+# one LLM client, one compiled graph, and a registry holding one repository and
+# vectorstore per bucket (knowledge base), loaded lazily and evicted LRU-first
+# when the loaded indexes exceed INDEX_MEMORY_BUDGET_MB.
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+import metrics
+from services.s3_client import DEFAULT_BUCKET_NAME
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKET = os.getenv("KNOWLEDGE_BASE_BUCKET", DEFAULT_BUCKET_NAME)
+# Buckets the chat API may be asked to answer from
+KNOWLEDGE_BASES = [b.strip() for b in os.getenv("KNOWLEDGE_BASES", DEFAULT_BUCKET).split(",") if b.strip()]
+INDEX_MEMORY_BUDGET_MB = int(os.getenv("INDEX_MEMORY_BUDGET_MB", "1024"))
+LLM_MODEL = "gpt-4o-mini"
+
+_lock = threading.RLock()
+_llm = None
+_graph = None
+_indexes = OrderedDict()  # bucket_name -> _IndexEntry, least recently used first
+
+# Background warm-up state, displayed by the UI while the index loads
+_warmup_thread = None
+_ready_event = threading.Event()
+_readiness = {"state": "idle", "detail": "", "started_at": None, "finished_at": None}
+
+
+def get_llm():
+    """Return the shared chat model client."""
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                # Imported here: langchain_openai alone takes over a second to import
+                from langchain_openai import ChatOpenAI
+                load_dotenv()
+                _llm = ChatOpenAI(model=LLM_MODEL)
+    return _llm
+
+
+def set_llm(llm):
+    """
+    Replace the shared chat model, e.g. with a fake model in benchmarks.
+    Must be called before chains is imported, since its runnables bind the model at import.
+    """
+    global _llm
+    with _lock:
+        _llm = llm
+
+
+class _IndexEntry:
+    """
+    Repository of a bucket and the version of the vectorstore loaded for it.
+    The vectorstore itself is only referenced by the repository's IndexHandle.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.version = None
+        self.nbytes = 0
+        self.load_lock = threading.Lock()  # Serializes loads of this bucket only
+
+    @property
+    def vectorstore(self):
+        return self.repository.index.vectorstore
+
+    def forget(self):
+        """Reset the bookkeeping; the caller then unloads the repository outside the registry lock."""
+        self.version = None
+        self.nbytes = 0
+
+
+def _get_entry(bucket_name):
+    # The repository module (langchain vectorstores, faiss) loads with the first index, not the page
+    from services.Intranet_repository_s3 import IntranetRepository
+    with _lock:
+        entry = _indexes.get(bucket_name)
+        if entry is None:
+            entry = _indexes[bucket_name] = _IndexEntry(IntranetRepository(bucket_name=bucket_name))
+        _indexes.move_to_end(bucket_name)
+        return entry
+
+
+def _publish(entry, vectorstore, version):
+    """Record the vectorstore loaded for an entry, then evict other indexes over the memory budget."""
+    from services.Intranet_repository_s3 import index_memory_bytes
+    with _lock:
+        entry.version = version
+        entry.nbytes = index_memory_bytes(vectorstore)
+        evicted = _evict_over_budget(keep=entry)
+    # Unloading waits for the queries still reading those indexes
+    for victim in evicted:
+        victim.repository.unload_index()
+
+
+def _evict_over_budget(keep):
+    """Pick the least recently used indexes to unload until the rest fit in the memory budget."""
+    budget = INDEX_MEMORY_BUDGET_MB * 1024 * 1024
+    total = sum(e.nbytes for e in _indexes.values())
+    evicted = []
+    for bucket_name, entry in list(_indexes.items()):
+        if total <= budget:
+            break
+        if entry is keep or entry.vectorstore is None:
+            continue
+        total -= entry.nbytes
+        metrics.log_event("index.evicted", bucket=bucket_name, bytes=entry.nbytes)
+        logger.info(f"Evicting FAISS index of {bucket_name} ({entry.nbytes} bytes) over the memory budget")
+        entry.forget()
+        evicted.append(entry)
+    return evicted
+
+
+def get_repository(bucket_name=DEFAULT_BUCKET):
+    """Return the shared repository for the bucket."""
+    return _get_entry(bucket_name).repository
+
+
+def get_vectorstore(bucket_name=DEFAULT_BUCKET):
+    """
+    Return the shared vectorstore of a bucket, loading it on first use and reloading
+    it when another process or session has published a new index version.
+    Queries should search inside read_index() instead, which holds a lease on it.
+    """
+    entry = _get_entry(bucket_name)
+    repository = entry.repository
+    version = repository.get_index_version()
+    vectorstore = entry.vectorstore
+    if vectorstore is not None and version == entry.version:
+        metrics.record_cache("vectorstore", True)
+        return vectorstore
+    metrics.record_cache("vectorstore", False)
+
+    with entry.load_lock:
+        vectorstore = entry.vectorstore
+        if vectorstore is not None and version == entry.version:
+            return vectorstore
+        if vectorstore is None:
+            logger.info(f"Loading shared FAISS index of {bucket_name}")
+            vectorstore = repository.create_or_load_faiss_index()
+        else:
+            # Queries keep using the current index until the new one is swapped in
+            logger.info(f"Index version of {bucket_name} changed ({entry.version} -> {version}), reloading")
+            vectorstore = repository.reload_index()
+        # Read the version again: building a missing index publishes a new one
+        _publish(entry, vectorstore, repository.get_index_version())
+        return vectorstore
+
+
+def set_vectorstore(repository, vectorstore):
+    """Publish a freshly built vectorstore of the repository's bucket to every session of this process."""
+    entry = _get_entry(repository.bucket_name)
+    with _lock:
+        previous, entry.repository = entry.repository, repository
+    if previous is not repository:
+        # No second copy of the bucket's index stays referenced by the replaced repository
+        previous.unload_index()
+    if repository.index.vectorstore is not vectorstore:
+        repository.index.swap(vectorstore)
+    _publish(entry, vectorstore, repository.get_index_version())
+
+
+@contextmanager
+def read_index(bucket_name=DEFAULT_BUCKET):
+    """
+    Hold a read lease on a bucket's vectorstore for the duration of a query.
+    Reindexing, reloads and evictions wait for the lease, so the query sees one
+    consistent index. Yields None when the bucket has no index.
+    """
+    while True:
+        repository = get_repository(bucket_name)
+        loaded = get_vectorstore(bucket_name)
+        with repository.index.read() as vectorstore:
+            # Loaded and leased in two steps: an eviction or clear in between
+            # leaves the handle empty, so load it again instead of yielding None
+            if vectorstore is not None or loaded is None:
+                yield vectorstore
+                return
+        logger.info(f"Index of {bucket_name} was unloaded before the query leased it, loading again")
+
+
+def clear_vectorstore(bucket_name=None):
+    """
+    Drop the shared vectorstore of a bucket, or of every bucket when bucket_name
+    is None; it is reloaded on the next get_vectorstore(). Queries already
+    reading it finish first, then its memory is released.
+    """
+    with _lock:
+        buckets = list(_indexes) if bucket_name is None else [bucket_name]
+        entries = [_indexes.pop(name) for name in buckets if name in _indexes]
+    for entry in entries:
+        entry.repository.unload_index()
+
+
+def loaded_indexes():
+    """Return (bucket_name, index version, estimated bytes) of each loaded index, most recently used last."""
+    with _lock:
+        return [
+            (name, entry.version, entry.nbytes)
+            for name, entry in _indexes.items() if entry.vectorstore is not None
+        ]
+
+
+def configured_bucket(config):
+    """Bucket a graph run answers from, set in its config with with_bucket()."""
+    return ((config or {}).get("configurable") or {}).get("bucket_name") or DEFAULT_BUCKET
+
+
+def with_bucket(config, bucket_name):
+    """Select the knowledge base the global route of a graph run retrieves from."""
+    config.setdefault("configurable", {})["bucket_name"] = bucket_name
+    return config
+
+
+def summarize_history(previous_summary, messages):
+    """chains.summarize_history, importing chains (and the LLM client) on first use."""
+    import chains
+    return chains.summarize_history(previous_summary, messages)
+
+
+def get_graph():
+    """Return the shared compiled graph."""
+    global _graph
+    if _graph is None:
+        with _lock:
+            if _graph is None:
+                import sofia_logic
+                _graph = sofia_logic.create_graph()
+    return _graph
+
+
+def _warmup(bucket_name):
+    _readiness.update(state="warming", detail="Loading knowledge base...", started_at=time.time())
+    try:
+        get_graph()
+        vectorstore = get_vectorstore(bucket_name)
+        detail = "Knowledge base loaded." if vectorstore is not None else "Knowledge base is empty."
+        _readiness.update(state="ready", detail=detail)
+    except Exception as e:
+        logger.error(f"Error warming up resources: {e}")
+        _readiness.update(state="error", detail=str(e))
+    finally:
+        _readiness["finished_at"] = time.time()
+        elapsed = _readiness["finished_at"] - _readiness["started_at"]
+        logger.info(f"Warm-up finished in {elapsed:.2f}s: {_readiness['state']}")
+        _ready_event.set()
+
+
+def start_warmup(bucket_name=DEFAULT_BUCKET):
+    """
+    Load the graph and vectorstore in a background thread so the first page load
+    never waits for the index. Safe to call on every rerun: starts only once.
+    """
+    global _warmup_thread
+    with _lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(
+                target=_warmup, args=(bucket_name,), name="resources-warmup", daemon=True
+            )
+            _warmup_thread.start()
+    return get_readiness()
+
+
+def get_readiness():
+    """Return a copy of the warm-up state: idle, warming, ready or error."""
+    readiness = dict(_readiness)
+    if readiness["started_at"]:
+        end = readiness["finished_at"] or time.time()
+        readiness["elapsed"] = end - readiness["started_at"]
+    return readiness
+
+
+def wait_until_ready(timeout=None):
+    """
+    Wait for the background warm-up to finish.
+    Returns True immediately when no warm-up was started (resources load on demand).
+    """
+    if _warmup_thread is None:
+        return True
+    return _ready_event.wait(timeout)
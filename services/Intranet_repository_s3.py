@@ -1,70 +1,223 @@
 import os
 import tempfile
-import boto3
+import threading
+from services.s3_client import DEFAULT_BUCKET_NAME, get_s3_client
+from services.chunking import chunk_document
+from services.dedup import ChunkDeduplicator, get_sources
+from services.index_handle import IndexHandle
+from services.quantization import (
+    FULL_VECTORS_FILE, FULL_VECTOR_IDS_FILE, FullVectors, is_quantized, quantize_vectorstore,
+    similarity_search, write_full_vectors,
+)
 from langchain.vectorstores import FAISS
 from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 import logging
 import shutil
 import concurrent.futures
 import gc
-from docling.document_converter import DocumentConverter
+import time
+import hashlib
+import uuid
+import numpy as np
 
-def extract_from_pdf(filepath):
+def convert_pdf(filepath):
+    """Convert a PDF with Docling and return the structured DoclingDocument."""
+    # Docling pulls in torch and the layout models: import it only when a PDF is processed
+    from docling.document_converter import DocumentConverter
     converter = DocumentConverter()
     result = converter.convert(filepath)
-    return result.document.export_to_text()
+    return result.document
+
+def extract_from_pdf(filepath):
+    return convert_pdf(filepath).export_to_text()
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class IndexBuildCancelled(Exception):
+    """Raised by a progress callback to abort an index build."""
+
+def report_progress(progress, stage, done, total):
+    """Call the optional progress callback of an index build."""
+    if progress is not None:
+        progress(stage, done, total)
+
+INDEX_ROOT = "faiss_index"  # Index of the default bucket; other buckets get INDEX_ROOT-<bucket>
+
+def default_index_path(bucket_name):
+    """Directory of a bucket's index, so several buckets never overwrite each other."""
+    if bucket_name == DEFAULT_BUCKET_NAME:
+        return INDEX_ROOT
+    return f"{INDEX_ROOT}-{bucket_name}"
+
+def index_memory_bytes(vectorstore):
+    """
+    Estimate the memory held by a FAISS vectorstore: the stored vector codes
+    plus the text of the chunks in the docstore.
+    """
+    if vectorstore is None:
+        return 0
+    index = vectorstore.index
+    code_size = getattr(index, "code_size", None) or index.d * 4
+    text_bytes = sum(len(doc.page_content) for doc in vectorstore.docstore._dict.values())
+    return index.ntotal * code_size + text_bytes
+
 class IntranetRepository:
-    _instance = None  # Singleton instance
-    _vectorstore = None 
-    _initialized = False  # Flag to track initialization
+    """
+    Documents of one S3 bucket and the FAISS index built from them.
+    Each bucket gets its own instance and index directory; resources keeps one
+    instance per bucket for the whole process.
+
+    The loaded vectorstore lives in self.index, an IndexHandle: queries read it
+    under a lease and every swap or in-place update takes its write side.
+    """
     
     # Constantes para configuração
     CHUNK_SIZE = 500  # Tamanho reduzido dos chunks para 300 caracteres
     CHUNK_OVERLAP = 100  # Overlap menor para acompanhar o tamanho menor do chunk
     MAX_WORKERS = 4  # Número máximo de workers para processamento paralelo
-
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            logger.info("Creating new IntranetRepository instance")
-            cls._instance = super(IntranetRepository, cls).__new__(cls)
-            cls._initialized = False  # Reset initialization flag for new instance
-        return cls._instance
+    STRUCTURED_CHUNKING = True  # Chunk along headings/tables/lists instead of fixed-size windows
+    DEDUPLICATE_CHUNKS = True  # Store one vector for exact / near-duplicate chunks
+    NEAR_DUPLICATE_THRESHOLD = 0.8  # Min estimated Jaccard similarity for near duplicates
+    INDEX_VERSION_FILE = "version.txt"  # Pointer to the published version in INDEX_VERSIONS_DIR
+    INDEX_VERSIONS_DIR = "versions"  # One directory of index files per saved version
+    KEEP_INDEX_VERSIONS = 2  # The published version and the previous one, which readers may still be loading
+    STALE_STAGING_SECONDS = 3600  # Staging directories older than this were left by a crashed save
+    EXTRACTED_TEXT_DIR = "extracted"  # Cache of text extracted from PDFs, used by previews
+    QUANTIZATION = None  # None (float32 flat index), "int8" (scalar, 4x smaller) or "pq" (product quantization)
+    PQ_SUBQUANTIZERS = 96  # 96 one-byte codes per 1536-dim vector: 64x smaller than float32
+    PQ_BITS = 8
+    RESCORE_FACTOR = 4  # Re-rank k * RESCORE_FACTOR quantized candidates with their float32 vectors; 0 disables
 
     def __init__(self, 
-                 bucket_name="docs-projetos-chatbot", 
-                 index_path="faiss_index"):
-        # Only initialize once per instance
-        if not self._initialized:
-            logger.info(f"Initializing IntranetRepository with bucket: {bucket_name}")
-            self.bucket_name = bucket_name
-            self.index_path = index_path
-            self.s3_client = boto3.client('s3')
-            self._initialized = True  # Set initialization flag
-        elif bucket_name != self.bucket_name:
-            # Allow changing bucket_name even after initialization
-            logger.info(f"Changing bucket from {self.bucket_name} to {bucket_name}")
-            self.bucket_name = bucket_name
-            self.s3_client = boto3.client('s3')
-            
-    @classmethod
-    def reset(cls):
+                 bucket_name=DEFAULT_BUCKET_NAME, 
+                 index_path=None):
+        logger.info(f"Initializing IntranetRepository with bucket: {bucket_name}")
+        self.bucket_name = bucket_name
+        self.index_path = index_path or default_index_path(bucket_name)
+        self._s3_client = None  # Created on first use
+        self.index = IndexHandle()
+        self._update_lock = threading.RLock()  # One build or incremental update of this index at a time
+        # MinHash of indexed chunks by docstore id, kept in memory rather than in the docstore
+        self._chunk_signatures = {}
+
+    @property
+    def s3_client(self):
+        """S3 client, the shared pooled client unless one was set explicitly."""
+        if self._s3_client is None:
+            self._s3_client = get_s3_client()
+        return self._s3_client
+
+    @s3_client.setter
+    def s3_client(self, client):
+        self._s3_client = client
+
+    def unload_index(self):
+        """Drop the in-memory index once no query uses it; it is loaded again from disk on next use."""
+        self.index.clear()
+
+    def get_index_version(self):
+        """
+        Return the version of the index published on disk, or None if there is no index.
+        Falls back to the modification time of index.faiss for indexes saved without a version file.
+        """
+        version_path = os.path.join(self.index_path, self.INDEX_VERSION_FILE)
+        try:
+            with open(version_path, 'r') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            pass
+        faiss_path = os.path.join(self.index_path, "index.faiss")
+        if os.path.isfile(faiss_path):
+            return f"mtime-{os.path.getmtime(faiss_path)}"
+        return None
+
+    def publish_index_version(self, version):
+        """
+        Point version.txt at a saved version so other sessions reload it. The pointer
+        is replaced with a single rename, so readers see either the old or the new version.
         """
-        Completely reset the singleton instance.
-        This will force a new instance to be created next time.
+        version_path = os.path.join(self.index_path, self.INDEX_VERSION_FILE)
+        temp_path = f"{version_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(version)
+        os.replace(temp_path, version_path)
+        logger.info(f"Published FAISS index version {version}")
+        return version
+
+    def _index_dir(self, version):
+        """Directory holding the files of an index version; indexes saved before versioned directories live in index_path."""
+        if version:
+            version_dir = os.path.join(self.index_path, self.INDEX_VERSIONS_DIR, version)
+            if os.path.isdir(version_dir):
+                return version_dir
+        return self.index_path
+
+    def _remove_old_versions(self, current):
+        """
+        Delete saved versions older than the last KEEP_INDEX_VERSIONS, never the current
+        one, and staging directories left by saves that crashed before their rename.
+        Recent staging directories may belong to a save running in another process.
+        """
+        versions_dir = os.path.join(self.index_path, self.INDEX_VERSIONS_DIR)
+        names = os.listdir(versions_dir)
+        versions = sorted(
+            (name for name in names if not name.startswith(".") and name != current),
+            key=lambda name: (len(name), name),
+        )
+        stale = versions[:max(len(versions) - (self.KEEP_INDEX_VERSIONS - 1), 0)]
+        for name in names:
+            if name.startswith(".staging-"):
+                try:
+                    age = time.time() - os.path.getmtime(os.path.join(versions_dir, name))
+                except OSError:
+                    continue
+                if age > self.STALE_STAGING_SECONDS:
+                    stale.append(name)
+        for name in stale:
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+
+    def reload_index(self):
         """
-        logger.info("Resetting IntranetRepository singleton")
-        cls._instance = None
-        cls._vectorstore = None
-        cls._initialized = False
-        return True
+        Load the index currently on disk and swap it in. Queries keep using the
+        previous index until the new one is loaded, so there is no window without one.
+        """
+        vectorstore = self._load_local()
+        if vectorstore is None:
+            return self.create_or_load_faiss_index()
+        self.index.swap(vectorstore)
+        return vectorstore
+
+    def _extracted_text_path(self, file_key):
+        digest = hashlib.sha1(file_key.encode('utf-8')).hexdigest()
+        return os.path.join(self.index_path, self.EXTRACTED_TEXT_DIR, f"{digest}.txt")
+
+    def save_extracted_text(self, file_key, text):
+        """Cache the text extracted from a document so previews never re-run extraction."""
+        path = self._extracted_text_path(file_key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        except Exception as e:
+            logger.warning(f"Error caching extracted text for {file_key}: {e}")
+
+    def get_extracted_text(self, file_key):
+        """Return the cached extracted text of a document, or None if it was never extracted."""
+        try:
+            with open(self._extracted_text_path(file_key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete_extracted_text(self, file_key):
+        try:
+            os.remove(self._extracted_text_path(file_key))
+        except FileNotFoundError:
+            pass
 
     def list_documents_in_bucket(self):
         """List all documents in the S3 bucket without filtering by file type."""
@@ -102,13 +255,18 @@ class IntranetRepository:
             logger.error(f"Error downloading {file_key}: {e}")
             return None
 
-    def download_files_from_s3(self):
-        """Download all files from S3 to a temporary directory and return their paths."""
+    def download_files_from_s3(self, progress=None):
+        """
+        Download all files from S3 to a temporary directory and return their paths.
+        progress, if given, is called as progress(stage, done, total) for the
+        'listed' and 'downloaded' stages.
+        """
         temp_dir = tempfile.mkdtemp()
         file_paths = []
         
         try:
             files = self.list_documents_in_bucket()
+            report_progress(progress, "listed", len(files), len(files))
             if not files:
                 return temp_dir, []
                 
@@ -118,13 +276,22 @@ class IntranetRepository:
             with concurrent.futures.ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
                 futures = [executor.submit(self.download_file, file_key, temp_dir) for file_key in files]
                 
-                for future in concurrent.futures.as_completed(futures):
-                    result = future.result()
-                    if result:
-                        file_paths.append(result)
+                try:
+                    for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                        result = future.result()
+                        if result:
+                            file_paths.append(result)
+                        report_progress(progress, "downloaded", done, len(files))
+                except IndexBuildCancelled:
+                    for future in futures:
+                        future.cancel()
+                    raise
                 
             logger.info(f"Successfully downloaded {len(file_paths)} files to {temp_dir}")
             return temp_dir, file_paths
+        except IndexBuildCancelled:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
         except Exception as e:
             logger.error(f"Error in download process: {e}")
             raise
@@ -147,9 +314,12 @@ class IntranetRepository:
             file_ext = os.path.splitext(file_path)[1].lower()
             
             # Read content based on file extension
+            dl_doc = None
             if file_ext == '.pdf':
                 try:
-                    text_content = extract_from_pdf(file_path)
+                    dl_doc = convert_pdf(file_path)
+                    text_content = dl_doc.export_to_text()
+                    self.save_extracted_text(file_key, text_content)
                     logger.info(f"Successfully extracted content from PDF file: {file_key}")
                 except Exception as pdf_err:
                     logger.warning(f"Error extracting content from PDF {file_key}: {pdf_err}")
@@ -167,23 +337,26 @@ class IntranetRepository:
                 logger.info(f"Skipping unsupported file type: {file_ext} for {file_key}")
                 return []
                 
-            # Create a document
-            doc = Document(
-                page_content=text_content,
-                metadata={
-                    'source': file_key,
-                    'file_type': file_ext,
-                    'size': os.path.getsize(file_path)
-                }
-            )
-            
-            # Dividir em chunks menores
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=self.CHUNK_SIZE,
-                chunk_overlap=self.CHUNK_OVERLAP
-            )
+            metadata = {
+                'source': file_key,
+                'file_type': file_ext,
+                'size': os.path.getsize(file_path)
+            }
             
-            chunks = text_splitter.split_documents([doc])
+            if self.STRUCTURED_CHUNKING:
+                # Chunks seguem a estrutura do documento (seções, tabelas, listas)
+                chunks = chunk_document(
+                    text_content, metadata, file_ext,
+                    self.CHUNK_SIZE, self.CHUNK_OVERLAP, dl_doc=dl_doc
+                )
+            else:
+                # Dividir em chunks menores
+                doc = Document(page_content=text_content, metadata=metadata)
+                text_splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=self.CHUNK_SIZE,
+                    chunk_overlap=self.CHUNK_OVERLAP
+                )
+                chunks = text_splitter.split_documents([doc])
             
             # Garantir que todos os chunks mantenham a informação de origem
             for chunk in chunks:
@@ -196,8 +369,11 @@ class IntranetRepository:
         except Exception as e:
             logger.error(f"Error processing file {file_key}: {e}")
             return []
-    def load_documents_from_file_paths(self, file_paths):
-        """Load documents from file paths and return a list of Document objects."""
+    def load_documents_from_file_paths(self, file_paths, progress=None):
+        """
+        Load documents from file paths and return a list of Document objects.
+        progress, if given, is called for the 'extracted' (files) and 'chunked' (chunks) stages.
+        """
         if not file_paths:
             logger.warning("No file paths provided to load documents from")
             return []
@@ -209,18 +385,28 @@ class IntranetRepository:
         with concurrent.futures.ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
             futures = [executor.submit(self.process_single_file, file_info) for file_info in file_paths]
             
-            for future in concurrent.futures.as_completed(futures):
-                chunks = future.result()
-                all_documents.extend(chunks)
+            try:
+                for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    chunks = future.result()
+                    all_documents.extend(chunks)
+                    report_progress(progress, "extracted", done, len(file_paths))
+                    report_progress(progress, "chunked", len(all_documents), None)
+            except IndexBuildCancelled:
+                for future in futures:
+                    future.cancel()
+                raise
         
-        # Agrupar por fonte para logging
+        if self.DEDUPLICATE_CHUNKS:
+            # Ordem estável: o primeiro documento (por chave) mantém o chunk canônico
+            all_documents.sort(key=lambda doc: doc.metadata.get('source', ''))
+            all_documents = ChunkDeduplicator(self.NEAR_DUPLICATE_THRESHOLD).deduplicate(all_documents)
+            report_progress(progress, "chunked", len(all_documents), None)
+        
+        # Agrupar por fonte para logging (chunks deduplicados contam para cada fonte)
         sources = {}
         for doc in all_documents:
-            source = doc.metadata.get('source', 'Unknown')
-            if source in sources:
-                sources[source] += 1
-            else:
-                sources[source] = 1
+            for source in get_sources(doc):
+                sources[source] = sources.get(source, 0) + 1
                 
         # Log estatísticas
         logger.info(f"Total chunks created: {len(all_documents)}")
@@ -229,113 +415,332 @@ class IntranetRepository:
             
         return all_documents
 
+    def _load_local(self):
+        """Load the index version published in index_path, or None if there is none or it cannot be read."""
+        index_dir = self._index_dir(self.get_index_version())
+        if not os.path.isfile(os.path.join(index_dir, "index.faiss")):
+            return None
+        logger.info(f"Loading FAISS index from {index_dir}")
+        try:
+            vectorstore = FAISS.load_local(
+                index_dir,
+                OpenAIEmbeddings(),
+                allow_dangerous_deserialization=True
+            )
+            self._attach_full_vectors(vectorstore, index_dir)
+            logger.info("Successfully loaded FAISS index")
+            return vectorstore
+        except Exception as e:
+            logger.error(f"Error loading FAISS index: {e}")
+            return None
+
     def create_or_load_faiss_index(self, force_rebuild=False):
         """
         Create or load a FAISS index.
         If force_rebuild is True, it will rebuild the index even if it exists.
         """
         # Se temos o vectorstore em memória e não precisamos reconstruir, retorne-o
-        if IntranetRepository._vectorstore is not None and not force_rebuild:
+        vectorstore = self.index.vectorstore
+        if vectorstore is not None and not force_rebuild:
             logger.info("Reusing existing FAISS index from memory.")
-            return IntranetRepository._vectorstore
+            return vectorstore
 
         # Se o índice existir em disco e não precisamos reconstruir, carregue-o
-        if os.path.exists(self.index_path) and os.path.isfile(f"{self.index_path}/index.faiss") and not force_rebuild:
-            logger.info(f"Loading FAISS index from {self.index_path}")
-            try:
-                IntranetRepository._vectorstore = FAISS.load_local(
-                    self.index_path,
-                    OpenAIEmbeddings(),
-                    allow_dangerous_deserialization=True
-                )
-                logger.info("Successfully loaded FAISS index")
-                return IntranetRepository._vectorstore
-            except Exception as e:
-                logger.error(f"Error loading FAISS index: {e}")
-                logger.info("Will rebuild the index...")
-                # Continue to rebuild the index
+        if not force_rebuild:
+            vectorstore = self._load_local()
+            if vectorstore is not None:
+                self.index.swap(vectorstore)
+                return vectorstore
+            logger.info("No readable FAISS index on disk, building it...")
         
         # Create new index
-        logger.info(f"Creating FAISS index from S3 documents")
-        
         try:
-            # Download all files from S3
-            logger.info("Starting download from S3")
-            temp_dir, file_paths = self.download_files_from_s3()
+            return self.build_index()
+        except IndexBuildCancelled:
+            logger.info("FAISS index build cancelled")
+            return None
+        except Exception as e:
+            logger.error(f"Error creating FAISS index: {e}")
+            return None
+
+    def build_index(self, progress=None):
+        """
+        Build a new FAISS index from the S3 documents and publish it.
+        The index currently in memory and on disk keeps serving queries until the
+        new one is saved and swapped in, so reindexing never leaves readers without an index.
+
+        Args:
+            progress: Optional callable progress(stage, done, total), called for the
+                'listed', 'downloaded', 'extracted', 'chunked' and 'embedded' stages.
+                It may raise IndexBuildCancelled to abort the build.
+
+        Returns:
+            The new FAISS vectorstore, or None if the bucket has no indexable documents.
+        """
+        # Updates made while the new index is built would be lost when it is swapped in
+        with self._update_lock:
+            logger.info(f"Creating FAISS index from S3 documents")
+            self.last_build_stats = {"files": 0, "chunks": 0}
+            temp_dir = None
+        
+            try:
+                # Download all files from S3
+                logger.info("Starting download from S3")
+                temp_dir, file_paths = self.download_files_from_s3(progress)
+                self.last_build_stats["files"] = len(file_paths)
             
-            if not file_paths:
-                logger.warning("No files found in the S3 bucket.")
-                return None
+                if not file_paths:
+                    logger.warning("No files found in the S3 bucket.")
+                    return None
             
-            # Load and process documents from downloaded files
-            logger.info("Processing downloaded files")
-            chunks = self.load_documents_from_file_paths(file_paths)
+                # Load and process documents from downloaded files
+                logger.info("Processing downloaded files")
+                chunks = self.load_documents_from_file_paths(file_paths, progress)
+                self.last_build_stats["chunks"] = len(chunks)
             
-            if not chunks:
-                logger.warning("No chunks created from files.")
-                # Clean up temporary directory
-                shutil.rmtree(temp_dir)
-                return None
+                if not chunks:
+                    logger.warning("No chunks created from files.")
+                    return None
             
-            # Create embeddings and FAISS index
-            logger.info(f"Creating FAISS index from {len(chunks)} chunks")
-            embeddings = OpenAIEmbeddings()
+                # Create embeddings and FAISS index
+                logger.info(f"Creating FAISS index from {len(chunks)} chunks")
+                embeddings = OpenAIEmbeddings()
             
-            # Criar índice em lotes para evitar problemas de memória
-            batch_size = 100  # Tamanho do lote para criação do índice
-            if len(chunks) <= batch_size:
-                # Criar índice diretamente se o número de chunks for pequeno
-                IntranetRepository._vectorstore = FAISS.from_documents(chunks, embeddings)
-            else:
-                # Criar índice por lotes para conjuntos maiores
-                logger.info(f"Creating index in batches of {batch_size} chunks")
-                # Criar primeiro lote
-                first_batch = chunks[:batch_size]
-                IntranetRepository._vectorstore = FAISS.from_documents(first_batch, embeddings)
-                
-                # Adicionar lotes restantes
-                for i in range(batch_size, len(chunks), batch_size):
+                # Criar índice em lotes para evitar problemas de memória
+                batch_size = 100  # Tamanho do lote para criação do índice
+                vectorstore = None
+                for i in range(0, len(chunks), batch_size):
                     end_idx = min(i + batch_size, len(chunks))
                     logger.info(f"Adding batch {i//batch_size + 1}: chunks {i} to {end_idx}")
                     batch = chunks[i:end_idx]
-                    if batch:  # Verificar se o lote não está vazio
-                        IntranetRepository._vectorstore.add_documents(batch)
-            
-            # Ensure the directory exists
-            os.makedirs(self.index_path, exist_ok=True)
+                    if vectorstore is None:
+                        vectorstore = FAISS.from_documents(batch, embeddings)
+                    else:
+                        vectorstore.add_documents(batch)
+                    report_progress(progress, "embedded", end_idx, len(chunks))
             
-            # Save the index
-            IntranetRepository._vectorstore.save_local(self.index_path)
-            logger.info(f"FAISS index created and saved to {self.index_path}")
+                # Save the index and swap it in only once it is complete
+                self.save_index(vectorstore, self._quantize(vectorstore))
+                self.index.swap(vectorstore)
+                self._chunk_signatures.clear()  # Every chunk has a new id
+                logger.info(f"FAISS index created and saved to {self.index_path}")
             
-            # Clean up temporary directory
-            shutil.rmtree(temp_dir)
-            logger.info(f"Temporary directory {temp_dir} removed")
-            
-            return IntranetRepository._vectorstore
-            
-        except Exception as e:
-            logger.error(f"Error creating FAISS index: {e}")
-            if 'temp_dir' in locals() and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
+                return vectorstore
+            finally:
+                # Clean up temporary directory
+                if temp_dir and os.path.exists(temp_dir):
+                    shutil.rmtree(temp_dir)
+                    logger.info(f"Temporary directory {temp_dir} removed")
+
+    def _quantize(self, vectorstore):
+        """
+        Quantize a vectorstore built from the whole bucket when QUANTIZATION is set
+        and it has enough vectors to train on. Returns its float32 vectors for
+        save_index, or None when the index stays flat.
+        """
+        if not self.QUANTIZATION:
             return None
+        return quantize_vectorstore(vectorstore, self.QUANTIZATION, self.PQ_SUBQUANTIZERS, self.PQ_BITS)
+
+    def _attach_full_vectors(self, vectorstore, index_dir):
+        """Memory-map the float32 vectors saved with a quantized index, used to re-score its results."""
+        if is_quantized(vectorstore.index):
+            vectorstore.full_vectors = FullVectors.load(index_dir)
+            vectorstore.rescore_factor = self.RESCORE_FACTOR
+
+    def save_index(self, vectorstore, new_vectors=None):
+        """
+        Save a vectorstore as a new version directory under index_path and publish it.
+        The files are written to a staging directory, which is renamed to the version
+        directory once complete; version.txt is then switched to it with one rename,
+        so readers load every file from the same version. Quantized indexes are saved
+        with the float32 vector of each chunk, taken from new_vectors ({docstore id:
+        vector}) for the chunks just embedded and from the previous save for the others.
+        """
+        version = str(time.time_ns())
+        versions_dir = os.path.join(self.index_path, self.INDEX_VERSIONS_DIR)
+        os.makedirs(versions_dir, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(dir=versions_dir, prefix=".staging-")
+        version_dir = os.path.join(versions_dir, version)
+        try:
+            vectorstore.save_local(staging_dir)
+            if is_quantized(vectorstore.index):
+                write_full_vectors(staging_dir, vectorstore, new_vectors)
+            os.rename(staging_dir, version_dir)
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        self._attach_full_vectors(vectorstore, version_dir)
+        self.publish_index_version(version)
+        self._remove_old_versions(version)
+        return version
+
+    def _detach_source(self, vectorstore, file_key):
+        """
+        Detach file_key from the chunks of the index.
+        Chunks shared with other documents (deduplicated) only lose the reference;
+        returns the docstore ids of chunks that belonged to file_key alone.
+        """
+        ids = []
+        for doc_id, doc in vectorstore.docstore._dict.items():
+            sources = get_sources(doc)
+            if file_key not in sources:
+                continue
+            remaining = [source for source in sources if source != file_key]
+            if not remaining:
+                ids.append(doc_id)
+                continue
+            doc.metadata['source'] = remaining[0]
+            if len(remaining) > 1:
+                doc.metadata['sources'] = remaining
+            else:
+                doc.metadata.pop('sources', None)
+        return ids
+
+    def _forget_signatures(self, doc_ids):
+        for doc_id in doc_ids:
+            self._chunk_signatures.pop(doc_id, None)
+
+    def _owned_chunk_ids(self, vectorstore, file_key):
+        """Docstore ids of the chunks that belong to file_key alone, without changing the index."""
+        return {
+            doc_id for doc_id, doc in vectorstore.docstore._dict.items()
+            if get_sources(doc) == [file_key]
+        }
+
+    def index_document(self, file_key, progress=None):
+        """
+        Incrementally (re)index a single S3 object in the current index.
+        Chunks previously indexed from the same object are replaced.
+        Embeddings are computed before taking the index's write lock, so queries
+        only wait for the in-memory update itself.
+
+        Args:
+            file_key: The key of the file in S3 bucket
+            progress: Optional callable progress(stage, done, total)
+
+        Returns:
+            tuple: (vectorstore, number of chunks added)
+        """
+        with self._update_lock:
+            vectorstore = self.create_or_load_faiss_index()
+            temp_dir = tempfile.mkdtemp()
+            try:
+                file_info = self.download_file(file_key, temp_dir)
+                if file_info is None:
+                    raise ValueError(f"Could not download {file_key} from bucket {self.bucket_name}")
+                report_progress(progress, "downloaded", 1, 1)
+
+                chunks = self.process_single_file(file_info)
+                report_progress(progress, "extracted", 1, 1)
+                report_progress(progress, "chunked", len(chunks), len(chunks))
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+            # Random ids, as FAISS.from_documents uses: the chunks of an object are found
+            # by their sources, and a chunk kept for another object after a re-upload
+            # must not collide with the new ones
+            ids = [str(uuid.uuid4()) for _ in chunks]
+
+            if vectorstore is None:
+                if self.DEDUPLICATE_CHUNKS:
+                    chunks = ChunkDeduplicator(self.NEAR_DUPLICATE_THRESHOLD).deduplicate(chunks)
+                    ids = ids[:len(chunks)]
+                if not chunks:
+                    return None, 0
+                # Kept flat: a quantizer trained on one document would encode every later one
+                vectorstore = FAISS.from_documents(chunks, OpenAIEmbeddings(), ids=ids)
+                report_progress(progress, "embedded", len(chunks), len(chunks))
+                self.save_index(vectorstore)
+                self.index.swap(vectorstore)
+                logger.info(f"Indexed {file_key}: {len(chunks)} chunks")
+                return vectorstore, len(chunks)
+
+            # The old chunks of this object are replaced, so they are not duplicate candidates
+            stale_ids = self._owned_chunk_ids(vectorstore, file_key)
+            merges = []
+            if self.DEDUPLICATE_CHUNKS and chunks:
+                # Chunks already in the index only gain a source reference
+                deduplicator = ChunkDeduplicator(self.NEAR_DUPLICATE_THRESHOLD, self._chunk_signatures)
+                for doc_id, doc in vectorstore.docstore._dict.items():
+                    if doc_id not in stale_ids:
+                        deduplicator.register(doc, key=doc_id)
+                kept_chunks, kept_ids = [], []
+                for chunk, chunk_id in zip(chunks, ids):
+                    key = deduplicator.find_duplicate(chunk)
+                    if key is None:
+                        deduplicator.register(chunk, key=chunk_id)
+                        kept_chunks.append(chunk)
+                        kept_ids.append(chunk_id)
+                    else:
+                        merges.append((key, chunk))
+                chunks, ids = kept_chunks, kept_ids
+
+            texts = [chunk.page_content for chunk in chunks]
+            vectors = OpenAIEmbeddings().embed_documents(texts) if chunks else []
+            report_progress(progress, "embedded", len(chunks), len(chunks))
+
+            with self.index.write():
+                stale_ids = self._detach_source(vectorstore, file_key)
+                if stale_ids:
+                    vectorstore.delete(stale_ids)
+                    self._forget_signatures(stale_ids)
+                    logger.info(f"Removed {len(stale_ids)} stale chunks of {file_key}")
+                for key, chunk in merges:
+                    deduplicator.merge_source(key, chunk)
+                if chunks:
+                    vectorstore.add_embeddings(
+                        list(zip(texts, vectors)),
+                        metadatas=[chunk.metadata for chunk in chunks],
+                        ids=ids,
+                    )
+
+            # Quantized indexes keep the float32 vectors on disk for re-scoring
+            new_vectors = None
+            if chunks and is_quantized(vectorstore.index):
+                new_vectors = dict(zip(ids, np.asarray(vectors, dtype=np.float32)))
+            self.save_index(vectorstore, new_vectors)
+            logger.info(f"Indexed {file_key}: {len(chunks)} chunks")
+            return vectorstore, len(chunks)
+
+    def remove_document(self, file_key):
+        """
+        Remove every chunk of a single S3 object from the current index.
+
+        Returns:
+            tuple: (vectorstore, number of chunks removed)
+        """
+        self.delete_extracted_text(file_key)
+        with self._update_lock:
+            vectorstore = self.create_or_load_faiss_index()
+            if vectorstore is None:
+                return None, 0
+
+            with self.index.write():
+                ids = self._detach_source(vectorstore, file_key)
+                if ids:
+                    vectorstore.delete(ids)
+                    self._forget_signatures(ids)
+            self.save_index(vectorstore)
+        logger.info(f"Removed {file_key} from index: {len(ids)} chunks")
+        return vectorstore, len(ids)
 
     def query_document(self, question, k=3):
         """Query the FAISS index with a question and return relevant context."""
-        if IntranetRepository._vectorstore is None:
+        if self.index.vectorstore is None:
             logger.error("FAISS index is not loaded. Trying to load it now.")
             self.create_or_load_faiss_index()
-            
-            if IntranetRepository._vectorstore is None:
-                raise ValueError("Failed to load FAISS index. Call create_or_load_faiss_index first.")
         
-        docs = IntranetRepository._vectorstore.similarity_search(question, k=k)
+        with self.index.read() as vectorstore:
+            if vectorstore is None:
+                raise ValueError("Failed to load FAISS index. Call create_or_load_faiss_index first.")
+            docs = similarity_search(vectorstore, question, k=k)
         
         if docs:
             # Format the results to include source information
             results = []
             for doc in docs:
-                source = doc.metadata.get('source', 'Unknown')
+                source = ", ".join(get_sources(doc))
                 content = doc.page_content
                 results.append(f"[Source: {source}]\n{content}")
             
@@ -344,42 +749,14 @@ class IntranetRepository:
         return "No relevant information found."
         
     def force_rebuild_index(self):
-        """Force rebuild the index from scratch with clean memory."""
-        # Limpar índice existente
-        logger.info(f"Attempting to remove existing index at {self.index_path}")
-        
-        try:
-            # Limpar a referência em memória
-            IntranetRepository._vectorstore = None
-            
-            # Verificar e remover os arquivos específicos primeiro
-            index_files = [
-                os.path.join(self.index_path, "index.faiss"),
-                os.path.join(self.index_path, "index.pkl")
-            ]
-            
-            for file_path in index_files:
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                        logger.info(f"Successfully removed {file_path}")
-                    except Exception as e:
-                        logger.error(f"Error removing {file_path}: {e}")
-            
-            # Verificar se o diretório está vazio e removê-lo se estiver
-            if os.path.exists(self.index_path) and os.path.isdir(self.index_path):
-                if not os.listdir(self.index_path):  # Se estiver vazio
-                    try:
-                        os.rmdir(self.index_path)
-                        logger.info(f"Successfully removed empty directory {self.index_path}")
-                    except Exception as e:
-                        logger.error(f"Error removing directory {self.index_path}: {e}")
-        except Exception as e:
-            logger.error(f"Error during index cleanup: {e}")
-        
-        # Forçar garbage collection para limpar referências
-        gc.collect()
-        
-        # Recriar o índice com force_rebuild=True para garantir nova criação
+        """
+        Force rebuild the index from scratch, ignoring the files on disk.
+        The current index keeps serving queries until the new one is swapped in,
+        and the files on disk are only replaced once the new index is saved.
+        """
         logger.info("Rebuilding index from scratch")
-        return self.create_or_load_faiss_index(force_rebuild=True)
\ No newline at end of file
+        vectorstore = self.create_or_load_faiss_index(force_rebuild=True)
+
+        # The previous index is released by the swap: collect it now
+        gc.collect()
+        return vectorstore
@@ -0,0 +1,178 @@
+import re
+import logging
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+HEADING_SEPARATOR = " > "
+MIN_SECTION_TEXT_CHARS = 100  # Espaço mínimo para texto quando o caminho de títulos é muito longo
+MAX_QUESTION_HEADING_CHARS = 200  # Linhas curtas terminadas em "?" abrem uma seção (FAQ)
+
+_MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_MARKDOWN_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+class Section:
+    """A structural unit of a document: its heading path, text and kind (text, table or list)."""
+
+    def __init__(self, headings, text, kind="text"):
+        self.headings = list(headings)
+        self.text = text.strip()
+        self.kind = kind
+
+
+def markdown_sections(text):
+    """Split Markdown into sections at headings, tracking the heading path. Code fences are kept intact."""
+    sections = []
+    headings = []
+    buffer = []
+    in_fence = False
+
+    def flush():
+        if "".join(buffer).strip():
+            sections.append(Section(headings, "\n".join(buffer)))
+        buffer.clear()
+
+    for line in text.splitlines():
+        if _MARKDOWN_FENCE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _MARKDOWN_HEADING.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            headings = headings[:level - 1] + [match.group(2)]
+        else:
+            buffer.append(line)
+    flush()
+    return sections
+
+
+def text_sections(text):
+    """
+    Split plain text into paragraphs. A short paragraph ending with '?' (FAQ style)
+    becomes the heading of the paragraphs that follow it.
+    """
+    sections = []
+    heading = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if paragraph.endswith("?") and "\n" not in paragraph and len(paragraph) <= MAX_QUESTION_HEADING_CHARS:
+            heading = [paragraph]
+            continue
+        sections.append(Section(heading, paragraph))
+    return sections
+
+
+def _label(item):
+    label = getattr(item, "label", "")
+    return getattr(label, "value", label)
+
+
+def docling_sections(dl_doc):
+    """
+    Split a Docling document along its structure (sections, tables, lists)
+    using Docling's HierarchicalChunker, which carries the heading path of each item.
+    """
+    from docling_core.transforms.chunker import HierarchicalChunker
+
+    sections = []
+    for chunk in HierarchicalChunker().chunk(dl_doc):
+        labels = {_label(item) for item in chunk.meta.doc_items}
+        if "table" in labels:
+            kind = "table"
+        elif "list_item" in labels:
+            kind = "list"
+        else:
+            kind = "text"
+        sections.append(Section(chunk.meta.headings or [], chunk.text, kind))
+    return sections
+
+
+def sections_to_chunks(sections, metadata, chunk_size, chunk_overlap):
+    """
+    Pack consecutive sections sharing a heading path into chunks of up to chunk_size
+    characters, and split sections larger than that with the recursive splitter.
+    The heading path is prepended to each chunk and stored in its metadata; its length
+    counts towards chunk_size.
+    """
+    splitters = {}
+    chunks = []
+    pending = None  # (headings, [texts], kinds)
+
+    def text_budget(headings):
+        heading_path = HEADING_SEPARATOR.join(headings)
+        budget = chunk_size - (len(heading_path) + 1 if heading_path else 0)
+        return max(budget, min(MIN_SECTION_TEXT_CHARS, chunk_size))
+
+    def split(text, budget):
+        if budget not in splitters:
+            splitters[budget] = RecursiveCharacterTextSplitter(
+                chunk_size=budget, chunk_overlap=min(chunk_overlap, budget // 2))
+        return splitters[budget].split_text(text)
+
+    def emit(headings, text, kinds):
+        heading_path = HEADING_SEPARATOR.join(headings)
+        content = f"{heading_path}\n{text}" if heading_path else text
+        chunk_metadata = dict(metadata)
+        chunk_metadata["heading_path"] = heading_path
+        chunk_metadata["chunk_kind"] = "+".join(sorted(kinds))
+        chunks.append(Document(page_content=content, metadata=chunk_metadata))
+
+    def flush():
+        nonlocal pending
+        if pending:
+            emit(pending[0], "\n\n".join(pending[1]), pending[2])
+        pending = None
+
+    for section in sections:
+        if not section.text:
+            continue
+        budget = text_budget(section.headings)
+        if len(section.text) > budget:
+            flush()
+            for piece in split(section.text, budget):
+                emit(section.headings, piece, {section.kind})
+            continue
+        if pending and pending[0] == section.headings and \
+                sum(len(t) + 2 for t in pending[1]) + len(section.text) <= budget:
+            pending[1].append(section.text)
+            pending[2].add(section.kind)
+        else:
+            flush()
+            pending = (section.headings, [section.text], {section.kind})
+    flush()
+    return chunks
+
+
+def chunk_document(text, metadata, file_ext, chunk_size, chunk_overlap, dl_doc=None):
+    """
+    Produce structure-aware chunks for a document.
+
+    Args:
+        text: The document text (used for Markdown and plain text)
+        metadata: Metadata copied to every chunk
+        file_ext: File extension, selects the structure parser
+        chunk_size: Maximum chunk size in characters
+        chunk_overlap: Overlap used only when a single section must be split
+        dl_doc: The Docling document, for PDFs
+
+    Returns:
+        list: Document chunks with 'heading_path' and 'chunk_kind' metadata
+    """
+    if dl_doc is not None:
+        try:
+            sections = docling_sections(dl_doc)
+        except Exception as e:
+            logger.warning(f"Docling structure unavailable, falling back to text sections: {e}")
+            sections = text_sections(text)
+    elif file_ext == ".md":
+        sections = markdown_sections(text)
+    elif file_ext == ".txt":
+        sections = text_sections(text)
+    else:
+        # CSV / JSON have no heading structure to follow
+        sections = [Section([], text)]
+    return sections_to_chunks(sections, metadata, chunk_size, chunk_overlap)
@@ -0,0 +1,163 @@
+import re
+import random
+import hashlib
+import logging
+from array import array
+
+logger = logging.getLogger(__name__)
+
+NUM_PERMUTATIONS = 64  # Tamanho da assinatura MinHash
+LSH_BANDS = 16  # 16 bandas de 4 linhas: candidatos a partir de ~50% de similaridade
+SHINGLE_SIZE = 3
+MIN_NEAR_DUP_WORDS = 20  # Chunks curtos demais só são comparados por igualdade exata
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1)  # Permutações fixas: assinaturas comparáveis entre execuções
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def normalize(text):
+    """Lowercase and collapse whitespace, so formatting differences do not matter."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def content_hash(text):
+    return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()
+
+
+def _shingle_hashes(text):
+    words = re.findall(r"\w+", normalize(text))
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for shingle in shingles
+    ]
+
+
+def minhash(text):
+    """MinHash signature over word shingles, packed as bytes (NUM_PERMUTATIONS x 32 bits)."""
+    hashes = _shingle_hashes(text)
+    signature = array("I", (
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    ))
+    return signature.tobytes()
+
+
+def estimate_jaccard(signature_a, signature_b):
+    """Estimate the Jaccard similarity of two documents from their MinHash signatures."""
+    a, b = array("I"), array("I")
+    a.frombytes(signature_a)
+    b.frombytes(signature_b)
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERMUTATIONS
+
+
+def _bands(signature):
+    width = len(signature) // LSH_BANDS
+    return [(i, signature[i * width:(i + 1) * width]) for i in range(LSH_BANDS)]
+
+
+def get_sources(doc):
+    """Return every source a (possibly deduplicated) chunk belongs to."""
+    return doc.metadata.get("sources") or [doc.metadata.get("source", "Unknown")]
+
+
+class ChunkDeduplicator:
+    """
+    Detects exact and near-duplicate chunks.
+    Exact duplicates are found by the hash of the normalized text, near duplicates
+    by MinHash with LSH banding, confirmed by the estimated Jaccard similarity.
+    A duplicate is not kept: its source is added to the 'sources' metadata of the
+    chunk already kept, so one vector serves every document.
+    """
+
+    def __init__(self, threshold=0.8, signature_cache=None):
+        """
+        Args:
+            threshold: Min estimated Jaccard similarity for near duplicates
+            signature_cache: Optional dict {key: minhash} of chunks registered with
+                a key, kept by the caller so they are not hashed again on the next run
+        """
+        self.threshold = threshold
+        self.signature_cache = signature_cache if signature_cache is not None else {}
+        self._exact = {}  # content_hash -> key
+        self._bands = {}  # (band, value) -> [key]
+        self._signatures = {}  # key -> minhash
+        self._docs = {}  # key -> Document
+        self._next_key = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def register(self, doc, key=None):
+        """
+        Register a kept chunk under key (e.g. its docstore id). Signatures of chunks
+        registered with a key are taken from, and added to, the signature cache.
+        """
+        cache = self.signature_cache if key is not None else {}
+        if key is None:
+            key = self._next_key
+            self._next_key += 1
+        self._docs[key] = doc
+        self._exact[content_hash(doc.page_content)] = key
+
+        if len(doc.page_content.split()) >= MIN_NEAR_DUP_WORDS:
+            signature = cache.get(key)
+            if signature is None:
+                signature = cache[key] = minhash(doc.page_content)
+            self._signatures[key] = signature
+            for band in _bands(signature):
+                self._bands.setdefault(band, []).append(key)
+        return key
+
+    def find_duplicate(self, doc):
+        """Return the key of a kept chunk that duplicates doc, or None."""
+        key = self._exact.get(content_hash(doc.page_content))
+        if key is not None:
+            self.exact_duplicates += 1
+            return key
+
+        if len(doc.page_content.split()) < MIN_NEAR_DUP_WORDS:
+            return None
+        signature = minhash(doc.page_content)
+        checked = set()
+        for band in _bands(signature):
+            for candidate in self._bands.get(band, []):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if estimate_jaccard(signature, self._signatures[candidate]) >= self.threshold:
+                    self.near_duplicates += 1
+                    return candidate
+        return None
+
+    def merge_source(self, key, doc):
+        """Add the source of a duplicate chunk to the kept one."""
+        kept = self._docs[key]
+        sources = get_sources(kept)
+        source = doc.metadata.get("source", "Unknown")
+        if source not in sources:
+            # Only shared chunks carry 'sources'; the others have just 'source'
+            kept.metadata["sources"] = sources + [source]
+        return kept
+
+    def deduplicate(self, docs):
+        """Return the chunks to keep, merging the sources of duplicates into them."""
+        unique = []
+        for doc in docs:
+            key = self.find_duplicate(doc)
+            if key is None:
+                self.register(doc)
+                unique.append(doc)
+            else:
+                self.merge_source(key, doc)
+        if self.exact_duplicates or self.near_duplicates:
+            logger.info(f"Deduplicated chunks: {self.exact_duplicates} exact, "
+                        f"{self.near_duplicates} near duplicates removed")
+        return unique
@@ -0,0 +1,102 @@
+import os
+import threading
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Endpoints da API de funcionários (backend/api.py)
+SALARY_ENDPOINT_URL = os.getenv('SALARY_ENDPOINT_URL', 'http://127.0.0.1:8000/employee/payroll')
+VACANCY_ENDPOINT_URL = os.getenv('VACANCY_ENDPOINT_URL', 'http://127.0.0.1:8000/employee/vacancy')
+
+# Pool de conexões, retries e timeouts (sobrescrevíveis por variáveis de ambiente)
+EMPLOYEE_API_POOL_SIZE = int(os.getenv('EMPLOYEE_API_POOL_SIZE', '16'))
+EMPLOYEE_API_MAX_RETRIES = int(os.getenv('EMPLOYEE_API_MAX_RETRIES', '2'))
+EMPLOYEE_API_CONNECT_TIMEOUT = float(os.getenv('EMPLOYEE_API_CONNECT_TIMEOUT', '2'))
+EMPLOYEE_API_READ_TIMEOUT = float(os.getenv('EMPLOYEE_API_READ_TIMEOUT', '5'))
+ETAG_CACHE_SIZE = 10000  # Last answer per employee, revalidated with If-None-Match
+
+_lock = threading.Lock()
+_session = None
+_etag_cache = {}  # (url, employee_code) -> (etag, payload)
+
+
+class EmployeeNotFound(Exception):
+    pass
+
+
+def get_session():
+    """
+    Return the process-wide HTTP session for the employee API.
+    Keep-alive connections are pooled and reused by every graph run and thread.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                retry = Retry(
+                    total=EMPLOYEE_API_MAX_RETRIES,
+                    backoff_factor=0.2,
+                    status_forcelist=(502, 503, 504),
+                    allowed_methods=None,  # Every request is a read-only lookup, so safe to retry
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=EMPLOYEE_API_POOL_SIZE,
+                    pool_maxsize=EMPLOYEE_API_POOL_SIZE,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+                logger.info(f"Created shared employee API session (pool {EMPLOYEE_API_POOL_SIZE})")
+    return _session
+
+
+def _get(url, employee_code, etag=None):
+    return get_session().get(
+        url,
+        params={'employeeCode': employee_code},
+        headers={'If-None-Match': etag} if etag else {},
+        timeout=(EMPLOYEE_API_CONNECT_TIMEOUT, EMPLOYEE_API_READ_TIMEOUT),
+    )
+
+
+def _lookup(url, employee_code):
+    """GET the employee code, revalidating the last answer with If-None-Match."""
+    key = (url, employee_code)
+    cached = _etag_cache.get(key)
+
+    response = _get(url, employee_code, cached[0] if cached else None)
+    if response.status_code == 304:
+        if cached:
+            return cached[1]
+        # Not Modified without a body to reuse: ask again unconditionally
+        response = _get(url, employee_code)
+    if response.status_code == 404:
+        raise EmployeeNotFound(employee_code)
+    response.raise_for_status()
+
+    payload = response.json()
+    etag = response.headers.get('ETag')
+    if etag:
+        with _lock:
+            if len(_etag_cache) >= ETAG_CACHE_SIZE:
+                _etag_cache.clear()
+            _etag_cache[key] = (etag, payload)
+    return payload
+
+
+def get_payroll(employee_code):
+    """Return {'name', 'YTDPayroll'} for an employee, or raise EmployeeNotFound."""
+    return _lookup(SALARY_ENDPOINT_URL, employee_code)
+
+
+def get_vacancy(employee_code):
+    """Return {'name', 'vacancyBalanceDays'} for an employee, or raise EmployeeNotFound."""
+    return _lookup(VACANCY_ENDPOINT_URL, employee_code)
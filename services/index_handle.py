@@ -0,0 +1,95 @@
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class IndexHandle:
+    """
+    Holder of the vectorstore of one repository, guarded by a reader/writer lock.
+
+    Queries take a read lease with read(); the number of open leases is the
+    reference count of the current vectorstore. Replacing or mutating the index
+    takes the write side, which waits for the open leases to be released, so a
+    query never sees a half-updated index and the old vectorstore is dropped
+    as soon as its last query finishes. Waiting writers block new leases, so a
+    steady stream of queries cannot starve a reindex.
+    """
+
+    def __init__(self, vectorstore=None):
+        self._vectorstore = vectorstore
+        self._cond = threading.Condition(threading.Lock())
+        self._leases = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @property
+    def vectorstore(self):
+        """The current vectorstore, without a lease. Only for checks and diagnostics."""
+        return self._vectorstore
+
+    @property
+    def leases(self):
+        """Number of queries currently holding the vectorstore."""
+        return self._leases
+
+    def _acquire_read(self):
+        with self._cond:
+            while self._writing or self._waiting_writers:
+                self._cond.wait()
+            self._leases += 1
+
+    def _release_read(self):
+        with self._cond:
+            self._leases -= 1
+            if self._leases == 0:
+                self._cond.notify_all()
+
+    def _acquire_write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writing or self._leases:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writing = True
+
+    def _release_write(self):
+        with self._cond:
+            self._writing = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        """Yield the current vectorstore (or None) for the duration of a query."""
+        self._acquire_read()
+        try:
+            yield self._vectorstore
+        finally:
+            self._release_read()
+
+    @contextmanager
+    def write(self):
+        """Yield the current vectorstore with exclusive access, for in-place updates."""
+        self._acquire_write()
+        try:
+            yield self._vectorstore
+        finally:
+            self._release_write()
+
+    def swap(self, vectorstore):
+        """
+        Replace the vectorstore once the open leases are released.
+
+        Returns:
+            The previous vectorstore, no longer referenced by the handle.
+        """
+        with self.write():
+            previous, self._vectorstore = self._vectorstore, vectorstore
+        return previous
+
+    def clear(self):
+        """Drop the vectorstore; the memory is freed when the last query using it ends."""
+        self.swap(None)
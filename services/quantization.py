@@ -0,0 +1,175 @@
+import os
+import json
+import logging
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_METHODS = ("int8", "pq")
+FULL_VECTORS_FILE = "vectors.npy"  # float32 vectors of a quantized index, memory-mapped for re-scoring
+FULL_VECTOR_IDS_FILE = "vector_ids.json"  # Docstore id of each row of FULL_VECTORS_FILE
+PQ_TRAINING_POINTS_PER_CENTROID = 39  # faiss' recommended minimum for k-means training
+MIN_INT8_TRAINING_VECTORS = 256  # Enough vectors for stable per-dimension ranges
+
+
+def is_quantized(index):
+    return isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexPQ))
+
+
+def _pq_subquantizers(d, requested):
+    """Largest number of sub-quantizers <= requested that divides the dimension."""
+    m = min(requested, d)
+    while d % m:
+        m -= 1
+    return m
+
+
+def min_training_vectors(method, pq_bits=8):
+    """Number of vectors needed to train a quantizer whose codes stay good for later additions."""
+    if method == "pq":
+        return 2 ** pq_bits * PQ_TRAINING_POINTS_PER_CENTROID
+    return MIN_INT8_TRAINING_VECTORS
+
+
+def train_quantized_index(vectors, method, metric_type=faiss.METRIC_L2, pq_subquantizers=96, pq_bits=8):
+    """
+    Train a quantized FAISS index on the vectors and add them to it.
+
+    Args:
+        vectors: float32 array of shape (n, d)
+        method: 'int8' (scalar quantization, 1 byte per dimension) or
+            'pq' (product quantization, pq_bits per sub-quantizer)
+        metric_type: Metric of the index being replaced
+        pq_subquantizers: Number of PQ sub-vectors; lowered to a divisor of d if needed
+        pq_bits: Bits per PQ code; PQ needs at least 2**pq_bits vectors
+
+    Returns:
+        The trained index holding the vectors.
+    """
+    d = vectors.shape[1]
+    if method == "int8":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit, metric_type)
+    elif method == "pq":
+        if len(vectors) < 2 ** pq_bits:
+            raise ValueError(f"Product quantization with {pq_bits} bits needs at least {2 ** pq_bits} vectors")
+        m = _pq_subquantizers(d, pq_subquantizers)
+        if m != pq_subquantizers:
+            logger.info(f"Product quantization uses {m} sub-quantizers for {d} dimensions")
+        index = faiss.IndexPQ(d, m, pq_bits, metric_type)
+    else:
+        raise ValueError(f"Unknown quantization method: {method}")
+    index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def quantize_vectorstore(vectorstore, method, pq_subquantizers=96, pq_bits=8, min_vectors=None):
+    """
+    Replace the flat index of a vectorstore with a quantized one trained on its vectors.
+    Must be called before the vectorstore is shared with queries. Indexes with fewer
+    than min_vectors vectors (default min_training_vectors()) are left flat, since
+    codes trained on them would also be used for every later addition.
+
+    Returns:
+        dict: {docstore id: float32 vector} of every chunk, for write_full_vectors(),
+        or None if the index was left flat.
+    """
+    index = vectorstore.index
+    if min_vectors is None:
+        min_vectors = min_training_vectors(method, pq_bits)
+    if index.ntotal < min_vectors:
+        logger.info(f"Keeping a flat index: {method} quantization needs {min_vectors} vectors, "
+                    f"the index has {index.ntotal}")
+        return None
+    vectors = index.reconstruct_n(0, index.ntotal)
+    vectorstore.index = train_quantized_index(vectors, method, index.metric_type, pq_subquantizers, pq_bits)
+    logger.info(f"Quantized {index.ntotal} vectors with {method}: "
+                f"{index.ntotal * vectorstore.index.code_size} bytes instead of {vectors.nbytes}")
+    return {vectorstore.index_to_docstore_id[i]: vectors[i] for i in range(len(vectors))}
+
+
+class FullVectors:
+    """float32 vectors of a quantized index, memory-mapped from disk and looked up by docstore id."""
+
+    def __init__(self, ids, vectors):
+        self.vectors = vectors
+        self.rows = {doc_id: row for row, doc_id in enumerate(ids)}
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map the vectors written by write_full_vectors(), or return None if there are none."""
+        vectors_path = os.path.join(directory, FULL_VECTORS_FILE)
+        ids_path = os.path.join(directory, FULL_VECTOR_IDS_FILE)
+        if not (os.path.isfile(vectors_path) and os.path.isfile(ids_path)):
+            return None
+        with open(ids_path, "r") as f:
+            ids = json.load(f)
+        return cls(ids, np.load(vectors_path, mmap_mode="r"))
+
+    def get(self, doc_id):
+        row = self.rows.get(doc_id)
+        return None if row is None else self.vectors[row]
+
+
+def write_full_vectors(directory, vectorstore, new_vectors=None):
+    """
+    Write the float32 vector of every chunk of a quantized vectorstore, in index order.
+    Rows come from new_vectors ({docstore id: vector}), else from the vectors written
+    before (vectorstore.full_vectors), else are decoded from the quantized codes.
+    """
+    new_vectors = new_vectors or {}
+    previous = getattr(vectorstore, "full_vectors", None)
+    index = vectorstore.index
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(index.ntotal)]
+    out = np.lib.format.open_memmap(
+        os.path.join(directory, FULL_VECTORS_FILE), mode="w+", dtype=np.float32, shape=(len(ids), index.d)
+    )
+    for row, doc_id in enumerate(ids):
+        vector = new_vectors.get(doc_id)
+        if vector is None and previous is not None:
+            vector = previous.get(doc_id)
+        if vector is None:
+            vector = index.reconstruct(row)
+        out[row] = vector
+    out.flush()
+    del out
+    with open(os.path.join(directory, FULL_VECTOR_IDS_FILE), "w") as f:
+        json.dump(ids, f)
+
+
+def similarity_search(vectorstore, query, k=4):
+    """
+    vectorstore.similarity_search, re-scoring quantized indexes with float32 vectors.
+
+    When the vectorstore has full_vectors and a rescore_factor above 1, the quantized
+    index returns k * rescore_factor candidates, which are ranked again by their exact
+    distance to the query. Candidates without a stored float32 vector are ranked by
+    their decoded code.
+    """
+    full_vectors = getattr(vectorstore, "full_vectors", None)
+    factor = getattr(vectorstore, "rescore_factor", 0)
+    index = vectorstore.index
+    if full_vectors is None or factor <= 1 or not is_quantized(index):
+        return vectorstore.similarity_search(query, k=k)
+
+    query_vector = np.array([vectorstore._embed_query(query)], dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(query_vector)
+    _, positions = index.search(query_vector, k * factor)
+    positions = [int(p) for p in positions[0] if p != -1]
+    if not positions:
+        return []
+
+    ids = [vectorstore.index_to_docstore_id[p] for p in positions]
+    candidates = np.empty((len(ids), index.d), dtype=np.float32)
+    for i, (doc_id, position) in enumerate(zip(ids, positions)):
+        vector = full_vectors.get(doc_id)
+        candidates[i] = vector if vector is not None else index.reconstruct(position)
+
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        distances = -(candidates @ query_vector[0])
+    else:
+        distances = ((candidates - query_vector[0]) ** 2).sum(axis=1)
+    order = np.argsort(distances, kind="stable")[:k]
+    return [vectorstore.docstore.search(ids[i]) for i in order]
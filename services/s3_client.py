@@ -0,0 +1,61 @@
+import os
+import threading
+import logging
+import boto3
+from botocore.config import Config
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKET_NAME = "docs-projetos-chatbot"
+
+# Ajustes do pool de conexões, retries e timeouts (sobrescrevíveis por variáveis de ambiente)
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', '32'))
+S3_MAX_ATTEMPTS = int(os.getenv('S3_MAX_ATTEMPTS', '5'))
+S3_CONNECT_TIMEOUT = float(os.getenv('S3_CONNECT_TIMEOUT', '5'))
+S3_READ_TIMEOUT = float(os.getenv('S3_READ_TIMEOUT', '60'))
+
+_lock = threading.Lock()
+_session = None
+_client = None
+
+
+def _create_session():
+    """Create the boto3 session from environment credentials (or the default chain)."""
+    load_dotenv()
+    return boto3.session.Session(
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        region_name=os.getenv('AWS_REGION', 'us-east-1')
+    )
+
+
+def get_s3_client():
+    """
+    Return the process-wide S3 client.
+    boto3 clients are thread-safe, so one client with a connection pool sized for
+    the parallel downloads is shared by every session, job and worker thread.
+    """
+    global _session, _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _session = _create_session()
+                config = Config(
+                    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                    retries={'max_attempts': S3_MAX_ATTEMPTS, 'mode': 'standard'},
+                    connect_timeout=S3_CONNECT_TIMEOUT,
+                    read_timeout=S3_READ_TIMEOUT
+                )
+                _client = _session.client('s3', config=config)
+                logger.info(f"Created shared S3 client (region {_session.region_name}, "
+                            f"pool {S3_MAX_POOL_CONNECTIONS})")
+    return _client
+
+
+def reset_s3_client():
+    """Drop the shared client, e.g. after credentials change. The next call recreates it."""
+    global _session, _client
+    with _lock:
+        _session = None
+        _client = None
@@ -1,28 +1,55 @@
 import os
 import time
-import tempfile
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
 import gc
 import importlib
 import json
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
-from services.Intranet_repository_s3 import IntranetRepository
-from chains import first_responder, final_responder, global_responder, vid_responder
-from langgraph.graph import MessageGraph
+from services.s3_client import get_s3_client, reset_s3_client
+import resources
+import metrics
 from classes import FinalResponse
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 
+# Uploads above the threshold are sent as parallel multipart uploads
+UPLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+    use_threads=True
+)
+
+# Size of one preview page in the admin UI
+PREVIEW_PAGE_BYTES = 32 * 1024
+
+# LRU cache of preview pages, keyed by ETag
+PREVIEW_CACHE_SIZE = 32
+_preview_cache = OrderedDict()
+_preview_lock = threading.Lock()
 
 # Create the processing graph for the LLM
 def create_graph():
+    # chains builds the LLM runnables at import: loaded with the graph, not with the page
+    from chains import first_responder, final_responder, global_responder, vid_responder, salary_responder, vacancy_responder
+    from langgraph.graph import MessageGraph
+
     builder = MessageGraph()
-    builder.add_node("classifier", first_responder)
-    builder.add_node("global", global_responder)
-    builder.add_node("vendorid", vid_responder)
-    builder.add_node("final", final_responder)
+    # Each node is wrapped so its latency is recorded under the node name
+    builder.add_node("classifier", metrics.traced_node("classifier", first_responder))
+    builder.add_node("global", metrics.traced_node("global", global_responder))
+    builder.add_node("vendorid", metrics.traced_node("vendorid", vid_responder))
+    builder.add_node("salary", metrics.traced_node("salary", salary_responder))
+    builder.add_node("vacancy", metrics.traced_node("vacancy", vacancy_responder))
+    builder.add_node("final", metrics.traced_node("final", final_responder))
     builder.add_conditional_edges("classifier", decision_flow)
     builder.add_edge("global", "final")
     builder.add_edge("vendorid", "final")
+    builder.add_edge("salary", "final")
+    builder.add_edge("vacancy", "final")
     builder.set_entry_point("classifier")
     return builder.compile()
 
@@ -38,13 +65,24 @@ def decision_flow(state: list[BaseMessage]) -> str:
                 return "global"
             elif result.get("request_type") == "vendorid":
                 return "vendorid"
+            elif result.get("request_type") == "salary_request":
+                return "salary"
+            elif result.get("request_type") == "vacancy_request":
+                return "vacancy"
     return "final"
 
 # AWS configuration function
+_aws_config = None
+
 def configure_aws():
     """
     Configure AWS credentials from environment variables.
+    Runs once per process; later calls (e.g. on every Streamlit rerun) return the cached result.
     """
+    global _aws_config
+    if _aws_config is not None:
+        return _aws_config
+    
     load_dotenv()
     
     # Check if AWS credentials are set in environment variables
@@ -65,17 +103,23 @@ def configure_aws():
         region_name=aws_region
     )
     
+    # The shared client is created from the same credentials on first use
+    reset_s3_client()
+    
     print(f"AWS configured with region: {aws_region}")
     
-    return {
+    _aws_config = {
         'region': aws_region,
         'credentials_found': True
     }
+    return _aws_config
 
 # Function to upload file to S3
 def upload_file_to_s3(bucket_name, file_object, object_name=None):
     """
-    Upload a file to an S3 bucket
+    Upload a file to an S3 bucket, streaming it from the file object.
+    Files above UPLOAD_TRANSFER_CONFIG.multipart_threshold are uploaded in parallel parts,
+    so the upload never holds a second copy of the file in memory or on disk.
     
     :param bucket_name: Bucket to upload to
     :param file_object: File-like object to upload
@@ -87,19 +131,12 @@ def upload_file_to_s3(bucket_name, file_object, object_name=None):
         object_name = file_object.name
         
     # Upload the file
-    s3_client = boto3.client('s3')
+    s3_client = get_s3_client()
     try:
-        # Create a temporary file to save the uploaded file content
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            temp_file.write(file_object.getvalue())
-            temp_file_path = temp_file.name
-        
-        # Upload file from disk to S3
-        s3_client.upload_file(temp_file_path, bucket_name, object_name)
-        
-        # Remove temporary file
-        os.remove(temp_file_path)
-        
+        # Stream from the start of the file object
+        file_object.seek(0)
+        s3_client.upload_fileobj(file_object, bucket_name, object_name, Config=UPLOAD_TRANSFER_CONFIG)
+        invalidate_bucket_inventory(bucket_name)
         return True
     except Exception as e:
         print(f"Error uploading file to S3: {e}")
@@ -115,19 +152,9 @@ def delete_file_direct(bucket_name, file_key):
     :return: True if file was deleted, else False
     """
     try:
-        # Initialize boto3 session and client directly
-        session = boto3.Session(
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION', 'us-east-1')
-        )
-        
-        s3 = session.resource('s3')
-        bucket = s3.Bucket(bucket_name)
-        obj = bucket.Object(file_key)
-        
-        # Delete the object directly
-        response = obj.delete()
+        # Delete the object directly with the shared client
+        response = get_s3_client().delete_object(Bucket=bucket_name, Key=file_key)
+        invalidate_bucket_inventory(bucket_name)
         
         # Log the response
         print(f"Delete response: {response}")
@@ -146,141 +173,148 @@ def delete_file_direct(bucket_name, file_key):
         traceback.print_exc()
         return False
 
+# Function to read one page of an S3 file for preview
+def read_s3_file_page(bucket_name, file_key, page=0, page_size=PREVIEW_PAGE_BYTES):
+    """
+    Read one page of a file for preview, without downloading the whole object.
+    Text files are read with a ranged GET; PDFs are previewed from the text cached
+    when they were indexed, so Docling never runs in the UI.
+    
+    :return: (content, total_size) where total_size is in bytes (characters for PDFs)
+    """
+    start = page * page_size
+    
+    if file_key.lower().endswith('.pdf'):
+        repository = resources.get_repository(bucket_name)
+        text = repository.get_extracted_text(file_key)
+        if text is None:
+            return "PDF text is not available yet. It is cached when the document is indexed.", 0
+        return text[start:start + page_size], len(text)
+    
+    # Pages are cached by ETag (a HEAD request), so a changed object is never served stale
+    etag = get_object_etag(bucket_name, file_key)
+    cache_key = (bucket_name, file_key, etag, page, page_size)
+    if etag is not None:
+        with _preview_lock:
+            if cache_key in _preview_cache:
+                _preview_cache.move_to_end(cache_key)
+                metrics.record_cache("preview", True)
+                return _preview_cache[cache_key]
+    metrics.record_cache("preview", False)
+    
+    s3_client = get_s3_client()
+    try:
+        response = s3_client.get_object(
+            Bucket=bucket_name,
+            Key=file_key,
+            Range=f"bytes={start}-{start + page_size - 1}"
+        )
+    except ClientError as e:
+        # Range beyond the end of the object (e.g. an empty file)
+        if e.response.get('Error', {}).get('Code') == 'InvalidRange':
+            return "", 0
+        raise
+    total_size = int(response['ContentRange'].split('/')[-1])
+    content = response['Body'].read().decode('utf-8', errors='replace')
+    
+    if etag is not None and response.get('ETag') == etag:
+        with _preview_lock:
+            _preview_cache[cache_key] = (content, total_size)
+            while len(_preview_cache) > PREVIEW_CACHE_SIZE:
+                _preview_cache.popitem(last=False)
+    return content, total_size
+
 # Function to view S3 file content
-def view_s3_file_content(bucket_name, file_key):
+def view_s3_file_content(bucket_name, file_key, page=0, page_size=PREVIEW_PAGE_BYTES):
     """
-    Retrieve and display content of a file from S3
+    Retrieve one page of the content of a file from S3
     """
-    s3_client = boto3.client('s3')
     try:
-        # Download file from S3
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            s3_client.download_file(bucket_name, file_key, temp_file.name)
-            temp_file_path = temp_file.name
-        
-        # Read file content
-        with open(temp_file_path, 'r') as f:
-            content = f.read()
-        
-        # Clean up temporary file
-        os.remove(temp_file_path)
-        
+        content, _ = read_s3_file_page(bucket_name, file_key, page, page_size)
         return content
     except Exception as e:
         print(f"Error retrieving file from S3: {e}")
         return f"Error retrieving file: {str(e)}"
 
 # Get repository instance
-def get_repository(bucket_name="docs-intranet"):
+def get_repository(bucket_name=resources.DEFAULT_BUCKET):
     """
-    Get a repository instance for the specified bucket
+    Get the shared repository instance and vectorstore for the specified bucket
     """
     try:
-        repository = IntranetRepository(bucket_name=bucket_name)
-        vectorstore = repository.create_or_load_faiss_index()
+        repository = resources.get_repository(bucket_name)
+        vectorstore = resources.get_vectorstore(bucket_name)
         return repository, vectorstore
     except Exception as e:
         print(f"Error creating repository: {e}")
         return None, None
 
 # Force reindex all documents
-def force_reindex(bucket_name="docs-intranet"):
+def force_reindex(bucket_name=resources.DEFAULT_BUCKET, progress=None):
     """
-    Force complete reindexing of ALL documents from S3 bucket
+    Force complete reindexing of ALL documents from S3 bucket.
+    The current index keeps serving queries until the new one is built and published.
+
+    :param progress: Optional callable progress(stage, done, total) reporting the
+        'listed', 'downloaded', 'extracted', 'chunked' and 'embedded' stages.
+        It may raise IndexBuildCancelled to abort the build, which is re-raised.
     Returns: repository, vectorstore, elapsed_time, doc_count
     """
+    from services.Intranet_repository_s3 import IndexBuildCancelled
     try:
-        # Clear IntranetRepository singleton
-        IntranetRepository._instance = None
-        IntranetRepository._vectorstore = None
-        
-        # Clear module-level references in chains.py
-        import chains
-        if hasattr(chains, 'intranet_repository'):
-            chains.intranet_repository = None
-        if hasattr(chains, 'vectorstore'):
-            chains.vectorstore = None
-        
-        # Clear physical index files
-        index_path = "faiss_index"
-        index_files = [
-            os.path.join(index_path, "index.faiss"),
-            os.path.join(index_path, "index.pkl")
-        ]
-        
-        for file_path in index_files:
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    print(f"Error removing {file_path}: {e}")
-        
-        # Check if directory exists and is empty, then remove it
-        if os.path.exists(index_path) and os.path.isdir(index_path):
-            if not os.listdir(index_path):  # If directory is empty
-                try:
-                    os.rmdir(index_path)
-                except Exception as e:
-                    print(f"Error removing directory {index_path}: {e}")
-        
-        # List ALL documents in bucket
-        s3_client = boto3.client('s3')
-        response = s3_client.list_objects_v2(Bucket=bucket_name)
-        
-        doc_count = 0
-        if 'Contents' in response:
-            doc_count = len(response['Contents'])
-            
-        # Create a completely isolated new repository instance
-        class FullIndexRepository(IntranetRepository):
-            def list_documents_in_bucket(self):
-                """Override: List ALL documents in S3 without filtering."""
-                try:
-                    response = self.s3_client.list_objects_v2(Bucket=self.bucket_name)
-                    if 'Contents' in response:
-                        all_files = [item['Key'] for item in response['Contents']]
-                        return all_files
-                    return []
-                except Exception as e:
-                    print(f"Error listing objects in S3 bucket: {e}")
-                    return []
-        
-        # Use specialized class for reindexing
         start_time = time.time()
-        new_repository = FullIndexRepository(bucket_name=bucket_name)
+        repository = resources.get_repository(bucket_name)
         
-        # Force index rebuild, ensuring cache is not used
-        vectorstore = new_repository.force_rebuild_index()
+        # Build the new index next to the live one, then swap it in
+        vectorstore = repository.build_index(progress=progress)
         elapsed_time = time.time() - start_time
+        doc_count = repository.last_build_stats["files"]
         
-        # Update module references
-        import chains
-        chains.intranet_repository = new_repository
-        chains.vectorstore = vectorstore
+        # Publish the new index to every session
+        if vectorstore is not None:
+            resources.set_vectorstore(repository, vectorstore)
         
-        return new_repository, vectorstore, elapsed_time, doc_count
+        return repository, vectorstore, elapsed_time, doc_count
+    except IndexBuildCancelled:
+        raise
     except Exception as e:
         print(f"Error during reindexing: {e}")
         return None, None, 0, 0
 
+# Incrementally index a single document
+def index_document(bucket_name, file_key, progress=None):
+    """
+    Add or update a single S3 object in the index and publish the new version.
+    Returns: repository, vectorstore, elapsed_time, chunk_count
+    """
+    start_time = time.time()
+    repository = resources.get_repository(bucket_name)
+    vectorstore, chunk_count = repository.index_document(file_key, progress=progress)
+    if vectorstore is not None:
+        resources.set_vectorstore(repository, vectorstore)
+    return repository, vectorstore, time.time() - start_time, chunk_count
+
+# Incrementally remove a single document from the index
+def remove_document_from_index(bucket_name, file_key):
+    """
+    Remove a single S3 object from the index and publish the new version.
+    Returns: repository, vectorstore, elapsed_time, chunk_count
+    """
+    start_time = time.time()
+    repository = resources.get_repository(bucket_name)
+    vectorstore, chunk_count = repository.remove_document(file_key)
+    if vectorstore is not None:
+        resources.set_vectorstore(repository, vectorstore)
+    return repository, vectorstore, time.time() - start_time, chunk_count
+
 # Memory cleanup function
 def cleanup_memory():
     """
     Function to clean up all in-memory references while preserving history
     """
     try:
-        # Reset the IntranetRepository singleton
-        IntranetRepository._instance = None
-        IntranetRepository._vectorstore = None
-                
-        # Reset module-level variables in chains.py
-        import chains
-        
-        # Reset specific module variables
-        if hasattr(chains, 'intranet_repository'):
-            chains.intranet_repository = None
-        if hasattr(chains, 'vectorstore'):
-            chains.vectorstore = None
+        # Drop every bucket's repository and vectorstore, they are reloaded on the next query
+        resources.clear_vectorstore()
             
         # Force garbage collection to clean up lingering references
         gc.collect()
@@ -295,15 +329,58 @@ def cleanup_memory():
         return False
 
 # Get list of documents in S3 bucket
-def list_s3_documents(bucket_name="docs-intranet"):
-    """Get list of documents in S3 bucket"""
+def list_s3_documents(bucket_name=resources.DEFAULT_BUCKET, force_refresh=False):
+    """
+    Get list of documents in S3 bucket (Key, Size, ETag, LastModified per item).
+    Served from the bucket inventory cache, so admin reruns do not LIST the bucket.
+    """
     try:
-        s3_client = boto3.client('s3')
-        response = s3_client.list_objects_v2(Bucket=bucket_name)
-        
-        if 'Contents' in response:
-            return [item for item in response['Contents']]
-        return []
+        return get_bucket_inventory(bucket_name, force_refresh=force_refresh)
     except Exception as e:
         print(f"Error listing S3 documents: {e}")
-        return []
\ No newline at end of file
+        return []
+
+# Bucket inventory cache shared by every admin view and session
+INVENTORY_TTL_SECONDS = 60
+_inventory_cache = {}  # bucket_name -> (fetched_at, items)
+_inventory_lock = threading.Lock()
+
+def get_bucket_inventory(bucket_name, force_refresh=False):
+    """
+    Return the cached inventory of a bucket: one dict per object with Key, Size,
+    ETag and LastModified. The bucket is listed again once INVENTORY_TTL_SECONDS
+    have passed or after invalidate_bucket_inventory().
+    """
+    with _inventory_lock:
+        cached = _inventory_cache.get(bucket_name)
+        if cached and not force_refresh and time.time() - cached[0] < INVENTORY_TTL_SECONDS:
+            metrics.record_cache("bucket_inventory", True)
+            return cached[1]
+    metrics.record_cache("bucket_inventory", False)
+    
+    items = []
+    paginator = get_s3_client().get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name):
+        for item in page.get('Contents', []):
+            items.append({
+                'Key': item['Key'],
+                'Size': item['Size'],
+                'ETag': item['ETag'],
+                'LastModified': item['LastModified']
+            })
+    
+    with _inventory_lock:
+        _inventory_cache[bucket_name] = (time.time(), items)
+    return items
+
+def invalidate_bucket_inventory(bucket_name):
+    """Drop the cached inventory of a bucket, e.g. after an upload or delete."""
+    with _inventory_lock:
+        _inventory_cache.pop(bucket_name, None)
+
+def get_object_etag(bucket_name, file_key):
+    """Return the current ETag of an object with a HEAD request, or None if it cannot be read."""
+    try:
+        return get_s3_client().head_object(Bucket=bucket_name, Key=file_key).get('ETag')
+    except ClientError:
+        return None
@@ -0,0 +1,57 @@
+from services.chunking import HEADING_SEPARATOR, Section, markdown_sections, sections_to_chunks, text_sections
+
+CHUNK_SIZE = 500
+
+
+def chunks_for(sections, chunk_size=CHUNK_SIZE, chunk_overlap=50):
+    return sections_to_chunks(sections, {"source": "doc.md"}, chunk_size, chunk_overlap)
+
+
+def test_small_sections_under_one_heading_are_packed():
+    sections = [Section(["Benefits"], "Dental plan."), Section(["Benefits"], "Meal allowance.")]
+    chunks = chunks_for(sections)
+
+    assert len(chunks) == 1
+    assert chunks[0].page_content == "Benefits\nDental plan.\n\nMeal allowance."
+    assert chunks[0].metadata == {"source": "doc.md", "heading_path": "Benefits", "chunk_kind": "text"}
+
+
+def test_sections_under_different_headings_are_not_packed():
+    chunks = chunks_for([Section(["A"], "one"), Section(["B"], "two", "table")])
+
+    assert [c.metadata["heading_path"] for c in chunks] == ["A", "B"]
+    assert chunks[1].metadata["chunk_kind"] == "table"
+
+
+def test_chunks_with_heading_never_exceed_chunk_size():
+    headings = ["Human Resources Policies", "Vacation and Leave", "How to request time off"]
+    long_text = " ".join(f"sentence number {i} of the vacation policy." for i in range(60))
+    sections = [Section(headings, long_text)] + [Section(headings, "x" * 120) for _ in range(4)]
+    chunks = chunks_for(sections)
+
+    assert len(chunks) > 2
+    assert all(len(c.page_content) <= CHUNK_SIZE for c in chunks)
+    assert all(c.page_content.startswith(HEADING_SEPARATOR.join(headings) + "\n") for c in chunks)
+
+
+def test_heading_longer_than_chunk_size_still_keeps_text():
+    chunks = chunks_for([Section(["h" * 600], "body text " * 30)])
+
+    assert chunks and all("body" in c.page_content for c in chunks)
+
+
+def test_markdown_headings_build_the_path_and_skip_code_fences():
+    text = "# Guide\n\nIntro.\n\n## Setup\n\n```\n# not a heading\n```\n\n### Linux\n\napt install"
+    sections = markdown_sections(text)
+
+    assert [s.headings for s in sections] == [["Guide"], ["Guide", "Setup"], ["Guide", "Setup", "Linux"]]
+    assert "# not a heading" in sections[1].text
+
+
+def test_faq_questions_head_the_following_paragraphs():
+    sections = text_sections("How do I reset my password?\n\nUse the portal.\n\nOr call IT.")
+
+    assert [(s.headings, s.text) for s in sections] == [
+        (["How do I reset my password?"], "Use the portal."),
+        (["How do I reset my password?"], "Or call IT."),
+    ]
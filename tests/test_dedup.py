@@ -0,0 +1,84 @@
+from langchain_core.documents import Document
+
+from services.dedup import ChunkDeduplicator, estimate_jaccard, get_sources, minhash
+
+TEXT = (
+    "Employees accrue thirty days of paid vacation per year, which must be scheduled "
+    "with the manager at least thirty days in advance and taken within the following "
+    "twelve months, otherwise the balance expires under the company policy."
+)
+
+
+def chunk(text, source):
+    return Document(page_content=text, metadata={"source": source})
+
+
+def test_distinct_chunks_are_kept_without_extra_metadata():
+    docs = [chunk(TEXT, "a.md"), chunk("Payroll is paid on the fifth business day of each month.", "b.md")]
+    kept = ChunkDeduplicator().deduplicate(docs)
+
+    assert kept == docs
+    assert all(doc.metadata == {"source": doc.metadata["source"]} for doc in kept)
+
+
+def test_exact_duplicates_are_merged_into_the_kept_chunk():
+    deduplicator = ChunkDeduplicator()
+    kept = deduplicator.deduplicate([
+        chunk(TEXT, "a.md"),
+        chunk("  " + TEXT.upper() + "\n", "b.md"),  # Same text after normalization
+        chunk(TEXT, "a.md"),
+    ])
+
+    assert len(kept) == 1
+    assert get_sources(kept[0]) == ["a.md", "b.md"]
+    assert deduplicator.exact_duplicates == 2
+
+
+def test_near_duplicates_are_merged_and_different_texts_are_not():
+    near = TEXT.replace("twelve months", "12 months")
+    different = "The cafeteria serves lunch from noon to two, with vegetarian options on every weekday menu."
+    deduplicator = ChunkDeduplicator(threshold=0.8)
+    kept = deduplicator.deduplicate([chunk(TEXT, "a.md"), chunk(near, "b.md"), chunk(different, "c.md")])
+
+    assert [doc.page_content for doc in kept] == [TEXT, different]
+    assert get_sources(kept[0]) == ["a.md", "b.md"]
+    assert get_sources(kept[1]) == ["c.md"]
+    assert deduplicator.near_duplicates == 1
+
+
+def test_short_chunks_are_only_compared_exactly():
+    kept = ChunkDeduplicator().deduplicate([chunk("Vacation policy", "a.md"), chunk("Vacation policies", "b.md")])
+    assert len(kept) == 2
+
+
+def test_registered_chunks_use_and_fill_the_signature_cache():
+    cache = {}
+    indexed = chunk(TEXT, "a.md")
+    deduplicator = ChunkDeduplicator(signature_cache=cache)
+    deduplicator.register(indexed, key="doc-1")
+    assert cache["doc-1"] == minhash(TEXT)
+
+    # A later run reuses the cached signature instead of hashing the chunk again
+    cache["doc-1"] = minhash(TEXT.replace("vacation", "leave"))
+    again = ChunkDeduplicator(signature_cache=cache)
+    again.register(indexed, key="doc-1")
+    assert again._signatures["doc-1"] == cache["doc-1"]
+
+    # Chunks registered without a key (deduplicate()) stay out of the cache
+    ChunkDeduplicator(signature_cache=cache).deduplicate([chunk(TEXT, "b.md")])
+    assert list(cache) == ["doc-1"]
+
+
+def test_find_duplicate_returns_the_key_of_an_indexed_chunk():
+    deduplicator = ChunkDeduplicator()
+    deduplicator.register(chunk(TEXT, "a.md"), key="doc-1")
+
+    duplicate = chunk(TEXT, "b.md")
+    assert deduplicator.find_duplicate(duplicate) == "doc-1"
+    kept = deduplicator.merge_source("doc-1", duplicate)
+    assert get_sources(kept) == ["a.md", "b.md"]
+
+
+def test_estimate_jaccard_of_identical_and_unrelated_texts():
+    assert estimate_jaccard(minhash(TEXT), minhash(TEXT)) == 1.0
+    assert estimate_jaccard(minhash(TEXT), minhash("completely unrelated words about astronomy and stars")) < 0.2
@@ -0,0 +1,68 @@
+import pytest
+
+from benchmarks.fake_employee_api import employee_payload, start_employee_api_stub
+from services import employee_api
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, etag=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = {"ETag": etag} if etag else {}
+
+    def json(self):
+        if self._payload is None:
+            raise ValueError("empty body")
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent_etags = []
+
+    def get(self, url, params, headers, timeout):
+        self.sent_etags.append(headers.get("If-None-Match"))
+        return self.responses.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def empty_etag_cache(monkeypatch):
+    monkeypatch.setattr(employee_api, "_etag_cache", {})
+
+
+def test_not_modified_reuses_the_cached_answer(monkeypatch):
+    session = FakeSession([FakeResponse(200, {"name": "Ana"}, '"v1"'), FakeResponse(304)])
+    monkeypatch.setattr(employee_api, "get_session", lambda: session)
+
+    assert employee_api.get_vacancy("E1") == {"name": "Ana"}
+    assert employee_api.get_vacancy("E1") == {"name": "Ana"}
+    assert session.sent_etags == [None, '"v1"']
+
+
+def test_not_modified_without_a_cached_answer_asks_again(monkeypatch):
+    session = FakeSession([FakeResponse(304), FakeResponse(200, {"name": "Ana"}, '"v1"')])
+    monkeypatch.setattr(employee_api, "get_session", lambda: session)
+
+    assert employee_api.get_payroll("E1") == {"name": "Ana"}
+    assert session.sent_etags == [None, None]
+
+
+def test_lookups_against_the_local_stand_in(monkeypatch):
+    server = start_employee_api_stub()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(employee_api, "SALARY_ENDPOINT_URL", f"{base_url}/employee/payroll")
+    monkeypatch.setattr(employee_api, "VACANCY_ENDPOINT_URL", f"{base_url}/employee/vacancy")
+    try:
+        assert employee_api.get_payroll("E1001") == employee_payload("payroll", "E1001")
+        # Revalidated with If-None-Match and answered 304 by the stand-in
+        assert employee_api.get_payroll("E1001") == employee_payload("payroll", "E1001")
+        assert employee_api.get_vacancy("E1001") == employee_payload("vacancy", "E1001")
+        with pytest.raises(employee_api.EmployeeNotFound):
+            employee_api.get_vacancy("X0000")
+    finally:
+        server.shutdown()
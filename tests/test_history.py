@@ -0,0 +1,111 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+import history
+from history import SUMMARY_PREFIX, ConversationHistory, count_message_tokens
+
+
+@pytest.fixture(autouse=True)
+def character_token_estimate(monkeypatch):
+    # No tokenizer download: count tokens as chars / 4
+    monkeypatch.setattr(history, "_get_encoding", lambda: None)
+
+
+class RecordingSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous_summary, messages):
+        self.calls.append(list(messages))
+        return "resumo " * 50
+
+
+def add_turn(conversation, question_chars=200, answer_chars=300):
+    conversation.append(HumanMessage(content="q" * question_chars))
+    conversation.append(AIMessage(content="a" * answer_chars))
+
+
+def test_short_conversation_is_not_summarized():
+    summarizer = RecordingSummarizer()
+    conversation = ConversationHistory(summarizer)
+    add_turn(conversation)
+    conversation.append(HumanMessage(content="next question"))
+
+    assert conversation.maybe_summarize() is False
+    assert summarizer.calls == []
+    assert [m.content for m in conversation.for_graph()][-1] == "next question"
+
+
+def test_summarizes_before_turns_fall_outside_the_budget():
+    summarizer = RecordingSummarizer()
+    conversation = ConversationHistory(summarizer)
+    for _ in range(40):
+        add_turn(conversation)
+        conversation.maybe_summarize()
+        graph_messages = conversation.for_graph()
+        sent = len(graph_messages) - (1 if conversation.summary else 0)
+        # Every turn not folded into the summary still reaches the graph
+        assert sent == len(conversation._recent_messages())
+
+    assert summarizer.calls
+    assert isinstance(conversation.for_graph()[0], SystemMessage)
+    assert conversation.for_graph()[0].content.startswith(SUMMARY_PREFIX)
+
+
+def test_kept_turns_start_with_a_question():
+    conversation = ConversationHistory(RecordingSummarizer())
+    for _ in range(20):
+        add_turn(conversation)
+        conversation.maybe_summarize()
+        assert isinstance(conversation._recent_messages()[0], HumanMessage)
+
+
+def test_oversized_question_is_not_summarized():
+    summarizer = RecordingSummarizer()
+    conversation = ConversationHistory(summarizer)
+    for _ in range(3):
+        add_turn(conversation, 40, 40)
+    question = HumanMessage(content="x" * 8000)
+    conversation.append(question)
+
+    assert conversation.maybe_summarize() is True
+    assert question not in summarizer.calls[0]
+    graph_messages = conversation.for_graph()
+    assert graph_messages[-1] is question
+    assert any(isinstance(m, HumanMessage) for m in graph_messages)
+
+
+def test_oversized_first_question_is_kept():
+    summarizer = RecordingSummarizer()
+    conversation = ConversationHistory(summarizer)
+    question = HumanMessage(content="x" * 20000)
+    conversation.append(question)
+
+    assert conversation.maybe_summarize() is False
+    assert summarizer.calls == []
+    assert conversation.for_graph() == [question]
+
+
+def test_tool_payloads_are_not_sent_or_summarized():
+    summarizer = RecordingSummarizer()
+    conversation = ConversationHistory(summarizer)
+    for _ in range(12):
+        conversation.append(HumanMessage(content="q" * 200))
+        conversation.append(AIMessage(content="", tool_calls=[{"name": "FinalResponse", "args": {}, "id": "1"}]))
+        conversation.append(ToolMessage(content="{}", tool_call_id="1"))
+        conversation.append(AIMessage(content="a" * 300))
+        conversation.maybe_summarize()
+
+    for messages in summarizer.calls:
+        assert not any(isinstance(m, ToolMessage) for m in messages)
+    assert not any(isinstance(m, ToolMessage) for m in conversation.for_graph())
+
+
+def test_for_graph_stays_within_the_budget():
+    conversation = ConversationHistory()
+    for _ in range(30):
+        add_turn(conversation)
+    graph_messages = conversation.for_graph()
+
+    assert sum(count_message_tokens(m) for m in graph_messages) <= ConversationHistory.MAX_CONTEXT_TOKENS
+    assert isinstance(graph_messages[0], HumanMessage)
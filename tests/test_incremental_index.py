@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip("faiss")
+
+import services.Intranet_repository_s3 as repository_module
+from benchmarks.local_embeddings import HashingEmbeddings
+from services.dedup import get_sources
+from services.Intranet_repository_s3 import IntranetRepository
+
+SHARED = "## Benefits\n\n" + " ".join(f"shared benefit clause number {i} applies to every employee." for i in range(8))
+OLD = "## Vacation\n\n" + " ".join(f"vacation rule {i} for the old policy text." for i in range(8))
+NEW = "## Vacation\n\n" + " ".join(f"holiday entitlement {i} under the revised policy." for i in range(8))
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    monkeypatch.setattr(repository_module, "OpenAIEmbeddings", HashingEmbeddings)
+    files_dir = tmp_path / "bucket"
+    files_dir.mkdir()
+    repository = IntranetRepository(bucket_name="test", index_path=str(tmp_path / "index"))
+    repository.download_file = lambda key, temp_dir: (key, str(files_dir / key))
+    repository.download_files_from_s3 = lambda progress=None: (tempfile.mkdtemp(), [])
+    repository.delete_extracted_text = lambda key: None
+    repository.files_dir = files_dir
+    return repository
+
+
+def upload(repository, key, text):
+    (repository.files_dir / key).write_text(text, encoding="utf-8")
+    return repository.index_document(key)
+
+
+def sources_by_text(vectorstore):
+    return {doc.page_content: get_sources(doc) for doc in vectorstore.docstore._dict.values()}
+
+
+def test_reupload_after_a_shared_chunk_was_kept_for_another_file(repository):
+    upload(repository, "a.md", SHARED + "\n\n" + OLD)
+    vectorstore, added = upload(repository, "b.md", SHARED)
+    assert added == 0  # The shared section is deduplicated into a.md's chunk
+
+    # a.md changes: the shared chunk, first in a.md, stays only for b.md
+    vectorstore, added = upload(repository, "a.md", NEW + "\n\n" + OLD)
+    assert added > 0
+
+    by_text = sources_by_text(vectorstore)
+    assert vectorstore.index.ntotal == len(vectorstore.docstore._dict)
+    assert any("revised policy" in text and sources == ["a.md"] for text, sources in by_text.items())
+    assert any("shared benefit" in text and sources == ["b.md"] for text, sources in by_text.items())
+
+    # And back again: the shared section of a.md is merged into b.md's chunk
+    vectorstore, _ = upload(repository, "a.md", SHARED + "\n\n" + OLD)
+    by_text = sources_by_text(vectorstore)
+    assert not any("revised policy" in text for text in by_text)
+    assert any("shared benefit" in text and sorted(sources) == ["a.md", "b.md"] for text, sources in by_text.items())
+
+
+def test_reupload_replaces_the_chunks_of_the_file(repository):
+    upload(repository, "a.md", OLD)
+    vectorstore, _ = upload(repository, "a.md", NEW)
+
+    texts = list(sources_by_text(vectorstore))
+    assert texts and all("revised policy" in text for text in texts)
+
+    reloaded = IntranetRepository(bucket_name="test", index_path=repository.index_path)._load_local()
+    assert reloaded.index.ntotal == vectorstore.index.ntotal
+    assert os.path.isdir(os.path.join(repository.index_path, IntranetRepository.INDEX_VERSIONS_DIR))
+
+
+def test_saves_keep_two_versions_and_remove_stale_staging(repository):
+    versions_dir = os.path.join(repository.index_path, IntranetRepository.INDEX_VERSIONS_DIR)
+    upload(repository, "a.md", OLD)
+    stale = tempfile.mkdtemp(dir=versions_dir, prefix=".staging-")
+    fresh = tempfile.mkdtemp(dir=versions_dir, prefix=".staging-")
+    old = os.path.getmtime(stale) - 2 * IntranetRepository.STALE_STAGING_SECONDS
+    os.utime(stale, (old, old))
+
+    upload(repository, "a.md", NEW)
+    upload(repository, "b.md", SHARED)
+
+    assert not os.path.exists(stale)
+    assert os.path.isdir(fresh)  # May still be written by a save in another process
+    versions = [name for name in os.listdir(versions_dir) if not name.startswith(".")]
+    assert len(versions) == IntranetRepository.KEEP_INDEX_VERSIONS
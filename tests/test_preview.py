@@ -0,0 +1,51 @@
+import io
+
+import pytest
+
+import sofia_logic
+
+
+class FakeS3:
+    def __init__(self, body, etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.calls = []
+
+    def head_object(self, Bucket, Key):
+        self.calls.append("head")
+        return {"ETag": self.etag}
+
+    def get_object(self, Bucket, Key, Range):
+        self.calls.append("get")
+        start, end = (int(n) for n in Range.split("=")[1].split("-"))
+        page = self.body[start:end + 1]
+        return {
+            "ETag": self.etag,
+            "ContentRange": f"bytes {start}-{start + len(page) - 1}/{len(self.body)}",
+            "Body": io.BytesIO(page),
+        }
+
+    def get_paginator(self, name):
+        raise AssertionError("the preview must not list the bucket")
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    client = FakeS3(b"0123456789" * 10)
+    monkeypatch.setattr(sofia_logic, "get_s3_client", lambda: client)
+    monkeypatch.setattr(sofia_logic, "_preview_cache", sofia_logic.OrderedDict())
+    return client
+
+
+def test_pages_are_cached_by_the_object_etag(s3):
+    assert sofia_logic.read_s3_file_page("bucket", "a.txt", page=1, page_size=10) == ("0123456789", 100)
+    assert sofia_logic.read_s3_file_page("bucket", "a.txt", page=1, page_size=10) == ("0123456789", 100)
+    assert s3.calls == ["head", "get", "head"]
+
+
+def test_a_changed_object_is_read_again(s3):
+    sofia_logic.read_s3_file_page("bucket", "a.txt", page=0, page_size=10)
+    s3.body, s3.etag = b"abcdefghij" * 10, '"v2"'
+
+    assert sofia_logic.read_s3_file_page("bucket", "a.txt", page=0, page_size=10) == ("abcdefghij", 100)
+    assert s3.calls == ["head", "get", "head", "get"]
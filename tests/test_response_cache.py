@@ -0,0 +1,129 @@
+import importlib
+import sqlite3
+import sys
+
+import pytest
+
+from backend.cache import ResponseCache, etag_matches, make_etag
+
+
+def test_get_returns_the_stored_payload_and_etag():
+    cache = ResponseCache(ttl_seconds=60)
+    etag = cache.set("key", {"name": "Ana"})
+
+    assert cache.get("key") == ({"name": "Ana"}, etag)
+    assert etag == make_etag({"name": "Ana"})
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_entries_expire_after_the_ttl():
+    cache = ResponseCache(ttl_seconds=-1)
+    cache.set("key", {"name": "Ana"})
+
+    assert cache.get("key") is None
+    assert cache.misses == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_a_changed_data_version_clears_the_cache():
+    cache = ResponseCache()
+    cache.observe_data_version(1)
+    cache.set("key", 1)
+    cache.observe_data_version(1)
+    assert cache.get("key") is not None
+
+    cache.observe_data_version(2)
+    assert cache.get("key") is None
+
+
+def test_payload_loaded_before_a_clear_is_not_stored():
+    cache = ResponseCache()
+    generation = cache.generation
+    cache.clear()  # A write lands while the payload is being loaded
+
+    etag = cache.set("key", {"name": "old"}, generation)
+    assert etag == make_etag({"name": "old"})
+    assert cache.get("key") is None
+
+    cache.set("key", {"name": "new"}, cache.generation)
+    assert cache.get("key")[0] == {"name": "new"}
+
+
+def test_etag_matches_lists_weak_tags_and_wildcards():
+    etag = make_etag({"a": 1})
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    db_path = str(tmp_path / "employee.db")
+    monkeypatch.setenv("EMPLOYEE_DB_PATH", db_path)
+    for name in ("backend.db", "backend.api"):
+        sys.modules.pop(name, None)
+    module = importlib.import_module("backend.api")
+    with TestClient(module.app) as client:
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("INSERT INTO employee (employee_code, name) VALUES ('E1', 'Ana')")
+            conn.execute("INSERT INTO employee_vacancy (employee_code, balance_days) VALUES ('E1', 12)")
+        yield module, client
+    for name in ("backend.db", "backend.api"):
+        sys.modules.pop(name, None)
+
+
+def test_get_lookups_are_conditional(api):
+    _, client = api
+    response = client.get("/employee/vacancy", params={"employeeCode": "E1"})
+    assert response.status_code == 200
+    assert response.json() == {"name": "Ana", "vacancyBalanceDays": 12}
+
+    etag = response.headers["ETag"]
+    revalidated = client.get("/employee/vacancy", params={"employeeCode": "E1"}, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+
+
+def test_post_lookups_are_never_not_modified(api):
+    _, client = api
+    etag = client.get("/employee/vacancy", params={"employeeCode": "E1"}).headers["ETag"]
+
+    response = client.post("/employee/vacancy", json={"employeeCode": "E1"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["vacancyBalanceDays"] == 12
+    assert "ETag" not in response.headers
+
+
+def test_result_of_a_query_overlapping_a_write_is_not_cached(api, monkeypatch):
+    module, client = api
+    fetch_one = module.db.fetch_one
+    queries = []
+
+    async def fetch_one_during_write(sql, params=()):
+        queries.append(params)
+        row = await fetch_one(sql, params)
+        if len(queries) == 1:
+            # Another process commits while the first query runs
+            with sqlite3.connect(module.db.path) as conn:
+                conn.execute("UPDATE employee_vacancy SET balance_days = 3 WHERE employee_code = 'E1'")
+        return row
+
+    monkeypatch.setattr(module.db, "fetch_one", fetch_one_during_write)
+    assert client.get("/employee/vacancy", params={"employeeCode": "E1"}).json()["vacancyBalanceDays"] == 12
+    assert client.get("/employee/vacancy", params={"employeeCode": "E1"}).json()["vacancyBalanceDays"] == 3
+    assert len(queries) == 2
@@ -0,0 +1,32 @@
+import datetime
+
+from usage import UsageStore
+
+
+def add_call(store, stage, tokens, trace_id, days_ago=0):
+    day = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days_ago)).strftime("%Y-%m-%d")
+    store._conn.execute(
+        """
+        INSERT INTO llm_usage (created_at, day, session_id, trace_id, stage, route, model,
+                               input_tokens, output_tokens, cost_usd)
+        VALUES (0, ?, 's1', ?, ?, ?, 'gpt-4o-mini', ?, 0, ?)
+        """,
+        (day, trace_id, stage, stage.split(".", 1)[0], tokens, tokens / 1000),
+    )
+
+
+def test_summary_by_route_charges_the_classifier_to_the_turn_route(tmp_path):
+    store = UsageStore(str(tmp_path / "usage.db"))
+    add_call(store, "classifier.llm_predict", 100, "t1")
+    add_call(store, "global.llm_predict", 500, "t1")
+    add_call(store, "classifier.llm_predict", 100, "t2")
+    add_call(store, "salary.lookup", 0, "t2")
+    # Outside the period
+    add_call(store, "classifier.llm_predict", 100, "t3", days_ago=30)
+    add_call(store, "vendorid.llm_predict", 900, "t3", days_ago=30)
+
+    rows = {row["route"]: row for row in store.summary_by_route(days=7)}
+
+    assert set(rows) == {"global", "salary"}
+    assert (rows["global"]["turns"], rows["global"]["calls"], rows["global"]["input_tokens"]) == (1, 2, 600)
+    assert (rows["salary"]["turns"], rows["salary"]["calls"], rows["salary"]["input_tokens"]) == (1, 1, 100)
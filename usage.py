@@ -0,0 +1,219 @@
+# Token usage and cost accounting for the LLM calls made by the chat graph.
+# Every LLM response that reports token usage is stored in a local SQLite file,
+# tagged with its session, turn (trace id), route and day, so spend can be
+# aggregated per session, per route and per day in the admin sidebar.
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+USAGE_DB_PATH = os.getenv("USAGE_DB_PATH", "usage.db")
+
+# USD per million tokens (input, output)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Routes a turn can take in the graph; the classifier call of a turn is charged to its route.
+# Routes without an LLM call (salary, vacancy) store a zero-token row to mark the turn.
+ROUTES = ("global", "vendorid", "salary", "vacancy")
+
+
+def model_price(model):
+    """Return the (input, output) price per million tokens, matching dated model names by prefix."""
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model and model.startswith(name):
+            return MODEL_PRICES[name]
+    return MODEL_PRICES[DEFAULT_MODEL]
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    input_price, output_price = model_price(model)
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class UsageStore:
+    """SQLite store of LLM calls. Safe to share between threads; WAL lets several processes write."""
+
+    def __init__(self, db_path=USAGE_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                day TEXT NOT NULL,
+                session_id TEXT,
+                trace_id TEXT,
+                stage TEXT NOT NULL,
+                route TEXT NOT NULL,
+                model TEXT,
+                input_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                cost_usd REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_usage_day ON llm_usage (day);
+            CREATE INDEX IF NOT EXISTS idx_llm_usage_session ON llm_usage (session_id);
+            DROP INDEX IF EXISTS idx_llm_usage_trace;
+            CREATE INDEX IF NOT EXISTS idx_llm_usage_trace_route ON llm_usage (trace_id, route);
+            """
+        )
+        self._conn.commit()
+
+    def record(self, stage, input_tokens, output_tokens, model=None, session_id=None, trace_id=None):
+        """
+        Store one LLM call.
+
+        Args:
+            stage: The step that made the call, e.g. 'global.llm_predict'
+            input_tokens: Prompt tokens
+            output_tokens: Completion tokens
+            model: Model name reported by the response
+            session_id: Chat session of the turn
+            trace_id: Trace id of the turn
+
+        Returns:
+            float: The estimated cost in USD
+        """
+        model = model or DEFAULT_MODEL
+        cost = estimate_cost(model, input_tokens, output_tokens)
+        now = time.time()
+        day = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).strftime("%Y-%m-%d")
+        route = stage.split(".", 1)[0]
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO llm_usage (created_at, day, session_id, trace_id, stage, route,
+                                       model, input_tokens, output_tokens, cost_usd)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (now, day, session_id, trace_id, stage, route, model, input_tokens, output_tokens, cost),
+            )
+            self._conn.commit()
+        return cost
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _turn_route_sql(self, days):
+        # Charge each call to the route its turn took (the classifier runs before routing).
+        # Only the calls of the period are read; the route of each one's turn is looked up
+        # in the (trace_id, route) index.
+        placeholders = ", ".join("?" for _ in ROUTES)
+        return f"""
+            SELECT u.*, COALESCE(
+                (SELECT MAX(t.route) FROM llm_usage t
+                 WHERE t.trace_id = u.trace_id AND t.route IN ({placeholders})),
+                u.route
+            ) AS turn_route
+            FROM llm_usage u
+            WHERE u.day >= ?
+        """, (*ROUTES, _since(days))
+
+    def summary_by_route(self, days=7):
+        subquery, params = self._turn_route_sql(days)
+        return self._query(
+            f"""
+            SELECT turn_route AS route, COUNT(DISTINCT trace_id) AS turns,
+                   SUM(input_tokens + output_tokens > 0) AS calls,
+                   SUM(input_tokens) AS input_tokens, SUM(output_tokens) AS output_tokens,
+                   SUM(cost_usd) AS cost_usd,
+                   SUM(cost_usd) / MAX(COUNT(DISTINCT trace_id), 1) AS cost_per_turn
+            FROM ({subquery})
+            GROUP BY turn_route ORDER BY cost_usd DESC
+            """,
+            params,
+        )
+
+    def summary_by_stage(self, days=7):
+        return self._query(
+            """
+            SELECT stage, SUM(input_tokens + output_tokens > 0) AS calls, SUM(input_tokens) AS input_tokens,
+                   SUM(output_tokens) AS output_tokens, SUM(cost_usd) AS cost_usd
+            FROM llm_usage WHERE day >= ?
+            GROUP BY stage ORDER BY cost_usd DESC
+            """,
+            (_since(days),),
+        )
+
+    def summary_by_day(self, days=30):
+        return self._query(
+            """
+            SELECT day, COUNT(DISTINCT trace_id) AS turns,
+                   SUM(input_tokens + output_tokens > 0) AS calls,
+                   SUM(input_tokens) AS input_tokens, SUM(output_tokens) AS output_tokens,
+                   SUM(cost_usd) AS cost_usd
+            FROM llm_usage WHERE day >= ?
+            GROUP BY day ORDER BY day DESC
+            """,
+            (_since(days),),
+        )
+
+    def top_sessions(self, days=7, limit=10):
+        return self._query(
+            """
+            SELECT session_id, COUNT(DISTINCT trace_id) AS turns,
+                   SUM(input_tokens + output_tokens > 0) AS calls,
+                   SUM(input_tokens + output_tokens) AS tokens, SUM(cost_usd) AS cost_usd
+            FROM llm_usage WHERE day >= ? AND session_id IS NOT NULL
+            GROUP BY session_id ORDER BY cost_usd DESC LIMIT ?
+            """,
+            (_since(days), limit),
+        )
+
+    def session_total(self, session_id):
+        rows = self._query(
+            """
+            SELECT COALESCE(SUM(input_tokens + output_tokens > 0), 0) AS calls, COALESCE(SUM(input_tokens + output_tokens), 0) AS tokens,
+                   COALESCE(SUM(cost_usd), 0) AS cost_usd
+            FROM llm_usage WHERE session_id = ?
+            """,
+            (session_id,),
+        )
+        return rows[0]
+
+
+def _since(days):
+    start = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days - 1)
+    return start.strftime("%Y-%m-%d")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide usage store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = UsageStore()
+    return _store
+
+
+def record_llm_call(stage, usage, model=None, session_id=None, trace_id=None):
+    """Store one LLM call; accounting errors are logged and never fail the chat turn."""
+    try:
+        return get_store().record(
+            stage, usage["input_tokens"], usage["output_tokens"],
+            model=model, session_id=session_id, trace_id=trace_id,
+        )
+    except Exception as e:
+        logger.error(f"Error recording token usage for {stage}: {e}")
+        return None